@@ -0,0 +1,489 @@
+import argparse
+import math
+import sys
+from typing import List, Dict, Optional, Set, Tuple
+
+from .instruction import Instruction, Opcode
+from .cfg import ControlFlowGraph, is_branch, register_written
+from .optimizer import Optimizer
+from .parser import Parser
+from .scheduler import stall_cycles
+
+# Cycle model on top of the scheduler's stall estimate
+JUMP_PENALTY = 1   # Fetch redirect after a jmp
+SKIP_PENALTY = 1   # A skipped instruction still occupies a pipeline slot
+PIPELINE_FILL = 4  # Cycles before the first instruction completes
+
+INFINITE = math.inf  # Bound of code that may not terminate
+
+class Induction:
+    """Counted loop: `register` changes by `step` every iteration and the
+    loop exits once compare(register, limit) (or compare(limit, register))
+    makes the exit branch leave the loop."""
+    def __init__(self, register: int, step: int, initial: Optional[int], before_compare: bool,
+                 compare: Instruction, branch: Instruction, exit_on_skip: bool,
+                 limit_register: int, limit: Tuple):
+        self.register = register
+        self.step = step
+        self.initial = initial              # Value on loop entry, None if unknown
+        self.before_compare = before_compare  # Incremented before the compare in an iteration
+        self.compare = compare
+        self.branch = branch
+        self.exit_on_skip = exit_on_skip
+        self.limit_register = limit_register
+        self.limit = limit                  # ('const', value), ('mem', address) or ('unknown',)
+        self._trips: Dict[int, float] = {}
+
+    def exits(self, counter: int, limit: int) -> bool:
+        """True if the exit branch leaves the loop for these values."""
+        if self.compare.rs1 == self.register:
+            a, b = counter, limit
+        else:
+            a, b = limit, counter
+        flag = (a == b) if self.compare.opcode == Opcode.EQ else (a > b)
+        skips = flag if self.branch.opcode == Opcode.SKIPIF else not flag
+        return skips == self.exit_on_skip
+
+    def trips(self, limit: int) -> float:
+        """Iterations for a limit value (worst case over initial values if unknown),
+        INFINITE if the counter can cycle without ever exiting."""
+        if limit not in self._trips:
+            # Distance along the counter's orbit (c, c+step, ...) to the first exiting value
+            distance: Dict[int, float] = {}
+            for start in range(256):
+                if start in distance:
+                    continue
+                orbit, value = [], start
+                while value not in orbit:
+                    orbit.append(value)
+                    value = (value + self.step) & 0xFF
+                for value in orbit:
+                    distance[value] = INFINITE
+                following = INFINITE
+                for value in reversed(orbit + orbit):
+                    following = 0 if self.exits(value, limit) else following + 1
+                    distance[value] = min(distance[value], following)
+            offset = self.step if self.before_compare else 0
+            if self.initial is None:
+                first = INFINITE if any(d == INFINITE for d in distance.values()) else max(distance.values())
+            else:
+                first = distance[(self.initial + offset) & 0xFF]
+            self._trips[limit] = first + 1
+        return self._trips[limit]
+
+    def describe(self) -> str:
+        reg = f"r{self.register}"
+        start = "unknown" if self.initial is None else f"0x{self.initial:02x}"
+        step = f"+= {self.step}" if self.step < 128 else f"-= {256 - self.step}"
+        other = limit_name(self.limit, self.limit_register)
+        a, b = (reg, other) if self.compare.rs1 == self.register else (other, reg)
+        test = f"{a} {'==' if self.compare.opcode == Opcode.EQ else '>'} {b}"
+        holds = (self.branch.opcode == Opcode.SKIPIF) == self.exit_on_skip
+        return f"{reg} {step} from {start}, exits when {'' if holds else 'not '}{test}"
+
+class Loop:
+    """Natural loop: a header and every instruction that can reach a back edge
+    to it without passing through the header."""
+    def __init__(self, header: int, body: Set[int], latches: Set[int]):
+        self.header = header
+        self.body = body
+        self.latches = latches
+        self.induction: Optional[Induction] = None
+        self.has_exit = False
+
+def limit_name(limit: Tuple, register: int) -> str:
+    if limit[0] == 'const':
+        return f"0x{limit[1]:02x}"
+    if limit[0] == 'mem':
+        return f"r{register} (mem[0x{limit[1]:02x}])"
+    return f"r{register}"
+
+class BoundAnalysis:
+    """Worst-case instruction and cycle bounds of an assembled program.
+
+    Loops are found from the control-flow graph's dominators. A loop gets an
+    iteration bound when it matches the counter pattern: a register changed
+    by a constant step once per iteration, compared with gt/eq against a
+    constant or an input byte, and an if/skipif on the result that leaves
+    the loop. The comparison is evaluated for every 8-bit value, so
+    wrap-around (e.g. a counter that can never exceed 0xff) shows up as a
+    non-terminating input. Bounds count instructions the way the emulator
+    does (skipped instructions count, halt does not).
+    """
+    def __init__(self, instructions: List[Instruction]):
+        self.instructions = instructions
+        self.cfg = ControlFlowGraph(instructions)
+        self.values = Optimizer().propagate(instructions) if instructions else []
+        self.idom = self.dominators()
+        self.loops = self.find_loops()
+        for loop in self.loops:
+            loop.induction = self.find_induction(loop)
+
+    # Control flow
+
+    def dominators(self) -> Dict[int, int]:
+        """Immediate dominators of reachable instructions (Cooper, Harvey, Kennedy)."""
+        if not self.instructions:
+            return {}
+        order: List[int] = []
+        seen: Set[int] = set()
+        stack = [(0, iter(self.cfg.succ[0]))]
+        seen.add(0)
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                order.append(node)
+            elif child not in seen:
+                seen.add(child)
+                stack.append((child, iter(self.cfg.succ[child])))
+        order.reverse()
+        rank = {node: n for n, node in enumerate(order)}
+        idom = {0: 0}
+        changed = True
+        while changed:
+            changed = False
+            for node in order[1:]:
+                preds = [p for p in self.cfg.pred[node] if p in idom]
+                new = preds[0]
+                for p in preds[1:]:
+                    a, b = p, new
+                    while a != b:
+                        while rank[a] > rank[b]:
+                            a = idom[a]
+                        while rank[b] > rank[a]:
+                            b = idom[b]
+                    new = a
+                if idom.get(node) != new:
+                    idom[node] = new
+                    changed = True
+        return idom
+
+    def dominates(self, a: int, b: int) -> bool:
+        while b != a:
+            if b == 0 or b not in self.idom:
+                return a == b
+            b = self.idom[b]
+        return True
+
+    def find_loops(self) -> List['Loop']:
+        """Natural loops, innermost first; back edges to one header share a loop."""
+        latches: Dict[int, Set[int]] = {}
+        for node in self.idom:
+            for succ in self.cfg.succ[node]:
+                if self.dominates(succ, node):
+                    latches.setdefault(succ, set()).add(node)
+        loops = []
+        for header, tails in latches.items():
+            body = {header}
+            stack = list(tails)
+            while stack:
+                node = stack.pop()
+                if node not in body:
+                    body.add(node)
+                    stack.extend(p for p in self.cfg.pred[node] if p in self.idom)
+            loop = Loop(header, body, tails)
+            loop.has_exit = any(s not in body for n in body for s in self.cfg.succ[n]) or any(
+                self.stop_cost(n, 0) is not None for n in body)
+            loops.append(loop)
+        return sorted(loops, key=lambda loop: len(loop.body))
+
+    def find_induction(self, loop: Loop) -> Optional[Induction]:
+        """Match the counter pattern for one of the loop's exit branches."""
+        program = self.instructions
+        writers: Dict[int, List[int]] = {}
+        for n in loop.body:
+            reg = register_written(program[n])
+            if reg is not None:
+                writers.setdefault(reg, []).append(n)
+
+        def every_iteration(n: int) -> bool:
+            return not self.cfg.shadowed(n) and all(self.dominates(n, l) for l in loop.latches)
+
+        for b in sorted(loop.body):
+            branch = program[b]
+            if not is_branch(branch) or not every_iteration(b):
+                continue
+            exit_on_skip = b + 2 not in loop.body
+            if exit_on_skip == (b + 1 not in loop.body):
+                continue
+            # The comparison that sets the branch register, earlier in the same block
+            c = b - 1
+            while c >= 0 and self.cfg.block_of.get(c) == self.cfg.block_of.get(b) \
+                    and register_written(program[c]) != branch.rs1:
+                c -= 1
+            if c < 0 or self.cfg.block_of.get(c) != self.cfg.block_of.get(b):
+                continue
+            compare = program[c]
+            if compare.opcode not in (Opcode.GT, Opcode.EQ) or compare.rs1 == compare.rs2:
+                continue
+            for counter, limit_reg in ((compare.rs1, compare.rs2), (compare.rs2, compare.rs1)):
+                if limit_reg in writers or len(writers.get(counter, [])) != 1:
+                    continue
+                inc = writers[counter][0]
+                step = self.counter_step(inc, counter)
+                if step is None or not every_iteration(inc):
+                    continue
+                return Induction(counter, step, self.entry_value(loop, counter),
+                                 self.dominates(inc, c) and inc != c, compare, branch,
+                                 exit_on_skip, limit_reg, self.limit_source(c, limit_reg))
+        return None
+
+    def counter_step(self, idx: int, counter: int) -> Optional[int]:
+        """Constant added to counter by the instruction at idx (add counter k counter)."""
+        instr = self.instructions[idx]
+        if instr.opcode != Opcode.ADD or instr.rd != counter or counter not in (instr.rs1, instr.rs2):
+            return None
+        other = instr.rs2 if instr.rs1 == counter else instr.rs1
+        if other == counter:
+            return None
+        return (self.values[idx] or {}).get(other)
+
+    def entry_value(self, loop: Loop, reg: int) -> Optional[int]:
+        """Value of reg when the loop is entered from outside, if the same on every entry."""
+        found = set()
+        for p in self.cfg.pred[loop.header]:
+            if p in loop.body or self.values[p] is None:
+                continue
+            regs, _ = Optimizer().transfer(self.instructions, p, self.values[p])
+            found.add(regs.get(reg))
+        return found.pop() if len(found) == 1 else None
+
+    def limit_source(self, idx: int, reg: int) -> Tuple:
+        """Where the loop limit in reg comes from: a constant, an input byte or unknown."""
+        known = (self.values[idx] or {}).get(reg)
+        if known is not None:
+            return ('const', known)
+        writers = [i for i in self.cfg.reachable if register_written(self.instructions[i]) == reg]
+        addrs = {self.instructions[i].addr for i in writers if self.instructions[i].opcode == Opcode.LD}
+        stored = {i.addr for i in self.instructions if i.opcode == Opcode.ST}
+        if len(addrs) == 1 and all(self.instructions[i].opcode == Opcode.LD for i in writers) \
+                and any(self.dominates(i, idx) for i in writers) and not addrs & stored:
+            return ('mem', addrs.pop())
+        return ('unknown',)
+
+    # Bounds
+
+    def input_addresses(self) -> List[int]:
+        """Input bytes that loop bounds depend on."""
+        return sorted({loop.induction.limit[1] for loop in self.loops
+                       if loop.induction and loop.induction.limit[0] == 'mem'})
+
+    def trips(self, loop: Loop, inputs: Dict[int, int]) -> float:
+        """Worst-case iterations of a loop given some input bytes."""
+        induction = loop.induction
+        if induction is None:
+            return INFINITE
+        if induction.limit[0] == 'const':
+            return induction.trips(induction.limit[1])
+        if induction.limit[0] == 'mem' and induction.limit[1] in inputs:
+            return induction.trips(inputs[induction.limit[1]] & 0xFF)
+        return max(induction.trips(v) for v in range(256))
+
+    def weight(self, idx: int, cycles: bool) -> int:
+        instr = self.instructions[idx]
+        if not cycles:
+            return 0 if instr.opcode == Opcode.HALT else 1
+        penalty = JUMP_PENALTY if instr.opcode == Opcode.JMP else 0
+        return 1 + penalty + stall_cycles(instr, self.instructions[max(0, idx - 2):idx])
+
+    def bound(self, inputs: Optional[Dict[int, int]] = None, cycles: bool = False) -> float:
+        """Worst-case instructions (or cycles) over all inputs not given, INFINITE if
+        the program may not terminate."""
+        if not self.instructions:
+            return 0
+        inputs = inputs or {}
+        total = self.longest(set(self.idom), 0, None, inputs, cycles)
+        return total + PIPELINE_FILL if cycles else total
+
+    def longest(self, region: Set[int], entry: int, loop: Optional[Loop],
+                inputs: Dict[int, int], cycles: bool, exit: Optional[int] = None) -> float:
+        """Longest path through region from entry with inner loops collapsed.
+        For a loop region this is one iteration: from the header to a back
+        edge, or to the instruction exit if one is given."""
+        children = [l for l in self.loops if l is not loop and l.body < region
+                    and not any(l.body < other.body < region for other in self.loops if other is not loop)]
+        owner = {n: child for child in children for n in child.body}
+        skip = 1 if not cycles else SKIP_PENALTY
+        memo: Dict[int, float] = {}
+        active: Set[int] = set()
+
+        def exits(src: int):
+            # Successor None: execution stops after src
+            for succ in self.cfg.succ[src]:
+                yield succ, self.edge_cost(src, succ, skip)
+            end = self.stop_cost(src, skip)
+            if end is not None:
+                yield None, end
+
+        def edges(node: int):
+            if node not in owner:
+                for succ, extra in exits(node):
+                    if succ is None or succ in region:
+                        yield succ, extra, node
+                return
+            # Leaving an inner loop: its last iteration runs from the header to the exit
+            child = owner[node]
+            for src in child.body:
+                for succ, extra in exits(src):
+                    if succ is None or (succ in region and succ not in child.body):
+                        last = self.longest(child.body, child.header, child, inputs, cycles, exit=src)
+                        yield succ, last + extra, src
+
+        def cost(node: int) -> float:
+            if node in owner:
+                child = owner[node]
+                trips = self.trips(child, inputs)
+                if trips <= 1:
+                    return 0
+                return (trips - 1) * self.longest(child.body, child.header, child, inputs, cycles)
+            return self.weight(node, cycles)
+
+        def visit(node: int) -> float:
+            if node in memo:
+                return memo[node]
+            if node == exit:
+                return cost(node)
+            if node in owner:
+                child = owner[node]
+                if not child.has_exit:
+                    return INFINITE
+                if exit in child.body:
+                    return cost(node) + self.longest(child.body, child.header, child, inputs, cycles, exit=exit)
+            if node in active:
+                return INFINITE
+            active.add(node)
+            best = -INFINITE
+            for succ, extra, src in edges(node):
+                if succ is None:
+                    if not loop:
+                        best = max(best, extra)
+                    continue
+                if loop and succ == loop.header:
+                    if exit is None and src in loop.latches:
+                        best = max(best, extra)
+                    continue
+                best = max(best, extra + visit(owner[succ].header if succ in owner else succ))
+            active.discard(node)
+            memo[node] = cost(node) + best if best != -INFINITE else -INFINITE
+            return memo[node]
+
+        return max(visit(entry), 0)
+
+    def stop_cost(self, idx: int, skip: int) -> Optional[int]:
+        """Extra weight if execution can stop after the instruction at idx (halt,
+        falling off the end or jumping outside the program), None if it cannot."""
+        instr = self.instructions[idx]
+        count = len(self.instructions)
+        if instr.opcode == Opcode.HALT:
+            return 0
+        if instr.opcode == Opcode.JMP:
+            return None if 0 <= instr.addr < count else 0
+        if is_branch(instr):
+            return skip if idx + 2 == count else (0 if idx + 1 == count else None)
+        return 0 if idx + 1 == count else None
+
+    def edge_cost(self, src: int, succ: int, skip: int) -> int:
+        """Extra weight of an edge: the instruction an if/skipif skips still counts."""
+        return skip if succ == src + 2 and is_branch(self.instructions[src]) else 0
+
+    def report(self) -> List[str]:
+        """Human-readable loop and bound summary."""
+        lines = []
+        for loop in sorted(self.loops, key=lambda l: l.header):
+            first, last = min(loop.body), max(loop.body)
+            iteration = self.longest(loop.body, loop.header, loop, {}, False)
+            line = f"Loop 0x{first*2:03x}-0x{last*2:03x}: {iteration:g} instructions per iteration"
+            if not loop.has_exit:
+                lines.append(f"{line}, never exits")
+            elif loop.induction is None:
+                lines.append(f"{line}, no iteration bound found")
+            else:
+                lines.append(f"{line}, {loop.induction.describe()}")
+                if loop.induction.limit[0] == 'mem':
+                    addr = loop.induction.limit[1]
+                    trips = [loop.induction.trips(v) for v in range(256)]
+                    lines += [f"  iterations: {p}" for p in piecewise(trips, f"mem[0x{addr:02x}]")]
+                else:
+                    lines.append(f"  iterations: {format_bound(self.trips(loop, {}))}")
+
+        lines.append(f"Worst-case instructions: {format_bound(self.bound())}")
+        lines.append(f"Worst-case cycles (estimate): {format_bound(self.bound(cycles=True))}")
+        for addr in self.input_addresses():
+            name = f"mem[0x{addr:02x}]"
+            totals = [self.bound({addr: v}) for v in range(256)]
+            lines.append(f"Instructions by {name}:")
+            lines += [f"  {p}" for p in piecewise(totals, name)]
+        return lines
+
+def format_bound(value: float) -> str:
+    return "may not terminate" if value == INFINITE else f"{value:g}"
+
+def piecewise(values: List[float], name: str) -> List[str]:
+    """Describe values[v] for v = 0..255 as linear pieces in the input byte."""
+    pieces = []
+    v = 0
+    while v < len(values):
+        end = v + 1
+        if values[v] == INFINITE:
+            while end < len(values) and values[end] == INFINITE:
+                end += 1
+            formula = "does not terminate"
+        else:
+            slope = values[v + 1] - values[v] if v + 1 < len(values) and values[v + 1] != INFINITE else 0
+            while end < len(values) and values[end] != INFINITE and values[end] == values[v] + slope * (end - v):
+                end += 1
+            offset = values[v] - slope * v
+            if slope == 0 or end - v == 1:
+                formula = f"{values[v]:g}"
+            else:
+                term = name if slope == 1 else f"{slope:g}*{name}"
+                formula = term if offset == 0 else f"{term} {'+' if offset > 0 else '-'} {abs(offset):g}"
+        span = f"0x{v:02x}" if end - v == 1 else f"0x{v:02x}..0x{end-1:02x}"
+        pieces.append(f"{name} = {span}: {formula}")
+        v = end
+    return pieces
+
+def read_inputs(memory_file: str) -> Dict[int, int]:
+    """Input bytes from a memory file, addressed by line like the emulator's memory files."""
+    inputs = {}
+    with open(memory_file) as f:
+        for idx, line in enumerate(f):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            inputs[idx] = int(line, 2) if all(c in '01' for c in line) else int(line, 16)
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(description='TUCA worst-case bound analysis')
+    parser.add_argument('input_file', type=str, help='Input assembly file')
+    parser.add_argument('--memory', type=str, help='Bound for the inputs in this memory file')
+    parser.add_argument('--budget', type=int, help='Fail if the worst case exceeds this many instructions')
+    args = parser.parse_args()
+
+    try:
+        with open(args.input_file) as f:
+            instructions = Parser().parse_program(f.read())
+        analysis = BoundAnalysis(instructions)
+        print("\n".join(analysis.report()))
+        worst = analysis.bound()
+        if args.memory:
+            worst = analysis.bound(read_inputs(args.memory))
+            print(f"Worst-case instructions for {args.memory}: {format_bound(worst)}")
+    except FileNotFoundError:
+        print(f"Error: Could not open input file '{args.input_file}'", file=sys.stderr)
+        sys.exit(1)
+    except (SyntaxError, ValueError, KeyError) as e:
+        print(f"Assembly error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    if worst == INFINITE:
+        sys.exit(1)
+    if args.budget is not None and worst > args.budget:
+        print(f"Exceeds budget of {args.budget} instructions")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,24 @@
 
 from .parser import Parser
 from .instruction import Instruction
+from .optimizer import Optimizer
+from .scheduler import Scheduler
 
 class Assembler:
-    def __init__(self):
+    def __init__(self, optimize: bool = False, schedule: bool = False):
         self.parser = Parser()
+        self.optimizer = Optimizer() if optimize else None
+        self.scheduler = Scheduler() if schedule else None
     
     def assemble_program(self, program: str) -> List[Instruction]:
-        """Assemble a program string into a list of instructions."""
-        return self.parser.parse_program(program)
+        """Assemble a program string into a list of instructions (optimized with -O,
+        then rescheduled with --schedule)."""
+        instructions = self.parser.parse_program(program)
+        if self.optimizer:
+            instructions = self.optimizer.optimize(instructions)
+        if self.scheduler:
+            instructions = self.scheduler.schedule(instructions)
+        return instructions
     
     def generate_hex(self, instructions: List[Instruction]) -> List[str]:
         """Generate hex representation of instructions."""
@@ -64,6 +74,10 @@ def main():
     parser.add_argument('output_file', type=str, help='Output file')
     parser.add_argument('--format', choices=['hex', 'bin', 'vmem'], default='hex',
                       help='Output format (hex, bin, or vmem for Verilog)')
+    parser.add_argument('-O', '--optimize', action='store_true',
+                      help='Remove unreachable and redundant code, fold constants and thread jumps')
+    parser.add_argument('--schedule', action='store_true',
+                      help='Reorder instructions within basic blocks to reduce pipeline stalls')
     
     args = parser.parse_args()
     
@@ -73,8 +87,12 @@ def main():
             program = f.read()
         
         # Assemble program
-        assembler = Assembler()
+        assembler = Assembler(optimize=args.optimize, schedule=args.schedule)
         instructions = assembler.assemble_program(program)
+        if args.optimize:
+            print(assembler.optimizer.report())
+        if args.schedule:
+            print(assembler.scheduler.report())
         
         # Write output in specified format
         if args.format == 'hex':
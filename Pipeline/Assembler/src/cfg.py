@@ -0,0 +1,100 @@
+from typing import List, Dict, Tuple, Set, Optional
+
+from .instruction import Instruction, Opcode
+
+BRANCH_OPCODES = (Opcode.IF, Opcode.SKIPIF)
+THREE_REG_OPCODES = (Opcode.ADD, Opcode.AND, Opcode.OR, Opcode.EQ, Opcode.GT)
+ONE_SOURCE_OPCODES = (Opcode.NOT, Opcode.NEG, Opcode.SHL, Opcode.SHR, Opcode.ST,
+                      Opcode.IF, Opcode.SKIPIF)
+
+def is_branch(instr: Instruction) -> bool:
+    """True for if/skipif, which may skip the instruction after them."""
+    return instr.opcode in BRANCH_OPCODES
+
+def registers_read(instr: Instruction) -> Tuple[int, ...]:
+    """Registers an instruction reads."""
+    if instr.opcode in THREE_REG_OPCODES:
+        return (instr.rs1, instr.rs2)
+    if instr.opcode in ONE_SOURCE_OPCODES:
+        return (instr.rs1,)
+    return ()
+
+def register_written(instr: Instruction) -> Optional[int]:
+    """Register an instruction writes, if any."""
+    return instr.rd if instr.opcode not in (Opcode.JMP, Opcode.ST, Opcode.HALT) + BRANCH_OPCODES else None
+
+def successors(instructions: List[Instruction], idx: int) -> List[int]:
+    """Addresses that can execute after the instruction at idx.
+
+    An if/skipif can continue with the next instruction (its shadow) or the
+    one after it. Successors past the end of the program are dropped.
+    """
+    instr = instructions[idx]
+    if instr.opcode == Opcode.HALT:
+        targets = []
+    elif instr.opcode == Opcode.JMP:
+        targets = [instr.addr]
+    elif is_branch(instr):
+        targets = [idx + 1, idx + 2]
+    else:
+        targets = [idx + 1]
+    return [t for t in targets if 0 <= t < len(instructions)]
+
+class ControlFlowGraph:
+    """Control-flow graph of an assembled program.
+
+    Nodes are instruction addresses; basic blocks are maximal runs of
+    instructions that are entered only at the top. An instruction right
+    after an if/skipif is in that branch's shadow: it may be skipped, so it
+    always starts a new block.
+    """
+    def __init__(self, instructions: List[Instruction]):
+        self.instructions = instructions
+        count = len(instructions)
+        self.succ: List[List[int]] = [successors(instructions, i) for i in range(count)]
+        self.pred: List[List[int]] = [[] for _ in range(count)]
+        for i, targets in enumerate(self.succ):
+            for t in targets:
+                self.pred[t].append(i)
+        self.jump_targets: Set[int] = {
+            instr.addr for instr in instructions if instr.opcode == Opcode.JMP
+        }
+        self.reachable: Set[int] = self._reachable()
+        self.blocks: List[Tuple[int, int]] = self._blocks()
+        self.block_of: Dict[int, int] = {
+            i: b for b, (start, end) in enumerate(self.blocks) for i in range(start, end)
+        }
+
+    def shadowed(self, idx: int) -> bool:
+        """True if the instruction at idx may be skipped by the one before it."""
+        return idx > 0 and is_branch(self.instructions[idx - 1])
+
+    def _reachable(self) -> Set[int]:
+        seen: Set[int] = set()
+        stack = [0] if self.instructions else []
+        while stack:
+            i = stack.pop()
+            if i in seen:
+                continue
+            seen.add(i)
+            stack.extend(self.succ[i])
+        return seen
+
+    def _blocks(self) -> List[Tuple[int, int]]:
+        """Basic blocks as (start, end) address ranges, end exclusive."""
+        count = len(self.instructions)
+        leaders = {0} if count else set()
+        leaders.update(t for t in self.jump_targets if 0 <= t < count)
+        for i, instr in enumerate(self.instructions):
+            if instr.opcode in (Opcode.JMP, Opcode.HALT) or is_branch(instr):
+                leaders.add(i + 1)
+            if is_branch(instr):
+                leaders.add(i + 2)
+        starts = sorted(l for l in leaders if l < count)
+        return [(start, starts[n + 1] if n + 1 < len(starts) else count)
+                for n, start in enumerate(starts)]
+
+    def block_successors(self, block: int) -> List[int]:
+        """Indices of the blocks that can follow a block."""
+        start, end = self.blocks[block]
+        return sorted({self.block_of[t] for t in self.succ[end - 1]})
@@ -162,7 +162,31 @@ def encode(self) -> int:
             pass
             
         return encoded
-    
+
+    @classmethod
+    def decode(cls, word: int) -> 'Instruction':
+        """Decode a 16-bit instruction word (the inverse of encode)."""
+        op = Opcode((word >> 12) & 0xF)
+        a, b, c = (word >> 8) & 0xF, (word >> 4) & 0xF, word & 0xF
+
+        if op == Opcode.JMP:
+            return cls(op, addr=word & 0xFFF)
+        elif op == Opcode.LD:
+            return cls(op, rd=c, addr=(word >> 4) & 0xFF)
+        elif op == Opcode.LDI:
+            return cls(op, rd=c, imm=(word >> 4) & 0xFF)
+        elif op == Opcode.ST:
+            return cls(op, rs1=a, addr=word & 0xFF)
+        elif op in [Opcode.ADD, Opcode.AND, Opcode.OR, Opcode.EQ, Opcode.GT]:
+            return cls(op, rd=c, rs1=a, rs2=b)
+        elif op in [Opcode.NOT, Opcode.NEG]:
+            return cls(op, rd=b, rs1=a)
+        elif op in [Opcode.SHL, Opcode.SHR]:
+            return cls(op, rd=c, rs1=a, shift_amount=b)
+        elif op in [Opcode.IF, Opcode.SKIPIF]:
+            return cls(op, rs1=a)
+        return cls(op)
+
     def to_hex(self) -> str:
         """Convert the encoded instruction to a hex string."""
         return f"{self.encode():04x}"
@@ -0,0 +1,230 @@
+from dataclasses import replace
+from typing import List, Dict, Optional, Tuple
+
+from .instruction import Instruction, Opcode
+from .cfg import is_branch
+
+# Known register values at a program point (registers not present are unknown)
+RegisterValues = Dict[int, int]
+
+ALU_OPCODES = (Opcode.ADD, Opcode.AND, Opcode.OR, Opcode.EQ, Opcode.GT,
+               Opcode.NOT, Opcode.NEG, Opcode.SHL, Opcode.SHR)
+
+def evaluate(instr: Instruction, regs: RegisterValues) -> Optional[int]:
+    """Value the instruction writes to rd if it is known at compile time."""
+    op = instr.opcode
+    if op == Opcode.LDI:
+        return instr.imm & 0xFF
+    a = regs.get(instr.rs1)
+    b = regs.get(instr.rs2)
+    if op in (Opcode.EQ, Opcode.GT) and instr.rs1 == instr.rs2:
+        return 1 if op == Opcode.EQ else 0
+    if op == Opcode.AND and 0 in (a, b):
+        return 0
+    if op == Opcode.OR and 0xFF in (a, b):
+        return 0xFF
+    if a is None or (op in (Opcode.ADD, Opcode.AND, Opcode.OR, Opcode.EQ, Opcode.GT) and b is None):
+        return None
+    if op == Opcode.ADD:
+        return (a + b) & 0xFF
+    if op == Opcode.AND:
+        return a & b
+    if op == Opcode.OR:
+        return a | b
+    if op == Opcode.EQ:
+        return 1 if a == b else 0
+    if op == Opcode.GT:
+        return 1 if a > b else 0
+    if op == Opcode.NOT:
+        return ~a & 0xFF
+    if op == Opcode.NEG:
+        return -a & 0xFF
+    if op == Opcode.SHL:
+        return (a << instr.shift_amount) & 0xFF
+    if op == Opcode.SHR:
+        return a >> instr.shift_amount
+    return None
+
+def branch_skips(instr: Instruction, regs: RegisterValues) -> Optional[bool]:
+    """Whether an if/skipif skips its shadow, if known at compile time."""
+    value = regs.get(instr.rs1)
+    if value is None:
+        return None
+    return value == 0 if instr.opcode == Opcode.IF else value != 0
+
+class Optimizer:
+    """Optional (-O) passes between parsing and encoding.
+
+    Builds the control flow from jmp/if/skipif, propagates known register
+    values along it and uses them to remove unreachable code and redundant
+    loads, fold constant ALU results and branches, and thread jumps. The
+    instruction after an if/skipif (its shadow) is never removed while the
+    branch stays, since that would change what the branch skips.
+    """
+    MAX_PASSES = 8
+
+    def __init__(self):
+        self.stats: Dict[str, int] = {}
+        self.total = 0
+        self.removed = 0
+
+    def optimize(self, instructions: List[Instruction]) -> List[Instruction]:
+        """Return an optimized copy of the instructions."""
+        self.stats = {"unreachable": 0, "redundant": 0, "branches": 0, "folded": 0, "threaded": 0}
+        program = list(instructions)
+        self.total = len(instructions)
+        for _ in range(self.MAX_PASSES):
+            program, changed = self.run_pass(program)
+            if not changed:
+                break
+        self.removed = len(instructions) - len(program)
+        return program
+
+    def report(self) -> str:
+        """One-line summary of the last optimize() call."""
+        s = self.stats
+        return (f"Optimizer removed {self.removed} of {self.total} instructions "
+                f"({s['unreachable']} unreachable, {s['redundant']} redundant, "
+                f"{s['branches']} constant branches); folded {s['folded']} constants, "
+                f"threaded {s['threaded']} jumps")
+
+    def propagate(self, program: List[Instruction]) -> List[Optional[RegisterValues]]:
+        """Known register values before each instruction, None if it is unreachable.
+        Registers start out unknown; branches with a known condition follow one edge."""
+        count = len(program)
+        values: List[Optional[RegisterValues]] = [None] * count
+        if not count:
+            return values
+        values[0] = {}
+        work = [0]
+        while work:
+            i = work.pop()
+            regs, targets = self.transfer(program, i, values[i])
+            for t in targets:
+                if not 0 <= t < count:
+                    continue
+                if values[t] is None:
+                    merged = dict(regs)
+                else:
+                    merged = {r: v for r, v in values[t].items() if regs.get(r) == v}
+                    if merged == values[t]:
+                        continue
+                values[t] = merged
+                work.append(t)
+        return values
+
+    def transfer(self, program: List[Instruction], idx: int,
+                 regs: RegisterValues) -> Tuple[RegisterValues, List[int]]:
+        """Register values after an instruction and the addresses it can continue at."""
+        instr = program[idx]
+        op = instr.opcode
+        if op == Opcode.HALT:
+            return regs, []
+        if op == Opcode.JMP:
+            return regs, [instr.addr]
+        if is_branch(instr):
+            skips = branch_skips(instr, regs)
+            if skips is None:
+                return regs, [idx + 1, idx + 2]
+            return regs, [idx + 2 if skips else idx + 1]
+        if op == Opcode.LD or op == Opcode.LDI or op in ALU_OPCODES:
+            out = dict(regs)
+            value = evaluate(instr, regs)
+            if value is None:
+                out.pop(instr.rd, None)
+            else:
+                out[instr.rd] = value
+            return out, [idx + 1]
+        return regs, [idx + 1]
+
+    def thread_jumps(self, program: List[Instruction]) -> List[Instruction]:
+        """Point jumps that land on other jumps at the final target."""
+        threaded = list(program)
+        for i, instr in enumerate(program):
+            if instr.opcode != Opcode.JMP:
+                continue
+            target, seen = instr.addr, {i}
+            while 0 <= target < len(program) and program[target].opcode == Opcode.JMP and target not in seen:
+                seen.add(target)
+                target = program[target].addr
+            if target != instr.addr and target not in seen:
+                threaded[i] = replace(instr, addr=target)
+                self.stats["threaded"] += 1
+        return threaded
+
+    def run_pass(self, program: List[Instruction]) -> Tuple[List[Instruction], bool]:
+        """One round of all transformations, returns (program, changed)."""
+        program = self.thread_jumps(program)
+        values = self.propagate(program)
+        count = len(program)
+        new = list(program)
+        delete = [False] * count
+        changed = False
+
+        # Branches first, since they decide which instructions are shadowed
+        for i, instr in enumerate(program):
+            regs = values[i]
+            if regs is None:
+                delete[i] = True
+                self.stats["unreachable"] += 1
+            elif is_branch(instr):
+                skips = branch_skips(instr, regs)
+                if skips:
+                    # Always skips: jump over the shadow instead
+                    new[i] = Instruction(Opcode.JMP, addr=i + 2)
+                    self.stats["branches"] += 1
+                elif skips is False and not self.shadowed(new, delete, i):
+                    delete[i] = True
+                    self.stats["branches"] += 1
+
+        for i, instr in enumerate(program):
+            regs = values[i]
+            if regs is None or instr.opcode not in ALU_OPCODES + (Opcode.LDI,):
+                continue
+            value = evaluate(instr, regs)
+            if value is None:
+                continue
+            if regs.get(instr.rd) == value and not self.shadowed(new, delete, i):
+                delete[i] = True
+                self.stats["redundant"] += 1
+            elif instr.opcode != Opcode.LDI:
+                new[i] = Instruction(Opcode.LDI, rd=instr.rd, imm=value)
+                self.stats["folded"] += 1
+                changed = True
+
+        # Jumps to the next remaining instruction do nothing
+        for i in range(count):
+            if delete[i] or new[i].opcode != Opcode.JMP or self.shadowed(new, delete, i):
+                continue
+            if new[i].addr > i and all(delete[i + 1:new[i].addr]):
+                delete[i] = True
+                self.stats["redundant"] += 1
+
+        if any(delete):
+            changed = True
+        if new != program:
+            changed = True
+        return self.compact(new, delete), changed
+
+    def shadowed(self, program: List[Instruction], delete: List[bool], idx: int) -> bool:
+        """True if idx follows a branch that is kept."""
+        return idx > 0 and not delete[idx - 1] and is_branch(program[idx - 1])
+
+    def compact(self, program: List[Instruction], delete: List[bool]) -> List[Instruction]:
+        """Drop deleted instructions and renumber jump targets."""
+        # A deleted address maps to the next instruction that is kept
+        new_address = [0] * (len(program) + 1)
+        address = sum(1 for d in delete if not d)
+        new_address[len(program)] = address
+        for i in range(len(program) - 1, -1, -1):
+            if not delete[i]:
+                address -= 1
+            new_address[i] = address if not delete[i] else new_address[i + 1]
+        result = []
+        for i, instr in enumerate(program):
+            if delete[i]:
+                continue
+            if instr.opcode == Opcode.JMP and 0 <= instr.addr <= len(program):
+                instr = replace(instr, addr=new_address[instr.addr])
+            result.append(instr)
+        return result
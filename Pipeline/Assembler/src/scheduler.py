@@ -0,0 +1,115 @@
+from typing import List, Dict, Set
+
+from .instruction import Instruction, Opcode
+from .cfg import ControlFlowGraph, is_branch, registers_read, register_written
+
+# Stall model of the 5-stage pipeline with forwarding:
+#   - an ld result reaches the next instruction one cycle late (load-use)
+#   - if/skipif evaluate their condition in decode, so a result produced by
+#     the instruction right before them stalls one cycle (two for an ld),
+#     and an ld two instructions earlier still stalls one cycle
+LOAD_USE_STALLS = 1
+BRANCH_ALU_STALLS = 1
+BRANCH_LOAD_STALLS = 2
+
+def stall_cycles(instr: Instruction, previous: List[Instruction]) -> int:
+    """Stall cycles instr costs after the (up to two) instructions before it."""
+    reads = registers_read(instr)
+    if not reads:
+        return 0
+    if previous and register_written(previous[-1]) in reads:
+        loaded = previous[-1].opcode == Opcode.LD
+        if is_branch(instr):
+            return BRANCH_LOAD_STALLS if loaded else BRANCH_ALU_STALLS
+        return LOAD_USE_STALLS if loaded else 0
+    if (len(previous) > 1 and is_branch(instr) and previous[-2].opcode == Opcode.LD
+            and register_written(previous[-2]) in reads):
+        return BRANCH_LOAD_STALLS - 1
+    return 0
+
+def estimate_stalls(instructions: List[Instruction], start: int = 0, end: int = None) -> int:
+    """Static stall estimate for instructions[start:end], in program order."""
+    end = len(instructions) if end is None else end
+    return sum(stall_cycles(instructions[i], instructions[max(0, i - 2):i])
+               for i in range(start, end))
+
+def depends(later: Instruction, earlier: Instruction) -> bool:
+    """True if later must stay after earlier (register or memory dependence)."""
+    written = register_written(earlier)
+    if written is not None and (written in registers_read(later) or written == register_written(later)):
+        return True
+    if register_written(later) in registers_read(earlier):
+        return True
+    memory_ops = (Opcode.LD, Opcode.ST)
+    if (earlier.opcode in memory_ops and later.opcode in memory_ops
+            and Opcode.ST in (earlier.opcode, later.opcode)):
+        return earlier.addr == later.addr
+    return False
+
+class Scheduler:
+    """Reorder instructions within basic blocks to hide pipeline stalls.
+
+    Only instructions inside one basic block move, block boundaries, jump
+    targets and the instruction in an if/skipif shadow stay where they are,
+    and every register and memory dependence keeps its order. A block is
+    only rewritten if its estimated stalls go down.
+    """
+    def __init__(self):
+        self.stalls_before = 0
+        self.stalls_after = 0
+        self.moved = 0
+
+    def schedule(self, instructions: List[Instruction]) -> List[Instruction]:
+        """Return a rescheduled copy of the instructions."""
+        program = list(instructions)
+        self.stalls_before = estimate_stalls(program)
+        self.moved = 0
+        for start, end in ControlFlowGraph(program).blocks:
+            # Control flow ends a block and stays last
+            body_end = end - 1 if program[end - 1].opcode in (Opcode.JMP, Opcode.HALT) or is_branch(program[end - 1]) else end
+            if body_end - start < 2:
+                continue
+            window_end = min(end + 2, len(program))
+            original = program[start:body_end]
+            before = estimate_stalls(program, start, window_end)
+            program[start:body_end] = self.schedule_block(original, program[max(0, start - 2):start],
+                                                          program[body_end:window_end])
+            if estimate_stalls(program, start, window_end) < before:
+                self.moved += sum(1 for a, b in zip(original, program[start:body_end]) if a is not b)
+            else:
+                program[start:body_end] = original
+        self.stalls_after = estimate_stalls(program)
+        return program
+
+    def schedule_block(self, body: List[Instruction], context: List[Instruction],
+                       tail: List[Instruction]) -> List[Instruction]:
+        """Greedy list scheduling of a block body.
+
+        Among the instructions whose dependences are met, pick the one that
+        stalls least after what was already placed, then the one with the
+        longest chain of dependent instructions (including the block's
+        terminator in tail), then the original order.
+        """
+        count = len(body)
+        preds: Dict[int, Set[int]] = {i: {j for j in range(i) if depends(body[i], body[j])}
+                                      for i in range(count)}
+        height = [1] * count
+        for i in range(count - 1, -1, -1):
+            users = [height[k] for k in range(i + 1, count) if i in preds[k]]
+            if any(depends(t, body[i]) for t in tail[:1]):
+                users.append(1)
+            height[i] = 1 + max(users, default=0)
+
+        placed: List[int] = []
+        scheduled = list(context)
+        while len(placed) < count:
+            ready = [i for i in range(count) if i not in placed and preds[i] <= set(placed)]
+            best = min(ready, key=lambda i: (stall_cycles(body[i], scheduled[-2:]), -height[i], i))
+            placed.append(best)
+            scheduled.append(body[best])
+        return [body[i] for i in placed]
+
+    def report(self) -> str:
+        """One-line summary of the last schedule() call."""
+        return (f"Scheduler moved {self.moved} instructions, "
+                f"estimated stalls {self.stalls_before} -> {self.stalls_after}")
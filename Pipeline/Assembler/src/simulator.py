@@ -0,0 +1,75 @@
+from typing import List, Optional
+
+from .instruction import Instruction, Opcode
+
+class SimulationResult:
+    """Final state of a simulated program."""
+    def __init__(self, registers: List[int], memory: List[int], instruction_count: int, status: str):
+        self.registers = registers
+        self.memory = memory
+        self.instruction_count = instruction_count
+        self.status = status  # halted, completed (ran past the end) or limit
+
+def simulate(instructions: List[Instruction], memory: Optional[List[int]] = None,
+             max_steps: Optional[int] = None) -> SimulationResult:
+    """Execute assembled instructions on the ISA as the binary encodes it.
+
+    This is a reference model for checking other implementations: jmp
+    targets are instruction indices, values wrap to 8 bits, an instruction
+    skipped by if/skipif counts as executed and halt does not, as in the
+    emulator.
+    """
+    reg = [0] * 16
+    mem = list(memory) if memory is not None else [0] * 256
+    mem += [0] * (256 - len(mem))
+    pc, skip, count = 0, False, 0
+    while True:
+        if not 0 <= pc < len(instructions):
+            status = "completed"
+            break
+        if count == max_steps:
+            status = "limit"
+            break
+        if skip:
+            skip = False
+            pc += 1
+            count += 1
+            continue
+        instr = instructions[pc]
+        op = instr.opcode
+        pc += 1
+        if op == Opcode.HALT:
+            status = "halted"
+            break
+        elif op == Opcode.JMP:
+            pc = instr.addr
+        elif op == Opcode.IF:
+            skip = reg[instr.rs1] == 0
+        elif op == Opcode.SKIPIF:
+            skip = reg[instr.rs1] != 0
+        elif op == Opcode.LD:
+            reg[instr.rd] = mem[instr.addr & 0xFF]
+        elif op == Opcode.LDI:
+            reg[instr.rd] = instr.imm & 0xFF
+        elif op == Opcode.ST:
+            mem[instr.addr & 0xFF] = reg[instr.rs1]
+        elif op == Opcode.ADD:
+            reg[instr.rd] = (reg[instr.rs1] + reg[instr.rs2]) & 0xFF
+        elif op == Opcode.AND:
+            reg[instr.rd] = reg[instr.rs1] & reg[instr.rs2]
+        elif op == Opcode.OR:
+            reg[instr.rd] = reg[instr.rs1] | reg[instr.rs2]
+        elif op == Opcode.EQ:
+            reg[instr.rd] = 1 if reg[instr.rs1] == reg[instr.rs2] else 0
+        elif op == Opcode.GT:
+            reg[instr.rd] = 1 if reg[instr.rs1] > reg[instr.rs2] else 0
+        elif op == Opcode.NOT:
+            reg[instr.rd] = ~reg[instr.rs1] & 0xFF
+        elif op == Opcode.NEG:
+            reg[instr.rd] = -reg[instr.rs1] & 0xFF
+        elif op == Opcode.SHL:
+            reg[instr.rd] = (reg[instr.rs1] << instr.shift_amount) & 0xFF
+        elif op == Opcode.SHR:
+            reg[instr.rd] = reg[instr.rs1] >> instr.shift_amount
+        count += 1
+    return SimulationResult(reg, mem, count, status)
@@ -0,0 +1,479 @@
+import argparse
+import random
+import sys
+import time
+from typing import List, Dict, Optional, Set, Tuple
+
+from .instruction import Instruction, Opcode
+from .cfg import ControlFlowGraph, registers_read, register_written
+from .parser import Parser
+from .scheduler import estimate_stalls
+
+# Values are evaluated SWAR style: one Python int holds many test vectors,
+# one 8-bit value per 16-bit lane. Bit 8 of each lane catches carries and
+# borrows, so every 8-bit operation is a handful of big-int operations
+# regardless of the number of lanes.
+LANE_BITS = 16
+
+RANDOM_VECTORS = 32      # Random test vectors besides the corner cases
+CORNER_VALUES = (0x00, 0x01, 0x7F, 0x80, 0xFF)
+EXHAUSTIVE_INPUTS = 3    # Inputs checked over every 8-bit combination
+SAMPLED_CASES = 1 << 16  # Random cases when there are more inputs
+MAX_SOLUTIONS = 64       # Equal-length solutions compared for stalls
+
+COMMUTATIVE = (Opcode.ADD, Opcode.AND, Opcode.OR, Opcode.EQ)
+BINARY = COMMUTATIVE + (Opcode.GT,)
+UNARY = (Opcode.NOT, Opcode.NEG)
+SHIFTS = (Opcode.SHL, Opcode.SHR)
+STRAIGHT_LINE = BINARY + UNARY + SHIFTS + (Opcode.LDI, Opcode.LD, Opcode.ST)
+
+class Lanes:
+    """Constants for SWAR evaluation over a number of lanes."""
+    def __init__(self, count: int):
+        self.count = count
+        self.ones = int.from_bytes(b"\x01\x00" * count, "little")
+        self.mask = self.ones * 0xFF
+        self.shl_keep = [self.ones * (0xFF >> n) for n in range(8)]
+
+    def pack(self, values: List[int]) -> int:
+        """One int holding values[i] in lane i"""
+        return int.from_bytes(b"".join(bytes((v & 0xFF, 0)) for v in values), "little")
+
+    def unpack(self, packed: int) -> List[int]:
+        data = packed.to_bytes(self.count * 2, "little")
+        return list(data[::2])
+
+    def constant(self, value: int) -> int:
+        return self.ones * (value & 0xFF)
+
+    def apply(self, op: Opcode, a: int, b: int, param: int) -> int:
+        """Lane-wise result of an ALU operation (b is the second register, param
+        the shift amount or immediate)"""
+        mask, ones = self.mask, self.ones
+        if op == Opcode.ADD:
+            return (a + b) & mask
+        if op == Opcode.AND:
+            return a & b
+        if op == Opcode.OR:
+            return a | b
+        if op == Opcode.NOT:
+            return a ^ mask
+        if op == Opcode.NEG:
+            return ((a ^ mask) + ones) & mask
+        if op == Opcode.EQ:
+            # A lane of a ^ b plus 0xff carries into bit 8 unless it is zero
+            return ((((a ^ b) + mask) >> 8) & ones) ^ ones
+        if op == Opcode.GT:
+            # b + (0xff - a) + 1 = b - a + 256 carries into bit 8 iff b >= a
+            return (((b + (a ^ mask) + ones) >> 8) & ones) ^ ones
+        if op == Opcode.SHL:
+            return (a & self.shl_keep[param]) << param
+        if op == Opcode.SHR:
+            return (a >> param) & self.shl_keep[param]
+        if op == Opcode.LDI:
+            return self.constant(param)
+        raise ValueError(f"Cannot evaluate {op.name}")
+
+# An operation on locations: (opcode, destination, source 1, source 2, parameter).
+# Locations index registers and memory bytes; ld/st copy between them.
+Operation = Tuple[Opcode, int, Optional[int], Optional[int], Optional[int]]
+
+class Target:
+    """A straight-line instruction sequence and what a replacement must preserve.
+
+    Inputs are the registers and memory bytes read before the sequence
+    writes them. Outputs are the live-out registers it writes and every
+    byte it stores. A replacement may only write the target's output
+    registers and the given scratch registers.
+    """
+    def __init__(self, instructions: List[Instruction], live_out: Optional[Set[int]] = None,
+                 scratch: Set[int] = frozenset()):
+        for instr in instructions:
+            if instr.opcode not in STRAIGHT_LINE:
+                raise ValueError(f"Only straight-line ALU, ldi, ld and st code can be optimized, not {instr.opcode.name.lower()}")
+        self.instructions = instructions
+        self.locations: List[Tuple[str, int]] = []
+        self.index: Dict[Tuple[str, int], int] = {}
+        written: Set[int] = set()
+        inputs: List[int] = []
+        stored: Set[int] = set()
+        for instr in instructions:
+            for reg in registers_read(instr):
+                if reg not in written and self.location('reg', reg) not in inputs:
+                    inputs.append(self.location('reg', reg))
+            if instr.opcode == Opcode.LD:
+                addr = instr.addr & 0xFF
+                if addr not in stored and self.location('mem', addr) not in inputs:
+                    inputs.append(self.location('mem', addr))
+            if instr.opcode == Opcode.ST:
+                stored.add(instr.addr & 0xFF)
+                self.location('mem', instr.addr & 0xFF)
+            reg = register_written(instr)
+            if reg is not None:
+                written.add(reg)
+                self.location('reg', reg)
+        for reg in sorted(scratch):
+            self.location('reg', reg)
+        live = written if live_out is None else written & set(live_out)
+        self.inputs = inputs
+        self.outputs = [self.index[('reg', r)] for r in sorted(live)] + [self.index[('mem', a)] for a in sorted(stored)]
+        self.writable = [self.index[('reg', r)] for r in sorted(written | set(scratch))]
+        self.registers = [i for i, (kind, _) in enumerate(self.locations) if kind == 'reg']
+        self.loads = [self.index[('mem', a)] for a in sorted({i.addr & 0xFF for i in instructions if i.opcode == Opcode.LD})]
+        self.stores = [self.index[('mem', a)] for a in sorted(stored)]
+        self.constants = sorted({0x00, 0x01, 0xFF} | {i.imm & 0xFF for i in instructions if i.opcode == Opcode.LDI})
+        self.operations = [self.operation(instr) for instr in instructions]
+        self.stalls = estimate_stalls(instructions)
+
+    def location(self, kind: str, number: int) -> int:
+        key = (kind, number)
+        if key not in self.index:
+            self.index[key] = len(self.locations)
+            self.locations.append(key)
+        return self.index[key]
+
+    def operation(self, instr: Instruction) -> Operation:
+        op = instr.opcode
+        if op == Opcode.LD:
+            return (op, self.index[('reg', instr.rd)], self.index[('mem', instr.addr & 0xFF)], None, None)
+        if op == Opcode.ST:
+            return (op, self.index[('mem', instr.addr & 0xFF)], self.index[('reg', instr.rs1)], None, None)
+        if op == Opcode.LDI:
+            return (op, self.index[('reg', instr.rd)], None, None, instr.imm & 0xFF)
+        if op in SHIFTS:
+            return (op, self.index[('reg', instr.rd)], self.index[('reg', instr.rs1)], None, instr.shift_amount)
+        rs2 = self.index[('reg', instr.rs2)] if op in BINARY else None
+        return (op, self.index[('reg', instr.rd)], self.index[('reg', instr.rs1)], rs2, None)
+
+    def instruction(self, operation: Operation) -> Instruction:
+        op, dst, a, b, param = operation
+        number = lambda loc: self.locations[loc][1]
+        if op == Opcode.LD:
+            return Instruction(op, rd=number(dst), addr=number(a))
+        if op == Opcode.ST:
+            return Instruction(op, rs1=number(a), addr=number(dst))
+        if op == Opcode.LDI:
+            return Instruction(op, rd=number(dst), imm=param)
+        if op in SHIFTS:
+            return Instruction(op, rd=number(dst), rs1=number(a), shift_amount=param)
+        if op in BINARY:
+            return Instruction(op, rd=number(dst), rs1=number(a), rs2=number(b))
+        return Instruction(op, rd=number(dst), rs1=number(a))
+
+    def run(self, operations: List[Operation], state: List[int], lanes: Lanes) -> List[int]:
+        state = list(state)
+        for op, dst, a, b, param in operations:
+            if op in (Opcode.LD, Opcode.ST):
+                state[dst] = state[a]
+            else:
+                state[dst] = lanes.apply(op, state[a] if a is not None else 0,
+                                         state[b] if b is not None else 0, param)
+        return state
+
+class Superoptimizer:
+    """Search for the shortest equivalent of a straight-line sequence.
+
+    Candidates are enumerated by iterative deepening over the locations the
+    target uses, evaluated incrementally on a batch of random and corner
+    case test vectors. A branch is cut as soon as more outputs differ from
+    the target than instructions remain, when an instruction changes
+    nothing, or when the same state was already explored with as many
+    instructions left. Survivors are checked over every combination of
+    8-bit inputs (a large random sample beyond EXHAUSTIVE_INPUTS inputs).
+    """
+    def __init__(self, target: Target, seed: int = 0, vectors: int = RANDOM_VECTORS):
+        self.target = target
+        rng = random.Random(seed)
+        count = len(target.locations)
+        columns = [[rng.randrange(256) for _ in range(vectors)] for _ in range(count)]
+        for value in CORNER_VALUES:
+            for col in columns:
+                col.append(value)
+        for loc in range(count):
+            # Each corner value per location, with the others random
+            for value in CORNER_VALUES:
+                for other, col in enumerate(columns):
+                    col.append(value if other == loc else rng.randrange(256))
+        self.lanes = Lanes(len(columns[0]))
+        self.start = [self.lanes.pack(col) for col in columns]
+        self.goal = target.run(target.operations, self.start, self.lanes)
+        self.explored = 0
+        self.rejected = 0
+        self.verified_cases = 0
+        self.exhaustive = True
+        self.max_stalls = None
+
+    def candidates(self, state: List[int], defined: Set[int], writable: List[int]):
+        """Every operation that reads only defined locations and writes a writable one"""
+        t = self.target
+        regs = [loc for loc in t.registers if loc in defined]
+        for dst in writable:
+            if t.locations[dst][0] == 'mem':
+                for src in regs:
+                    yield (Opcode.ST, dst, src, None, None)
+                continue
+            for op in BINARY:
+                for i, a in enumerate(regs):
+                    for b in (regs[i:] if op in COMMUTATIVE else regs):
+                        if a != b or op == Opcode.OR:
+                            yield (op, dst, a, b, None)
+            for op in UNARY:
+                for a in regs:
+                    yield (op, dst, a, None, None)
+            for op in SHIFTS:
+                for a in regs:
+                    for n in range(1, 8):
+                        yield (op, dst, a, None, n)
+            for value in t.constants:
+                yield (Opcode.LDI, dst, None, None, value)
+            for src in t.loads:
+                if src in defined:
+                    yield (Opcode.LD, dst, src, None, None)
+
+    def search(self, max_length: int, deadline: Optional[float] = None) -> List[List[Operation]]:
+        """Verified replacements of the shortest length found (all of them up to
+        MAX_SOLUTIONS), shorter than the target or as long with fewer stalls"""
+        t = self.target
+        limit = min(max_length, len(t.instructions))
+        for length in range(1, limit + 1):
+            solutions: List[List[Operation]] = []
+            seen: List[Set] = [set() for _ in range(length + 1)]
+            # As long as the target only pays off with fewer stalls
+            self.max_stalls = t.stalls - 1 if length == len(t.instructions) else None
+            self.extend([], self.start, set(t.inputs), length, seen, solutions, deadline)
+            if solutions:
+                return solutions
+        return []
+
+    def extend(self, prefix, state, defined, remaining, seen, solutions, deadline):
+        if len(solutions) >= MAX_SOLUTIONS:
+            return
+        mismatched = [loc for loc in self.target.outputs if state[loc] != self.goal[loc]]
+        if len(mismatched) > remaining:
+            return
+        if remaining == 0:
+            if self.max_stalls is not None and estimate_stalls(self.instructions(prefix)) > self.max_stalls:
+                return
+            if self.verify(prefix):
+                solutions.append(list(prefix))
+            else:
+                self.rejected += 1
+            return
+        key = tuple(state[loc] for loc in sorted(defined)) + tuple(sorted(defined))
+        if key in seen[remaining]:
+            return
+        seen[remaining].add(key)
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError
+        # With as many mismatches as instructions left, each must fix one of them
+        writable = mismatched if len(mismatched) == remaining else self.target.writable + [
+            loc for loc in self.target.stores if loc not in self.target.writable]
+        lanes = self.lanes
+        for operation in self.candidates(state, defined, writable):
+            op, dst, a, b, param = operation
+            if op in (Opcode.LD, Opcode.ST):
+                value = state[a]
+            else:
+                value = lanes.apply(op, state[a] if a is not None else 0,
+                                    state[b] if b is not None else 0, param)
+            if value == state[dst] and dst in defined:
+                continue
+            self.explored += 1
+            new_state = list(state)
+            new_state[dst] = value
+            prefix.append(operation)
+            self.extend(prefix, new_state, defined | {dst}, remaining - 1, seen, solutions, deadline)
+            prefix.pop()
+
+    def verify(self, operations: List[Operation]) -> bool:
+        """Compare a candidate with the target over every combination of inputs"""
+        t = self.target
+        inputs = t.inputs
+        exhaustive = len(inputs) <= EXHAUSTIVE_INPUTS
+        self.exhaustive = exhaustive
+        for state, cases in self.verification_batches(inputs, exhaustive):
+            expected = t.run(t.operations, state, self.case_lanes)
+            actual = t.run(operations, state, self.case_lanes)
+            if any(expected[loc] != actual[loc] for loc in t.outputs):
+                return False
+            self.verified_cases = cases
+        return True
+
+    def verification_batches(self, inputs: List[int], exhaustive: bool):
+        """(state, cases checked so far) batches of at most 65536 lanes"""
+        count = len(self.target.locations)
+        if not exhaustive:
+            rng = random.Random(1)
+            self.case_lanes = Lanes(SAMPLED_CASES)
+            state = [0] * count
+            for loc in inputs:
+                state[loc] = self.case_lanes.pack([rng.randrange(256) for _ in range(SAMPLED_CASES)])
+            yield state, SAMPLED_CASES
+            return
+        inner = inputs[-2:]
+        outer = inputs[:-2]
+        self.case_lanes = Lanes(256 ** len(inner))
+        columns = _exhaustive_columns(len(inner))
+        for n, high in enumerate(range(256 ** len(outer))):
+            state = [0] * count
+            for loc, column in zip(inner, columns):
+                state[loc] = column
+            for loc in outer:
+                state[loc] = self.case_lanes.constant(high)
+            yield state, (n + 1) * self.case_lanes.count
+
+    def instructions(self, operations: List[Operation]) -> List[Instruction]:
+        return [self.target.instruction(op) for op in operations]
+
+_columns_cache: Dict[int, List[int]] = {}
+
+def _exhaustive_columns(count: int) -> List[int]:
+    """Packed columns enumerating every combination of count (<= 2) bytes"""
+    if count not in _columns_cache:
+        lanes = Lanes(256 ** count)
+        if count == 0:
+            columns = []
+        elif count == 1:
+            columns = [lanes.pack(list(range(256)))]
+        else:
+            columns = [lanes.pack([j >> 8 for j in range(65536)]),
+                       lanes.pack([j & 0xFF for j in range(65536)])]
+        _columns_cache[count] = columns
+    return _columns_cache[count]
+
+def live_registers(instructions: List[Instruction]) -> List[Set[int]]:
+    """Registers live before each instruction (none are live at the end)"""
+    cfg = ControlFlowGraph(instructions)
+    live_in: List[Set[int]] = [set() for _ in instructions]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(instructions) - 1, -1, -1):
+            out = set().union(*(live_in[s] for s in cfg.succ[i])) if cfg.succ[i] else set()
+            written = register_written(instructions[i])
+            new = set(registers_read(instructions[i])) | (out - ({written} if written is not None else set()))
+            if new != live_in[i]:
+                live_in[i] = new
+                changed = True
+    return live_in
+
+def straight_line_windows(instructions: List[Instruction], window: int):
+    """(start, end) of every straight-line run of 2..window instructions inside a basic block"""
+    cfg = ControlFlowGraph(instructions)
+    for start, end in cfg.blocks:
+        run_start = start
+        for i in range(start, end + 1):
+            if i == end or instructions[i].opcode not in STRAIGHT_LINE:
+                for a in range(run_start, i):
+                    for b in range(a + 2, min(a + window, i) + 1):
+                        yield a, b
+                run_start = i + 1
+
+def format_instruction(instr: Instruction) -> str:
+    op = instr.opcode
+    if op == Opcode.LD:
+        return f"ld 0x{instr.addr:02x} r{instr.rd}"
+    if op == Opcode.ST:
+        return f"st r{instr.rs1} 0x{instr.addr:02x}"
+    if op == Opcode.LDI:
+        return f"ldi 0x{instr.imm:02x} r{instr.rd}"
+    if op in SHIFTS:
+        return f"{op.name.lower()} r{instr.rs1} {instr.shift_amount} r{instr.rd}"
+    if op in BINARY:
+        return f"{op.name.lower()} r{instr.rs1} r{instr.rs2} r{instr.rd}"
+    return f"{op.name.lower()} r{instr.rs1} r{instr.rd}"
+
+def optimize_block(instructions: List[Instruction], live_out: Optional[Set[int]], scratch: Set[int],
+                   max_length: int, timeout: Optional[float]) -> Tuple[Target, Superoptimizer, List[Instruction]]:
+    """Best replacement of a straight-line sequence ([] if none was found)"""
+    target = Target(instructions, live_out, scratch)
+    search = Superoptimizer(target)
+    deadline = time.perf_counter() + timeout if timeout else None
+    try:
+        solutions = search.search(max_length, deadline)
+    except TimeoutError:
+        solutions = []
+    if not solutions:
+        return target, search, []
+    best = min(solutions, key=lambda s: estimate_stalls(search.instructions(s)))
+    return target, search, search.instructions(best)
+
+def parse_registers(text: Optional[str]) -> Optional[Set[int]]:
+    if text is None:
+        return None
+    return {int(r.strip()[1:]) for r in text.split(',') if r.strip()}
+
+def report(target: Target, search: Superoptimizer, replacement: List[Instruction], elapsed: float) -> List[str]:
+    names = lambda locs: ", ".join(f"r{n}" if kind == 'reg' else f"mem[0x{n:02x}]"
+                                   for kind, n in (target.locations[l] for l in locs)) or "none"
+    lines = [f"Inputs: {names(target.inputs)}; outputs: {names(target.outputs)}"]
+    if not replacement:
+        lines.append(f"No shorter or faster replacement found "
+                     f"({search.explored} candidates in {elapsed:.2f}s)")
+        return lines
+    how = (f"verified over all {search.verified_cases} input combinations" if search.exhaustive
+           else f"checked on {search.verified_cases} random inputs (too many inputs for an exhaustive check)")
+    lines.append(f"Replacement: {len(replacement)} instructions, {estimate_stalls(replacement)} stalls "
+                 f"(was {len(target.instructions)}, {target.stalls}), {how}; "
+                 f"{search.explored} candidates in {elapsed:.2f}s")
+    lines += [f"  {format_instruction(instr)}" for instr in replacement]
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description='TUCA superoptimizer for straight-line code')
+    parser.add_argument('input_file', type=str, help='Assembly file (the whole file is the target unless --block or --scan)')
+    parser.add_argument('--block', type=int, nargs=2, metavar=('START', 'END'),
+                        help='Optimize instructions START..END-1 (instruction indices)')
+    parser.add_argument('--scan', action='store_true',
+                        help='Try every straight-line window of the program, using register liveness')
+    parser.add_argument('--window', type=int, default=4, help='Longest window tried by --scan (default: 4)')
+    parser.add_argument('--live', type=str, help='Live-out registers, e.g. r2,r3 (default: all written)')
+    parser.add_argument('--scratch', type=str, default='', help='Extra registers a replacement may clobber')
+    parser.add_argument('--max-length', type=int, default=3, help='Longest replacement tried (default: 3)')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds per target (default: 60)')
+    args = parser.parse_args()
+
+    try:
+        with open(args.input_file) as f:
+            program = Parser().parse_program(f.read())
+    except FileNotFoundError:
+        print(f"Error: Could not open input file '{args.input_file}'", file=sys.stderr)
+        sys.exit(1)
+    except (SyntaxError, ValueError) as e:
+        print(f"Assembly error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    scratch = parse_registers(args.scratch) or set()
+    if args.scan:
+        live = live_registers(program)
+        found = 0
+        for start, end in straight_line_windows(program, args.window):
+            live_out = live[end] if end < len(program) else set()
+            began = time.perf_counter()
+            try:
+                target, search, replacement = optimize_block(program[start:end], live_out, scratch,
+                                                             min(args.max_length, end - start), args.timeout)
+            except ValueError:
+                continue
+            if replacement:
+                found += 1
+                print(f"0x{start*2:03x}-0x{(end-1)*2:03x}:")
+                print("\n".join(f"  {format_instruction(i)}" for i in program[start:end]))
+                print("\n".join(report(target, search, replacement, time.perf_counter() - began)))
+        print(f"{found} windows can be replaced")
+        return
+
+    start, end = args.block if args.block else (0, len(program))
+    began = time.perf_counter()
+    try:
+        target, search, replacement = optimize_block(program[start:end], parse_registers(args.live),
+                                                     scratch, args.max_length, args.timeout)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print("Target:")
+    print("\n".join(f"  {format_instruction(i)}" for i in program[start:end]))
+    print("\n".join(report(target, search, replacement, time.perf_counter() - began)))
+
+if __name__ == '__main__':
+    main()
@@ -3,24 +3,624 @@
 # Modified by Andres Antillon and Claude 3.5 Sonnet
 # Released 5/29/2023
 
+import re
+import mmap
+import operator
+from array import array
+
+# Added: Decoded instruction codes used by the fast execution path
+(OP_TEXT, OP_HALT, OP_SKIPIF, OP_IF, OP_LD, OP_LDR, OP_LDI, OP_ST, OP_STR,
+ OP_ADD, OP_AND, OP_OR, OP_NOT, OP_NEG, OP_SHL, OP_SHR, OP_EQ, OP_GT,
+ OP_LOADPC, OP_JMP, OP_JMPR, OP_LD_IO, OP_ST_IO) = range(23)
+
+def expand_macros(inst_str, macros):
+    """Replace macros in an instruction the same way execute_instruction does"""
+    for tag, value in macros.items():
+        if tag in inst_str:
+            inst_str = inst_str.replace(tag, value)
+    return inst_str
+
+def decode_instruction(inst_str, macros, labels):
+    """Decode an instruction into an (opcode, a, b, c) tuple.
+
+    Anything that cannot be decoded becomes OP_TEXT, which the fast path
+    hands back to execute_instruction so errors are reported exactly as in
+    the text interpreter.
+    """
+    inst = expand_macros(inst_str, macros).split()
+    try:
+        op = inst[0]
+        if op == "halt":
+            return (OP_HALT, 0, 0, 0)
+        elif op == "skipif":
+            return (OP_SKIPIF, int(inst[1][1:]), 0, 0)
+        elif op == "if":
+            return (OP_IF, int(inst[1][1:]), 0, 0)
+        elif op == "ld":
+            return (OP_LD, int(inst[1], 16), int(inst[2][1:]), 0)
+        elif op == "ldr":
+            return (OP_LDR, int(inst[1][1:]), int(inst[2][1:]), 0)
+        elif op == "ldi":
+            return (OP_LDI, int(inst[1], 16), int(inst[2][1:]), 0)
+        elif op == "st":
+            return (OP_ST, int(inst[1][1:]), int(inst[2], 16), 0)
+        elif op == "str":
+            return (OP_STR, int(inst[1][1:]), int(inst[2][1:]), 0)
+        elif op in ("add", "and", "or", "eq", "gt"):
+            code = {"add": OP_ADD, "and": OP_AND, "or": OP_OR, "eq": OP_EQ, "gt": OP_GT}[op]
+            return (code, int(inst[1][1:]), int(inst[2][1:]), int(inst[3][1:]))
+        elif op in ("not", "neg"):
+            code = OP_NOT if op == "not" else OP_NEG
+            return (code, int(inst[1][1:]), int(inst[2][1:]), 0)
+        elif op in ("shl", "shr"):
+            shift_amount = int(inst[2])
+            if shift_amount < 0:
+                return (OP_TEXT, 0, 0, 0)
+            code = OP_SHL if op == "shl" else OP_SHR
+            return (code, int(inst[1][1:]), shift_amount, int(inst[3][1:]))
+        elif op == "loadpc":
+            return (OP_LOADPC, int(inst[1][1:]), int(inst[2][1:]), 0)
+        elif op == "jmp":
+            return (OP_JMP, labels[inst[1]], 0, 0)
+        elif op == "jmpr":
+            return (OP_JMPR, int(inst[1][1:]), int(inst[2][1:]), 0)
+    except (IndexError, ValueError, KeyError):
+        pass
+    return (OP_TEXT, 0, 0, 0)
+
+# Added: Semantics of decoded instructions, used to generate the run loops.
+# (opcode, name, statements, registers written, memory address written)
+_OP_SEMANTICS = [
+    (OP_ADD, "add", ["reg[c] = (reg[a] + reg[b]) % 256", "pc += 1"], ["c"], None),
+    (OP_JMP, "jmp", ["pc = a"], [], None),
+    (OP_SKIPIF, "skipif", ["skip = (reg[a] != 0)", "pc += 1"], [], None),
+    (OP_IF, "if", ["skip = (reg[a] == 0)", "pc += 1"], [], None),
+    (OP_LDI, "ldi", ["reg[b] = a", "pc += 1"], ["b"], None),
+    (OP_LD, "ld", ["reg[b] = mem[a]", "pc += 1"], ["b"], None),
+    (OP_ST, "st", ["mem[b] = reg[a] & 0xFF", "pc += 1"], [], "b"),
+    (OP_GT, "gt", ["reg[c] = 1 if reg[a] > reg[b] else 0", "pc += 1"], ["c"], None),
+    (OP_EQ, "eq", ["reg[c] = 1 if reg[a] == reg[b] else 0", "pc += 1"], ["c"], None),
+    (OP_AND, "and", ["reg[c] = (reg[a] & reg[b]) % 256", "pc += 1"], ["c"], None),
+    (OP_OR, "or", ["reg[c] = (reg[a] | reg[b]) % 256", "pc += 1"], ["c"], None),
+    (OP_LDR, "ldr", ["reg[b] = mem[reg[a]]", "pc += 1"], ["b"], None),
+    (OP_STR, "str", ["mem[reg[b]] = reg[a] & 0xFF", "pc += 1"], [], "reg[b]"),
+    (OP_NOT, "not", ["reg[b] = (~reg[a]) % 256", "pc += 1"], ["b"], None),
+    (OP_NEG, "neg", ["reg[b] = (-reg[a]) % 256", "pc += 1"], ["b"], None),
+    (OP_SHL, "shl", ["reg[c] = (reg[a] << b) % 256", "pc += 1"], ["c"], None),
+    (OP_SHR, "shr", ["reg[c] = reg[a] >> b", "pc += 1"], ["c"], None),
+    (OP_LOADPC, "loadpc", ["reg[b] = ((pc * 2) & 0xFF)", "reg[a] = ((pc * 2) >> 8)", "pc += 1"], ["b", "a"], None),
+    (OP_JMPR, "jmpr", ["pc = ((reg[a] << 8) | reg[b]) >> 1"], [], None),
+]
+
+_run_loops = {}
+
+# Added: Memory sizes. Memories up to DENSE_MEMORY_LIMIT bytes are plain lists,
+# larger ones (or ones backed by a file image) are PagedMemory.
+MEMORY_SIZE = 256
+DENSE_MEMORY_LIMIT = 1 << 16
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+class PagedMemory:
+    """Byte-addressed memory for large, sparse address spaces.
+
+    Storage is a bytearray per 4 KiB page, allocated on the first write of a
+    non-zero value; unallocated pages read as zero, or as the bytes of an
+    optional read-only base image (an mmap of a file, see from_file) that
+    pages are copied from when first written. Indexing behaves like the
+    list used for small memories, out-of-range addresses raise IndexError.
+    """
+    def __init__(self, size, base=None):
+        self.size = size
+        self.base = base
+        self.pages = {}
+
+    @classmethod
+    def from_file(cls, image_file, size=None):
+        """Memory whose initial contents are the raw bytes of a file, mapped
+        rather than read. Writes never reach the file."""
+        with open(image_file, 'rb') as f:
+            length = f.seek(0, 2)
+            base = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if length else b""
+        return cls(max(size or 0, length), base)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, addr):
+        if not 0 <= addr < self.size:
+            raise IndexError("memory address out of range")
+        page = self.pages.get(addr >> PAGE_BITS)
+        if page is not None:
+            return page[addr & PAGE_MASK]
+        if self.base is not None and addr < len(self.base):
+            return self.base[addr]
+        return 0
+
+    def __setitem__(self, addr, value):
+        if not 0 <= addr < self.size:
+            raise IndexError("memory address out of range")
+        page = self.pages.get(addr >> PAGE_BITS)
+        if page is None:
+            if not value and self.base is None:
+                return
+            page = self.pages[addr >> PAGE_BITS] = self.base_page(addr >> PAGE_BITS)
+        page[addr & PAGE_MASK] = value
+
+    def base_page(self, index):
+        """A new page holding the base image's bytes (zeros without one)"""
+        start = index << PAGE_BITS
+        page = bytearray(self.base[start:start + PAGE_SIZE]) if self.base is not None else bytearray()
+        page.extend(bytes(PAGE_SIZE - len(page)))
+        return page
+
+    def copy(self):
+        memory = PagedMemory(self.size, self.base)
+        memory.pages = {index: page[:] for index, page in self.pages.items()}
+        return memory
+
+    def restore(self, other):
+        """Take the contents of another PagedMemory, keeping this object"""
+        self.base = other.base
+        self.pages = {index: page[:] for index, page in other.pages.items()}
+
+    def page_indices(self):
+        """Pages that may hold non-zero bytes, in address order"""
+        if self.base is None:
+            return sorted(self.pages)
+        based = range((len(self.base) + PAGE_MASK) >> PAGE_BITS)
+        return sorted(set(based).union(self.pages))
+
+    def page(self, index):
+        page = self.pages.get(index)
+        return page if page is not None else self.base_page(index)
+
+    def items(self, include=()):
+        """(address, value) of the non-zero bytes and of the addresses in include,
+        in address order, without scanning unallocated pages"""
+        found = {}
+        for index in self.page_indices():
+            page = self.page(index)
+            if page.count(0) == len(page):
+                continue
+            start = index << PAGE_BITS
+            found.update((start + offset, value) for offset, value in enumerate(page) if value)
+        for addr in include:
+            if 0 <= addr < self.size:
+                found[addr] = self[addr]
+        return sorted(found.items())
+
+    def changes(self, before):
+        """(address, old value) of every byte that differs from an earlier copy"""
+        changed = []
+        for index in sorted(set(self.pages).union(before.pages)):
+            old, new = before.page(index), self.page(index)
+            if old != new:
+                start = index << PAGE_BITS
+                changed += [(start + offset, value) for offset, value in enumerate(old) if new[offset] != value]
+        return changed
+
+def make_memory(size=MEMORY_SIZE, image_file=None):
+    """Zeroed memory of a given size: a list, or PagedMemory when it is large or
+    starts from a file image"""
+    if image_file is not None:
+        return PagedMemory.from_file(image_file, size)
+    if size <= DENSE_MEMORY_LIMIT:
+        return [0] * size
+    return PagedMemory(size)
+
+# Added: Undo log entries, one 64-bit word each. The low two bits tag the entry:
+#   UNDO_STEP  start of a retired instruction, (pc << 1 | skip) << 2
+#   UNDO_REG   register write, old value << 32 | index << 2 | UNDO_REG
+#   UNDO_MEM   memory write, old value << 32 | address << 2 | UNDO_MEM
+UNDO_STEP, UNDO_REG, UNDO_MEM = 0, 1, 2
+CHECKPOINT_INTERVAL = 4096  # Retired instructions between full checkpoints
+
+# Added: Coverage bitmap flags, one byte per program slot
+COV_EXEC = 1     # Executed (any instruction but if/skipif)
+COV_NO_SKIP = 2  # if/skipif executed and did not skip the next instruction
+COV_SKIP = 4     # if/skipif executed and skipped the next instruction
+COV_SKIPPED = 8  # Skipped by the previous if/skipif
+
+# Added: Memory accesses of loops with memory-mapped devices. ld/st whose
+# address is a device are decoded as OP_LD_IO/OP_ST_IO (see device_ops), so
+# plain ld/st stay RAM accesses; ldr/str look their address up in the device
+# table, where None means plain RAM.
+_IO_SEMANTICS = {
+    OP_LDR: ["addr = reg[a]",
+             "reg[b] = mem[addr] if io[addr >> ioshift] is None else emu.io_read(addr, count)", "pc += 1"],
+    OP_STR: ["addr = reg[b]",
+             "if io[addr >> ioshift] is None: mem[addr] = reg[a] & 0xFF",
+             "else: emu.io_write(addr, reg[a] & 0xFF, count)", "pc += 1"],
+}
+_IO_OPS = [
+    (OP_LD_IO, "ld device", ["reg[b] = emu.io_read(a, count)", "pc += 1"], ["b"], None),
+    (OP_ST_IO, "st device", ["emu.io_write(b, reg[a] & 0xFF, count)", "pc += 1"], [], None),
+]
+
+# Added: Observer hooks (see Observer) and the memory accesses they report:
+# opcode -> (address read, address written). Reads report reg[b] afterwards,
+# writes the byte stored, reg[a] & 0xFF.
+HOOKS = ("on_fetch", "on_retire", "on_register_write", "on_memory_read",
+         "on_memory_write", "on_halt")
+_HOOK_ACCESSES = {
+    OP_LD: ("a", None), OP_LDR: ("reg[a]", None), OP_LD_IO: ("a", None),
+    OP_ST: (None, "b"), OP_STR: (None, "reg[b]"), OP_ST_IO: (None, "b"),
+}
+
+def get_run_loop(breakpoints=False, watchpoints=False, record=False, coverage=False, io=False, hooks=()):
+    """Return a decoded run loop with only the requested checks compiled in.
+
+    The loop signature is
+        run_loop(emu, ops, reg, mem, pc, skip, limit, brk, wreg, wmem, log, cov) -> (pc, skip, count)
+    where brk is a per-slot breakpoint bitmap, wreg a bit mask of watched
+    registers, wmem a per-address watch bitmap, log the undo log that
+    recording loops append the overwritten values to and cov the per-slot
+    coverage bitmap (one COV_* flag is or-ed in per step). Loops with io
+    look memory accesses up in the emulator's device table. hooks names the
+    observer hooks to call, through emu.hook(name); the others cost nothing.
+    """
+    hooks = tuple(sorted(hooks))
+    key = (breakpoints, watchpoints, record, coverage, io, hooks)
+    if key in _run_loops:
+        return _run_loops[key]
+
+    src = [
+        "def run_loop(emu, ops, reg, mem, pc, skip, limit, brk, wreg, wmem, log, cov):",
+        "    n = len(ops)",
+        "    count = 0",
+        "    stop = False",
+    ]
+    if io:
+        src += [
+            "    io = emu.io_table",
+            "    ioshift = emu.io_shift",
+        ]
+    src += [f"    {name} = emu.hook('{name}')" for name in hooks]
+    if record:
+        src += [
+            "    log_append = log.append",
+            "    nmem = len(mem)",
+            "    checkpoint = emu.checkpoint_interval - emu.instruction_count % emu.checkpoint_interval",
+        ]
+    src += [
+        "    try:",
+        "        while pc < n and count != limit:",
+    ]
+    if breakpoints:
+        # Never stop on the slot execution resumes from
+        src += [
+            "            if brk[pc] and count:",
+            "                emu.stop_reason = ('break', pc)",
+            "                break",
+        ]
+    if record:
+        src.append(f"            log_append((pc << 1 | skip) << 2)")
+    if "on_fetch" in hooks:
+        src.append("            on_fetch(emu, pc)")
+    src += [
+        "            if skip:",
+        "                skip = False",
+    ]
+    if coverage:
+        src.append(f"                cov[pc] |= {COV_SKIPPED}")
+    if "on_retire" in hooks:
+        src.append("                on_retire(emu, pc, True)")
+    src += [
+        "                pc += 1",
+        "                count += 1",
+        "                continue",
+        "            code, a, b, c = ops[pc]",
+    ]
+    if "on_retire" in hooks:
+        src.append("            slot = pc")
+    for i, (code, name, statements, reg_writes, mem_write) in enumerate(_OP_SEMANTICS + (_IO_OPS if io else [])):
+        if io:
+            statements = _IO_SEMANTICS.get(code, statements)
+        src.append(f"            {'if' if i == 0 else 'elif'} code == {code}:  # {name}")
+        if coverage:
+            if code in (OP_IF, OP_SKIPIF):
+                # Record the outcome between computing skip and advancing pc
+                statements = [statements[0], f"cov[pc] |= {COV_SKIP} if skip else {COV_NO_SKIP}"] + statements[1:]
+            else:
+                src.append(f"                cov[pc] |= {COV_EXEC}")
+        if record:
+            src += [f"                log_append(reg[{r}] << 32 | {r} << 2 | {UNDO_REG})" for r in reg_writes]
+            if mem_write:
+                src.append(f"                log_append(mem[{mem_write}] << 32 | ({mem_write}) % nmem << 2 | {UNDO_MEM})")
+        read_addr, write_addr = _HOOK_ACCESSES.get(code, (None, None))
+        if read_addr and "on_memory_read" in hooks:
+            src.append(f"                read_addr = {read_addr}")
+        src += [f"                {stmt}" for stmt in statements]
+        if read_addr and "on_memory_read" in hooks:
+            src.append("                on_memory_read(emu, read_addr, reg[b])")
+        if write_addr and "on_memory_write" in hooks:
+            src.append(f"                on_memory_write(emu, {write_addr}, reg[a] & 0xFF)")
+        if "on_register_write" in hooks:
+            src += [f"                on_register_write(emu, {r}, reg[{r}])" for r in reg_writes]
+        if watchpoints:
+            for r in reg_writes:
+                src += [f"                if wreg >> {r} & 1 and emu.watch_hit('reg', {r}):",
+                        "                    stop = True"]
+            if mem_write:
+                src += [f"                if wmem[{mem_write}] and emu.watch_hit('mem', {mem_write}):",
+                        "                    stop = True"]
+    src += [
+        f"            elif code == {OP_HALT}:  # halt",
+    ]
+    if coverage:
+        src.append(f"                cov[pc] |= {COV_EXEC}")
+    if "on_halt" in hooks:
+        src.append("                on_halt(emu, pc)")
+    src += [
+        "                emu.status = 'halted'",
+    ]
+    if record:
+        src.append("                log.pop()")
+    src += [
+        "                break",
+        "            else:",
+        "                # Not decodable: let the text interpreter execute (or reject) it",
+        "                emu.prog_idx = pc",
+        "                emu.skip_next = False",
+    ]
+    if io:
+        src.append("                emu.run_steps = count")
+    if coverage:
+        src.append(f"                cov[pc] |= {COV_EXEC}")
+    if record:
+        src.append("                before = (reg[:], mem.copy())")
+    src += [
+        "                if not emu.execute_instruction(emu.instructions[pc]):",
+    ]
+    if record:
+        src.append("                    emu.discard_partial_step()")
+    src += [
+        "                    break",
+        "                pc = emu.prog_idx",
+        "                skip = emu.skip_next",
+    ]
+    if record:
+        src.append("                emu.record_changes(*before)")
+    if "on_retire" in hooks:
+        src.append("            on_retire(emu, slot, False)")
+    src.append("            count += 1")
+    if record:
+        src += [
+            "            if count == checkpoint:",
+            "                emu.add_checkpoint(pc, skip, count)",
+            "                checkpoint += emu.checkpoint_interval",
+        ]
+    if watchpoints:
+        src += [
+            "            if stop:",
+            "                break",
+        ]
+    src += [
+        "    except Exception as e:",
+        "        print(f\"Error executing instruction '{emu.program.expanded[pc]}': {e}\")",
+        "        emu.status = 'error'",
+    ]
+    if record:
+        src.append("        emu.discard_partial_step()")
+    src += [
+        "    return pc, skip, count",
+    ]
+
+    namespace = {}
+    exec(compile("\n".join(src), f"<run_loop {key}>", "exec"), {}, namespace)
+    _run_loops[key] = namespace["run_loop"]
+    return _run_loops[key]
+
+# Added: Watchpoint expressions such as "r3", "mem[0x02]" or "mem[0x02] > 0x10"
+_WATCH_REGEX = re.compile(
+    r'^\s*(?:mem\[\s*(0x[0-9a-fA-F]+|\d+)\s*\]|r(\d+))\s*'
+    r'(?:(==|!=|<=|>=|<|>)\s*(0x[0-9a-fA-F]+|\d+))?\s*$'
+)
+_WATCH_OPS = {"==": operator.eq, "!=": operator.ne, "<=": operator.le,
+              ">=": operator.ge, "<": operator.lt, ">": operator.gt}
+
+def parse_watchpoint(spec):
+    """Parse a watchpoint into (kind, index, comparison, value), kind is 'reg' or 'mem'"""
+    match = _WATCH_REGEX.match(spec)
+    if not match:
+        raise ValueError(f"Invalid watchpoint: {spec}")
+    addr, reg, comparison, value = match.groups()
+    if addr is not None:
+        kind, index = "mem", int(addr, 0)
+    else:
+        kind, index = "reg", int(reg)
+        if not (0 <= index < 16):
+            raise ValueError("Register number must be between 0 and 15")
+    return (kind, index, comparison, int(value, 0) if value is not None else None)
+
+# Added: Observers of execution
+class Observer:
+    """Base class for execution observers, attached with TUCAEmulator.add_observer.
+
+    Override any of the hooks below. The run loop is specialized for the
+    hooks that attached observers override, so the others (and all of them
+    when no observer is attached) cost nothing. pc is a program slot, as
+    in emu.prog_idx; skipped tells an instruction skipped by if/skipif.
+    """
+    def on_fetch(self, emu, pc):
+        """Before the instruction at pc executes (or is skipped)"""
+
+    def on_retire(self, emu, pc, skipped):
+        """After the instruction at pc executed or was skipped"""
+
+    def on_register_write(self, emu, index, value):
+        """After a register was written"""
+
+    def on_memory_read(self, emu, address, value):
+        """After ld/ldr read a memory address"""
+
+    def on_memory_write(self, emu, address, value):
+        """After st/str wrote a memory address"""
+
+    def on_halt(self, emu, pc):
+        """When the halt at pc is reached"""
+
+class _DeltaCollector(Observer):
+    """Writes of the current step, for TUCAEmulator.step_iter"""
+    def __init__(self):
+        self.registers = []
+        self.memory = []
+
+    def on_register_write(self, emu, index, value):
+        self.registers.append((index, value))
+
+    def on_memory_write(self, emu, address, value):
+        self.memory.append((address, value))
+
+def _call_all(functions):
+    def call(*args):
+        for function in functions:
+            function(*args)
+    return call
+
+# Added: Parsed and decoded program that can be reused across runs
+class Program:
+    """Instructions, labels and macros of a program, plus their decoded form"""
+    def __init__(self, instructions, labels, macros):
+        self.instructions = instructions
+        self.labels = labels
+        self.macros = macros
+        self.expanded = [expand_macros(inst, macros) for inst in instructions]
+        self.ops = [decode_instruction(inst, macros, labels) for inst in instructions]
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Parse program lines (same rules as the original emulator)"""
+        instructions = []
+        labels = {}
+        macros = {}
+        inst_idx = 0
+
+        for inst_line in lines:
+            inst_str = inst_line.strip()
+            if not inst_str or inst_str.startswith('#'):
+                continue
+
+            # Handle macro definitions
+            line_tokens = inst_str.split()
+            if line_tokens[0] == "def":
+                macros[line_tokens[1]] = line_tokens[2]
+                continue
+
+            # Handle labels
+            if inst_str.endswith(':'):
+                labels[inst_str[:-1]] = inst_idx
+                continue
+
+            # Add instruction
+            instructions.append(inst_str)
+            inst_idx += 1
+
+        return cls(instructions, labels, macros)
+
+    @classmethod
+    def from_file(cls, program_file):
+        with open(program_file, 'r') as prog_file:
+            return cls.from_lines(prog_file)
+
+    def replace(self, slot, inst_str):
+        """Copy of the program with one instruction replaced; only that slot is decoded again"""
+        program = object.__new__(Program)
+        program.labels = self.labels
+        program.macros = self.macros
+        program.instructions = self.instructions[:]
+        program.expanded = self.expanded[:]
+        program.ops = self.ops[:]
+        program.instructions[slot] = inst_str
+        program.expanded[slot] = expand_macros(inst_str, self.macros)
+        program.ops[slot] = decode_instruction(inst_str, self.macros, self.labels)
+        return program
+
+    def delete(self, slot):
+        """Copy of the program without one instruction, labels after it move up a slot"""
+        labels = {label: idx - 1 if idx > slot else idx for label, idx in self.labels.items()}
+        return Program(self.instructions[:slot] + self.instructions[slot + 1:], labels, self.macros)
+
+# Added: Parsed memory file that can be reused across runs
+class MemoryImage:
+    """Memory file entries in file order: (index, line, value, error)"""
+    def __init__(self, entries):
+        self.entries = entries
+
+    @classmethod
+    def from_lines(cls, lines):
+        entries = []
+        for idx, line in enumerate(lines):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                # Check if value is in binary format (all 1s and 0s)
+                if all(c in '01' for c in line):
+                    value = int(line, 2)
+                # Check if value is in hex format with 0x prefix
+                elif line.startswith('0x'):
+                    value = int(line, 16)
+                else:
+                    raise ValueError(f"Memory values must be either binary (1s and 0s) or hex with 0x prefix")
+
+                if value > 255:
+                    raise ValueError(f"Memory value {value} exceeds 8 bits")
+
+                entries.append((idx, line, value, None))
+            except ValueError as e:
+                entries.append((idx, line, None, str(e)))
+        return cls(entries)
+
+    @classmethod
+    def from_file(cls, memory_file):
+        with open(memory_file, 'r') as mem_file:
+            return cls.from_lines(mem_file)
+
 # Modified: Class-based implementation to support multiple instances and testing
 class TUCAEmulator:
-    def __init__(self, verbose=False, minimal=False):
+    def __init__(self, verbose=False, minimal=False, memory_size=MEMORY_SIZE, memory_image=None, devices=()):
         # Added: minimal mode for cleaner output
         self.verbose = verbose
         self.minimal = minimal
+        self.memory_size = memory_size    # Added: bytes of data memory
+        self.memory_image = memory_image  # Added: raw file mapped as initial memory
+        self.breakpoints = set()  # Added: program slots or labels to stop at
+        self.watchpoints = []     # Added: (kind, index, comparison, value)
+        self.recording = False    # Added: keep an undo log for reverse execution
+        self.checkpoint_interval = CHECKPOINT_INTERVAL
+        self.coverage = None      # Added: per-slot COV_* flags, kept across reset()
+        self.devices = []         # Added: (start, end, device) memory-mapped devices
+        self.io_table = None      # Added: devices per block of addresses, see attach()
+        self.io_shift = 0
+        self.io_ops = None        # Added: (program, ops) with device ld/st, see device_ops()
+        self.run_steps = 0        # Added: instructions retired in the current run
+        self.observers = []       # Added: Observer instances, kept across reset()
         self.reset()
+        for address, device in devices:
+            self.attach(device, address)
 
     def reset(self):
         """Reset all registers and memory to initial state"""
         self.reg = [0] * 16  # 16 registers, 8 bits each
-        self.mem = [0] * 256  # 256 memory locations, 8 bits each
+        self.mem = make_memory(self.memory_size, self.memory_image)  # 8 bits per location
         self.initialized_mem = set()  # Track which memory locations were initialized
         self.prog_idx = 0    # Program counter (multiply by 2 for byte address)
         self.instructions = []  # List of instructions
+        self.program = None  # Parsed and decoded program
         self.labels = {}     # Dictionary of label positions
         self.macros = {}     # Dictionary of macro definitions
         self.skip_next = False  # Skip next instruction flag
+        self.status = None   # Why execution stopped: halted, completed, error, limit, break or watch
+        self.stop_reason = None  # Breakpoint or watchpoint that stopped execution
+        self.instruction_count = 0
+        self.engine = None   # Run loop of the last run_program: "decoded" or "traced"
+        self.undo_log = array('q') if self.recording else None  # See UNDO_STEP
+        self.checkpoints = []  # (step, pc, skip, registers, memory, undo log length)
+        for start, end, device in self.devices:
+            device.reset()
 
     # Modified: Only print registers in verbose non-minimal mode
     def print_registers(self):
@@ -31,89 +631,60 @@ def print_registers(self):
                 print(f"0x{val:02x} ", end="")
             print()
 
+    # Modified: Accepts a preloaded Program so callers can cache parsed programs
     def load_program(self, program_file):
-        """Load program from file and parse instructions"""
+        """Load program from file (or a Program) and parse instructions"""
         try:
-            with open(program_file, 'r') as prog_file:
-                # Parse the program and store into an instruction array
-                self.instructions = []
-                self.labels = {}
-                self.macros = {}
-                inst_idx = 0
-
-                for inst_line in prog_file:
-                    inst_str = inst_line.strip()
-                    if not inst_str or inst_str.startswith('#'):
-                        continue
-
-                    # Handle macro definitions
-                    line_tokens = inst_str.split()
-                    if line_tokens[0] == "def":
-                        self.macros[line_tokens[1]] = line_tokens[2]
-                        continue
-
-                    # Handle labels
-                    if inst_str.endswith(':'):
-                        self.labels[inst_str[:-1]] = inst_idx
-                        continue
-
-                    # Add instruction
-                    self.instructions.append(inst_str)
-                    inst_idx += 1
-
-                # Modified: Only show instruction memory in verbose non-minimal mode
-                if self.verbose and not self.minimal:
-                    print("\nInstruction Memory:\n")
-                    for i, inst in enumerate(self.instructions):
-                        # Print label if it exists
-                        for label, addr in self.labels.items():
-                            if addr == i:
-                                print(f"{label}:")
-                        print(f"0x{i*2:03x}: {inst}")
-
-                    if self.macros:
-                        print("\nMacros:")
-                        print(self.macros)
+            if isinstance(program_file, Program):
+                self.program = program_file
+            else:
+                self.program = Program.from_file(program_file)
+            self.instructions = self.program.instructions
+            self.labels = self.program.labels
+            self.macros = self.program.macros
 
-                return True
+            # Modified: Only show instruction memory in verbose non-minimal mode
+            if self.verbose and not self.minimal:
+                print("\nInstruction Memory:\n")
+                for i, inst in enumerate(self.instructions):
+                    # Print label if it exists
+                    for label, addr in self.labels.items():
+                        if addr == i:
+                            print(f"{label}:")
+                    print(f"0x{i*2:03x}: {inst}")
+
+                if self.macros:
+                    print("\nMacros:")
+                    print(self.macros)
+
+            return True
 
         except Exception as e:
             print(f"Error loading program: {e}")
             return False
 
+    # Modified: Accepts a preloaded MemoryImage so callers can cache test vectors
     def load_memory(self, memory_file):
-        """Load initial memory state from file"""
+        """Load initial memory state from file (or a MemoryImage)"""
         try:
-            with open(memory_file, 'r') as mem_file:
-                # Reset memory
-                self.mem = [0] * 256
-                self.initialized_mem = set()
-                
-                # Read the initial memory map values into the memory array
-                for idx, line in enumerate(mem_file):
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    try:
-                        # Check if value is in binary format (all 1s and 0s)
-                        if all(c in '01' for c in line):
-                            value = int(line, 2)
-                        # Check if value is in hex format with 0x prefix
-                        elif line.startswith('0x'):
-                            value = int(line, 16)
-                        else:
-                            raise ValueError(f"Memory values must be either binary (1s and 0s) or hex with 0x prefix")
-                        
-                        if value > 255:
-                            raise ValueError(f"Memory value {value} exceeds 8 bits")
-                            
-                        self.mem[idx] = value
-                        self.initialized_mem.add(idx)  # Track that this location was initialized
-                    except ValueError as e:
-                        print(f"Warning: Invalid memory value on line {idx+1}: {line}")
-                        print(f"Error: {str(e)}")
-                        continue
-                return True
+            if isinstance(memory_file, MemoryImage):
+                image = memory_file
+            else:
+                image = MemoryImage.from_file(memory_file)
+
+            # Reset memory
+            self.mem = make_memory(self.memory_size, self.memory_image)
+            self.initialized_mem = set()
+
+            # Copy the initial memory map values into the memory array
+            for idx, line, value, error in image.entries:
+                if error is not None:
+                    print(f"Warning: Invalid memory value on line {idx+1}: {line}")
+                    print(f"Error: {error}")
+                    continue
+                self.mem[idx] = value
+                self.initialized_mem.add(idx)  # Track that this location was initialized
+            return True
 
         except Exception as e:
             print(f"Error loading memory: {e}")
@@ -133,6 +704,10 @@ def execute_instruction(self, inst_str):
         if not inst:
             return True
 
+        # Added: Accesses reported to observers, the same events the decoded run loops report
+        read_addr = write_addr = write_value = None
+        written = ()
+
         try:
             # Handle skip-next condition
             if self.skip_next:
@@ -144,6 +719,7 @@ def execute_instruction(self, inst_str):
 
             # Handle each instruction type
             if inst[0] == "halt":
+                self.status = "halted"
                 return False
 
             elif inst[0] == "skipif":
@@ -159,32 +735,46 @@ def execute_instruction(self, inst_str):
             elif inst[0] == "ld":
                 addr_int = int(inst[1], 16)
                 reg_idx = int(inst[2][1:])
-                self.reg[reg_idx] = self.mem[addr_int]
+                self.reg[reg_idx] = self.io_read(addr_int) if self.devices else self.mem[addr_int]
                 self.prog_idx += 1
+                read_addr, written = addr_int, (reg_idx,)
 
             elif inst[0] == "ldr":
                 reg1_idx = int(inst[1][1:])
                 reg2_idx = int(inst[2][1:])
-                self.reg[reg2_idx] = self.mem[self.reg[reg1_idx]]
+                addr_int = self.reg[reg1_idx]
+                self.reg[reg2_idx] = self.io_read(addr_int) if self.devices else self.mem[addr_int]
                 self.prog_idx += 1
+                read_addr, written = addr_int, (reg2_idx,)
 
             elif inst[0] == "ldi":
                 val = int(inst[1], 16)
                 reg_idx = int(inst[2][1:])
                 self.reg[reg_idx] = val
                 self.prog_idx += 1
+                written = (reg_idx,)
 
             elif inst[0] == "st":
                 reg_idx = int(inst[1][1:])
                 addr_int = int(inst[2], 16)
-                self.mem[addr_int] = self.reg[reg_idx]
+                value = self.reg[reg_idx] & 0xFF  # Memory holds bytes: keep the low 8 bits
+                if self.devices:
+                    self.io_write(addr_int, value)
+                else:
+                    self.mem[addr_int] = value
                 self.prog_idx += 1
+                write_addr, write_value = addr_int, value
 
             elif inst[0] == "str":
                 reg1_idx = int(inst[1][1:])
                 reg2_idx = int(inst[2][1:])
-                self.mem[self.reg[reg2_idx]] = self.reg[reg1_idx]
+                value = self.reg[reg1_idx] & 0xFF
+                if self.devices:
+                    self.io_write(self.reg[reg2_idx], value)
+                else:
+                    self.mem[self.reg[reg2_idx]] = value
                 self.prog_idx += 1
+                write_addr, write_value = self.reg[reg2_idx], value
 
             elif inst[0] == "add":
                 reg1_idx = int(inst[1][1:])
@@ -192,6 +782,7 @@ def execute_instruction(self, inst_str):
                 reg3_idx = int(inst[3][1:])
                 self.reg[reg3_idx] = (self.reg[reg1_idx] + self.reg[reg2_idx]) % 256
                 self.prog_idx += 1
+                written = (reg3_idx,)
 
             elif inst[0] == "and":
                 reg1_idx = int(inst[1][1:])
@@ -199,6 +790,7 @@ def execute_instruction(self, inst_str):
                 reg3_idx = int(inst[3][1:])
                 self.reg[reg3_idx] = (self.reg[reg1_idx] & self.reg[reg2_idx]) % 256
                 self.prog_idx += 1
+                written = (reg3_idx,)
 
             elif inst[0] == "or":
                 reg1_idx = int(inst[1][1:])
@@ -206,18 +798,21 @@ def execute_instruction(self, inst_str):
                 reg3_idx = int(inst[3][1:])
                 self.reg[reg3_idx] = (self.reg[reg1_idx] | self.reg[reg2_idx]) % 256
                 self.prog_idx += 1
+                written = (reg3_idx,)
 
             elif inst[0] == "not":
                 reg1_idx = int(inst[1][1:])
                 reg2_idx = int(inst[2][1:])
                 self.reg[reg2_idx] = (~self.reg[reg1_idx]) % 256
                 self.prog_idx += 1
+                written = (reg2_idx,)
 
             elif inst[0] == "neg":
                 reg1_idx = int(inst[1][1:])
                 reg2_idx = int(inst[2][1:])
                 self.reg[reg2_idx] = (-self.reg[reg1_idx]) % 256
                 self.prog_idx += 1
+                written = (reg2_idx,)
 
             elif inst[0] == "shl":
                 reg1_idx = int(inst[1][1:])
@@ -225,6 +820,7 @@ def execute_instruction(self, inst_str):
                 reg2_idx = int(inst[3][1:])
                 self.reg[reg2_idx] = (self.reg[reg1_idx] << shift_amount) % 256
                 self.prog_idx += 1
+                written = (reg2_idx,)
 
             elif inst[0] == "shr":
                 reg1_idx = int(inst[1][1:])
@@ -232,6 +828,7 @@ def execute_instruction(self, inst_str):
                 reg2_idx = int(inst[3][1:])
                 self.reg[reg2_idx] = self.reg[reg1_idx] >> shift_amount
                 self.prog_idx += 1
+                written = (reg2_idx,)
 
             elif inst[0] == "eq":
                 reg1_idx = int(inst[1][1:])
@@ -239,6 +836,7 @@ def execute_instruction(self, inst_str):
                 reg3_idx = int(inst[3][1:])
                 self.reg[reg3_idx] = 1 if self.reg[reg1_idx] == self.reg[reg2_idx] else 0
                 self.prog_idx += 1
+                written = (reg3_idx,)
 
             elif inst[0] == "gt":
                 reg1_idx = int(inst[1][1:])
@@ -246,6 +844,7 @@ def execute_instruction(self, inst_str):
                 reg3_idx = int(inst[3][1:])
                 self.reg[reg3_idx] = 1 if self.reg[reg1_idx] > self.reg[reg2_idx] else 0
                 self.prog_idx += 1
+                written = (reg3_idx,)
 
             elif inst[0] == "loadpc":
                 regh_idx = int(inst[1][1:])
@@ -257,6 +856,7 @@ def execute_instruction(self, inst_str):
                 # Put the upper 4 bits in reg_hi
                 self.reg[regh_idx] = (pc >> 8)
                 self.prog_idx += 1
+                written = (regl_idx, regh_idx)
 
             elif inst[0] == "jmp":
                 key = inst[1]
@@ -272,28 +872,484 @@ def execute_instruction(self, inst_str):
 
             else:
                 print(f"Unknown instruction: {inst}")
+                self.status = "error"
                 return False
 
+            if self.observers:
+                self.report_accesses(read_addr, write_addr, write_value, written)
+
             # Print register values if in verbose mode
             self.print_registers()
             return True
 
         except Exception as e:
             print(f"Error executing instruction '{inst_str}': {e}")
+            self.status = "error"
             return False
 
-    # Modified: Added support for testing and verification
-    def run_program(self, program_file, memory_file=None):
-        """Run a program with optional initial memory state"""
-        # Reset state
-        self.reset()
+    def run_traced(self, max_steps=None):
+        """Run the loaded program one text instruction at a time, printing a trace.
+        Breakpoints, coverage and observers are honored, watchpoints need the
+        decoded path."""
+        instruction_count = 0
+        self.size_coverage()
+        self.stop_reason = None
+        brk = self.prepare_checks()[0] if self.breakpoints else None
+        hooks = self.active_hooks()
+        while self.prog_idx < len(self.instructions) and instruction_count != max_steps:
+            if brk and brk[self.prog_idx] and instruction_count:
+                self.stop_reason = ("break", self.prog_idx)
+                self.status = "break"
+                break
+            inst = self.instructions[self.prog_idx]
+            
+            if self.verbose and not self.minimal:
+                # Print label if it exists
+                for label, addr in self.labels.items():
+                    if addr == self.prog_idx:
+                        print(f"{label}:")
+                print(f"0x{self.prog_idx*2:03x}: {inst}")
+            
+            # Execute the instruction
+            slot, skipped = self.prog_idx, self.skip_next
+            self.run_steps = instruction_count
+            if "on_fetch" in hooks:
+                self.hook("on_fetch")(self, slot)
+            if not self.execute_instruction(inst):
+                if self.coverage is not None:
+                    self.coverage[slot] |= COV_EXEC
+                if "on_halt" in hooks and self.status == "halted":
+                    self.hook("on_halt")(self, slot)
+                break
+            if "on_retire" in hooks:
+                self.hook("on_retire")(self, slot, skipped)
+            if self.coverage is not None:
+                if skipped:
+                    self.coverage[slot] |= COV_SKIPPED
+                elif inst.split()[0] in ("if", "skipif"):
+                    self.coverage[slot] |= COV_SKIP if self.skip_next else COV_NO_SKIP
+                else:
+                    self.coverage[slot] |= COV_EXEC
+            
+            instruction_count += 1
+        return instruction_count
 
-        # Load program
-        if not self.load_program(program_file):
-            return None
+    # Added: Fast path that executes decoded instructions without tracing
+    def run_decoded(self, max_steps=None):
+        """Run the loaded program from the current state, return instruction count.
+        Breakpoints and watchpoints are only checked when some are set."""
+        limit = -1 if max_steps is None else max_steps
+        self.stop_reason = None
+        run_loop, ops, checks = self.decoded_loop()
+        self.prog_idx, self.skip_next, count = run_loop(
+            self, ops, self.reg, self.mem, self.prog_idx, self.skip_next, limit, *checks
+        )
+        if self.stop_reason is not None:
+            self.status = self.stop_reason[0]
+        return count
+
+    def decoded_loop(self):
+        """(run loop, decoded ops, (brk, wreg, wmem, log, cov)) for the
+        current checks, recording, coverage, devices and observers"""
+        record = self.undo_log is not None
+        if record and not self.checkpoints:
+            self.add_checkpoint(self.prog_idx, self.skip_next, 0)
+        self.size_coverage()
+        coverage = self.coverage is not None
+        io = bool(self.devices)
+        hooks = self.active_hooks()
+        if self.breakpoints or self.watchpoints:
+            brk, wreg, wmem = self.prepare_checks()
+            run_loop = get_run_loop(breakpoints=bool(self.breakpoints), watchpoints=bool(self.watchpoints),
+                                    record=record, coverage=coverage, io=io, hooks=hooks)
+        else:
+            brk, wreg, wmem = None, 0, None
+            run_loop = get_run_loop(record=record, coverage=coverage, io=io, hooks=hooks)
+        ops = self.device_ops() if io else self.program.ops
+        return run_loop, ops, (brk, wreg, wmem, self.undo_log, self.coverage)
+
+    # Added: Observer hooks
+    def add_observer(self, observer):
+        self.observers.append(observer)
+        return observer
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def active_hooks(self):
+        """Names of the hooks some attached observer overrides"""
+        return tuple(name for name in HOOKS
+                     if any(getattr(type(obs), name) is not getattr(Observer, name) for obs in self.observers))
+
+    def hook(self, name):
+        """One callable running a hook of every observer that overrides it"""
+        functions = [getattr(obs, name) for obs in self.observers
+                     if getattr(type(obs), name) is not getattr(Observer, name)]
+        return functions[0] if len(functions) == 1 else _call_all(functions)
+
+    def report_accesses(self, read_addr, write_addr, write_value, written):
+        """Report an instruction run by execute_instruction to the hooks, in
+        the order the decoded run loops do: a memory read (with the value
+        loaded), a memory write, then the written registers"""
+        hooks = self.active_hooks()
+        if read_addr is not None and "on_memory_read" in hooks:
+            self.hook("on_memory_read")(self, read_addr, self.reg[written[0]])
+        if write_addr is not None and "on_memory_write" in hooks:
+            self.hook("on_memory_write")(self, write_addr, write_value)
+        if written and "on_register_write" in hooks:
+            on_register_write = self.hook("on_register_write")
+            for index in written:
+                on_register_write(self, index, self.reg[index])
+
+    # Added: Memory-mapped devices
+    def attach(self, device, address):
+        """Map a device (see devices.py) at address..address+device.size-1.
+        Devices are kept across reset() and take precedence over RAM."""
+        end = address + device.size
+        if address < 0 or end > len(self.mem):
+            raise ValueError(f"Device at 0x{address:02x} is outside the {len(self.mem)}-byte memory")
+        for start, other_end, other in self.devices:
+            if address < other_end and start < end:
+                raise ValueError(f"Device at 0x{address:02x} overlaps one at 0x{start:02x}")
+        self.devices.append((address, end, device))
+        self.build_io_table()
+
+    def detach(self, device):
+        self.devices = [entry for entry in self.devices if entry[2] is not device]
+        self.build_io_table()
+
+    def device_ops(self):
+        """Decoded program with the ld/st of device addresses turned into
+        OP_LD_IO/OP_ST_IO, cached until the program or the devices change"""
+        if self.io_ops is None or self.io_ops[0] is not self.program:
+            ops = list(self.program.ops)
+            for slot, (code, a, b, c) in enumerate(ops):
+                if code == OP_LD and 0 <= a < len(self.mem) and self.device_at(a):
+                    ops[slot] = (OP_LD_IO, a, b, c)
+                elif code == OP_ST and 0 <= b < len(self.mem) and self.device_at(b):
+                    ops[slot] = (OP_ST_IO, a, b, c)
+            self.io_ops = (self.program, ops)
+        return self.io_ops[1]
+
+    def build_io_table(self):
+        """Split memory into 256 blocks; a block's entry is None for plain RAM,
+        else the devices overlapping it. With 256 bytes of memory each block
+        is one address, so the run loop needs a single lookup per access."""
+        self.io_shift = max(0, (len(self.mem) - 1).bit_length() - 8)
+        self.io_table = [None] * 256
+        for start, end, device in self.devices:
+            for block in range(start >> self.io_shift, ((end - 1) >> self.io_shift) + 1):
+                self.io_table[block] = (self.io_table[block] or ()) + ((start, end, device),)
+        self.io_ops = None
+
+    def device_at(self, addr):
+        """(start, device) of the device mapped at addr, or None for RAM"""
+        for start, end, device in self.io_table[addr >> self.io_shift] or ():
+            if start <= addr < end:
+                return start, device
+        return None
+
+    def io_read(self, addr, count=None):
+        """ld from an address whose block has a device"""
+        found = self.device_at(addr)
+        if found is None:
+            return self.mem[addr]
+        start, device = found
+        steps = self.run_steps if count is None else count
+        return device.read(addr - start, self.instruction_count + steps) & 0xFF
+
+    def io_write(self, addr, value, count=None):
+        """st to an address whose block has a device"""
+        found = self.device_at(addr)
+        if found is None:
+            self.mem[addr] = value
+            return
+        start, device = found
+        steps = self.run_steps if count is None else count
+        device.write(addr - start, value, self.instruction_count + steps)
+
+    # Added: Breakpoints and watchpoints
+    def add_breakpoint(self, location):
+        """Break before executing a program slot (int) or label (str). Once a
+        program is loaded, a label it does not define raises ValueError."""
+        if isinstance(location, str) and self.program is not None and location not in self.labels:
+            raise ValueError(f"Unknown label: {location}")
+        self.breakpoints.add(location)
+
+    def remove_breakpoint(self, location):
+        self.breakpoints.discard(location)
+
+    def add_watchpoint(self, spec):
+        """Stop after a write to a register or memory location, e.g. "r3",
+        "mem[0x02]" or "mem[0x02] > 0x10" (stop once the condition holds)"""
+        watchpoint = parse_watchpoint(spec)
+        self.watchpoints.append(watchpoint)
+        return watchpoint
+
+    def remove_watchpoint(self, spec):
+        self.watchpoints.remove(parse_watchpoint(spec))
+
+    def prepare_checks(self):
+        """Precompute the slot bitmap and register/address masks used by the run loop"""
+        brk = bytearray(len(self.instructions))
+        for location in self.breakpoints:
+            slot = self.labels.get(location) if isinstance(location, str) else location
+            if slot is not None and 0 <= slot < len(brk):
+                brk[slot] = 1
+        wreg = 0
+        wmem = make_memory(len(self.mem))
+        for kind, index, comparison, value in self.watchpoints:
+            if kind == "reg":
+                wreg |= 1 << index
+            elif 0 <= index < len(wmem):
+                wmem[index] = 1
+        return brk, wreg, wmem
+
+    def watch_hit(self, kind, index):
+        """Called by the run loop after a write to a watched location"""
+        current = self.reg[index] if kind == "reg" else self.mem[index]
+        for w_kind, w_index, comparison, value in self.watchpoints:
+            if w_kind == kind and w_index == index % len(self.mem if kind == "mem" else self.reg):
+                if comparison is None or _WATCH_OPS[comparison](current, value):
+                    self.stop_reason = ("watch", kind, w_index)
+                    return True
+        return False
+
+    # Added: Instruction and branch coverage
+    def enable_coverage(self, coverage=None):
+        """Collect coverage into a bytearray of COV_* flags per program slot.
+        Passing the same bytearray to several emulators merges their coverage."""
+        self.coverage = coverage if coverage is not None else bytearray()
+        return self.coverage
+
+    def size_coverage(self):
+        """Grow the coverage bitmap to the size of the loaded program"""
+        if self.coverage is not None and len(self.coverage) < len(self.instructions):
+            self.coverage.extend(bytes(len(self.instructions) - len(self.coverage)))
+
+    # Added: Undo log and checkpoints for reverse execution
+    def enable_recording(self, checkpoint_interval=CHECKPOINT_INTERVAL):
+        """Record an undo log from now on (kept across reset()), so execution can run backwards"""
+        self.recording = True
+        self.checkpoint_interval = checkpoint_interval
+        if self.undo_log is None:
+            self.undo_log = array('q')
+            self.checkpoints = []
+
+    def add_checkpoint(self, pc, skip, count):
+        """Called by the recording run loop every checkpoint_interval instructions"""
+        self.checkpoints.append((self.instruction_count + count, pc, skip,
+                                 self.reg.copy(), self.mem.copy(), len(self.undo_log)))
 
-        # Load memory if provided
+    def record_changes(self, reg, mem):
+        """Log the registers and memory an instruction run by execute_instruction changed"""
+        for idx, value in enumerate(reg):
+            if self.reg[idx] != value:
+                self.undo_log.append(value << 32 | idx << 2 | UNDO_REG)
+        if isinstance(mem, PagedMemory):
+            changed = self.mem.changes(mem)
+        else:
+            changed = [(addr, value) for addr, value in enumerate(mem) if self.mem[addr] != value]
+        for addr, value in changed:
+            self.undo_log.append(value << 32 | addr << 2 | UNDO_MEM)
+
+    def discard_partial_step(self):
+        """Drop the log entries of an instruction that did not retire"""
+        log = self.undo_log
+        while log[-1] & 3 != UNDO_STEP:
+            log.pop()
+        log.pop()
+
+    def undo_step(self, wreg=0, wmem=None):
+        """Undo the last retired instruction. Returns True if it wrote a
+        location watched in wreg/wmem while the watch condition held."""
+        log = self.undo_log
+        hit = False
+        while True:
+            entry = log.pop()
+            tag = entry & 3
+            if tag == UNDO_STEP:
+                break
+            index = (entry & 0xFFFFFFFF) >> 2
+            if tag == UNDO_REG:
+                if wreg >> index & 1 and self.watch_hit('reg', index):
+                    hit = True
+                self.reg[index] = entry >> 32
+            else:
+                if wmem and wmem[index] and self.watch_hit('mem', index):
+                    hit = True
+                self.mem[index] = entry >> 32
+        position = entry >> 2
+        self.prog_idx = position >> 1
+        self.skip_next = bool(position & 1)
+        self.instruction_count -= 1
+        while self.checkpoints[-1][0] > self.instruction_count:
+            self.checkpoints.pop()
+        return hit
+
+    def rewind(self, step):
+        """Return to the state after `step` retired instructions of the recorded run.
+        Short distances are undone from the log, longer ones restore the closest
+        checkpoint and replay at most checkpoint_interval instructions."""
+        if not self.checkpoints or step < self.checkpoints[0][0]:
+            raise ValueError("Step is before the start of the recording")
+        self.status = None
+        self.stop_reason = None
+        if self.instruction_count - step <= self.checkpoint_interval:
+            while self.instruction_count > step:
+                self.undo_step()
+            return
+
+        while self.checkpoints[-1][0] > step:
+            self.checkpoints.pop()
+        cp_step, pc, skip, reg, mem, log_len = self.checkpoints[-1]
+        self.reg[:] = reg
+        if isinstance(mem, PagedMemory):
+            self.mem.restore(mem)
+        else:
+            self.mem[:] = mem
+        self.prog_idx, self.skip_next = pc, skip
+        self.instruction_count = cp_step
+        del self.undo_log[log_len:]
+
+        # Replay without stopping at breakpoints or watchpoints
+        breakpoints, watchpoints = self.breakpoints, self.watchpoints
+        self.breakpoints, self.watchpoints = set(), []
+        try:
+            self.instruction_count += self.run_decoded(max_steps=step - cp_step)
+        finally:
+            self.breakpoints, self.watchpoints = breakpoints, watchpoints
+        self.status = None
+
+    def reverse_step(self, steps=1):
+        """Run backwards by `steps` instructions, returns the number undone"""
+        if not self.checkpoints:
+            return 0
+        target = max(self.checkpoints[0][0], self.instruction_count - steps)
+        undone = self.instruction_count - target
+        self.rewind(target)
+        return undone
+
+    def reverse_continue(self):
+        """Run backwards until a breakpoint slot is reached, an instruction that
+        wrote a watched location is undone, or the start of the recording.
+        Returns the state."""
+        if not self.checkpoints:
+            return self.snapshot()
+        brk, wreg, wmem = self.prepare_checks()
+        start = self.checkpoints[0][0]
+        self.status = None
+        self.stop_reason = None
+        while self.instruction_count > start:
+            if self.undo_step(wreg, wmem):
+                break
+            if brk[self.prog_idx]:
+                self.stop_reason = ("break", self.prog_idx)
+                break
+        if self.stop_reason is not None:
+            self.status = self.stop_reason[0]
+        return self.snapshot()
+
+    # Added: Interactive stepping API
+    def start(self, program_file, memory_file=None):
+        """Reset and load a program (and memory) without running it"""
+        self.reset()
+        if not self.load_program(program_file):
+            return False
         if memory_file and not self.load_memory(memory_file):
+            return False
+        return True
+
+    def step(self):
+        """Execute a single instruction, returns False once the program stopped"""
+        if self.prog_idx >= len(self.instructions) or self.status in ("halted", "error"):
+            return False
+        self.status = None
+        self.instruction_count += self.run_decoded(max_steps=1)
+        if self.status is None and self.prog_idx >= len(self.instructions):
+            self.status = "completed"
+        return self.status not in ("halted", "error", "completed")
+
+    def step_iter(self, max_steps=None):
+        """Run from the current state one instruction per next(), yielding a
+        StepDelta with the slot, the instruction and the registers and
+        memory cells it wrote; nothing else of the state is copied, so
+        memory use does not grow with the run. Stops like resume(): at
+        halt, the end of the program, an error, a breakpoint or watchpoint,
+        or after max_steps instructions. Closing the generator early leaves
+        the emulator where it stopped, ready for step(), resume() or
+        another step_iter(). Observers attached meanwhile are only seen by
+        the next call."""
+        if self.prog_idx >= len(self.instructions) or self.status in ("halted", "error"):
+            return
+        collector = self.add_observer(_DeltaCollector())
+        try:
+            run_loop, ops, checks = self.decoded_loop()
+            brk = checks[0]
+            expanded = self.program.expanded
+            self.status = None
+            self.stop_reason = None
+            steps = 0
+            while True:
+                pc, skipped = self.prog_idx, self.skip_next
+                if steps == max_steps:
+                    self.status = "limit"
+                    return
+                if brk is not None and brk[pc] and steps:
+                    self.stop_reason = ("break", pc)
+                    self.status = "break"
+                    return
+                collector.registers, collector.memory = [], []
+                self.prog_idx, self.skip_next, count = run_loop(
+                    self, ops, self.reg, self.mem, pc, skipped, 1, *checks
+                )
+                self.instruction_count += count
+                steps += 1
+                if self.stop_reason is not None:
+                    self.status = self.stop_reason[0]
+                elif self.status is None and self.prog_idx >= len(ops):
+                    self.status = "completed"
+                yield StepDelta(pc, expanded[pc], skipped, collector.registers, collector.memory,
+                                self.instruction_count, self.status)
+                if self.status is not None:
+                    return
+        finally:
+            self.remove_observer(collector)
+
+    def resume(self, max_steps=None):
+        """Continue until halt, a breakpoint/watchpoint or max_steps, returns the state"""
+        if self.prog_idx < len(self.instructions) and self.status not in ("halted", "error"):
+            self.status = None
+            self.instruction_count += self.run_decoded(max_steps)
+            if self.status is None:
+                self.status = "completed" if self.prog_idx >= len(self.instructions) else "limit"
+        return self.snapshot()
+
+    def memory_items(self):
+        """(address, value) of the non-zero and initialized memory locations, in address order"""
+        if isinstance(self.mem, PagedMemory):
+            return self.mem.items(self.initialized_mem)
+        return [(idx, val) for idx, val in enumerate(self.mem)
+                if val != 0 or idx in self.initialized_mem]
+
+    def snapshot(self):
+        """Current registers, memory and counters as an EmulatorState"""
+        # Include non-zero values and initialized locations
+        memory_dict = dict(self.memory_items())
+        return EmulatorState(
+            registers=self.reg.copy(),
+            memory=memory_dict,
+            instruction_count=self.instruction_count,
+            status=self.status
+        )
+
+    # Modified: Added support for testing and verification
+    def run_program(self, program_file, memory_file=None, max_steps=None):
+        """Run a program with optional initial memory state.
+        Execution stops after max_steps instructions, or at a breakpoint or
+        watchpoint; resume() continues from there."""
+        # Reset state, load program and memory if provided
+        if not self.start(program_file, memory_file):
             return None
 
         if self.verbose and not self.minimal:
@@ -303,21 +1359,16 @@ def run_program(self, program_file, memory_file=None):
         instruction_count = 0
         
         try:
-            while self.prog_idx < len(self.instructions):
-                inst = self.instructions[self.prog_idx]
-                
-                if self.verbose and not self.minimal:
-                    # Print label if it exists
-                    for label, addr in self.labels.items():
-                        if addr == self.prog_idx:
-                            print(f"{label}:")
-                    print(f"0x{self.prog_idx*2:03x}: {inst}")
-                
-                # Execute the instruction
-                if not self.execute_instruction(inst):
-                    break
-                
-                instruction_count += 1
+            # Modified: Untraced runs use the decoded fast path
+            if self.verbose and not self.minimal:
+                self.engine = "traced"
+                instruction_count = self.run_traced(max_steps)
+            else:
+                self.engine = "decoded"
+                instruction_count = self.run_decoded(max_steps)
+            if self.status is None:
+                self.status = "completed" if self.prog_idx >= len(self.instructions) else "limit"
+            self.instruction_count = instruction_count
             
             if self.verbose:
                 if not self.minimal:
@@ -326,22 +1377,11 @@ def run_program(self, program_file, memory_file=None):
                     for idx, val in enumerate(self.reg):
                         print(f"{idx:02d}: 0x{val:02x}")
                 print("\nFinal Memory State:")
-                for idx, val in enumerate(self.mem):
-                    if val != 0 or idx in self.initialized_mem:  # Show non-zero values and initialized locations
-                        print(f"0x{idx:02x}: 0x{val:02x}")
-            
-            # Added: Convert memory array to dict for return value
-            memory_dict = {
-                idx: val for idx, val in enumerate(self.mem)
-                if val != 0 or idx in self.initialized_mem  # Include non-zero values and initialized locations
-            }
+                for idx, val in self.memory_items():  # Show non-zero values and initialized locations
+                    print(f"0x{idx:02x}: 0x{val:02x}")
             
             # Added: Return final state for testing
-            return EmulatorState(
-                registers=self.reg.copy(),
-                memory=memory_dict,
-                instruction_count=instruction_count
-            )
+            return self.snapshot()
             
         except Exception as e:
             print(f"Error during execution: {e}")
@@ -350,8 +1390,33 @@ def run_program(self, program_file, memory_file=None):
 # Added: Container for emulator final state to support testing
 class EmulatorState:
     """Container for emulator final state"""
-    def __init__(self, registers, memory, instruction_count):
+    def __init__(self, registers, memory, instruction_count, status="halted"):
         self.registers = registers
         self.memory = memory
         self.instruction_count = instruction_count
+        self.status = status  # halted, completed, error or limit
     
+
+# Added: What one instruction changed, yielded by TUCAEmulator.step_iter
+class StepDelta:
+    """One executed (or skipped) instruction: its slot pc, its text, the
+    (index, value) register and (address, value) memory writes in order,
+    the instructions retired so far (a halt retires none) and the status,
+    None unless execution stopped after it"""
+    __slots__ = ("pc", "instruction", "skipped", "registers", "memory", "instruction_count", "status")
+
+    def __init__(self, pc, instruction, skipped, registers, memory, instruction_count, status=None):
+        self.pc = pc
+        self.instruction = instruction
+        self.skipped = skipped
+        self.registers = registers
+        self.memory = memory
+        self.instruction_count = instruction_count
+        self.status = status
+
+    def __repr__(self):
+        writes = [f"r{index}=0x{value:02x}" for index, value in self.registers]
+        writes += [f"mem[0x{address:02x}]=0x{value:02x}" for address, value in self.memory]
+        suffix = " (skipped)" if self.skipped else "".join(" " + w for w in writes)
+        status = f" [{self.status}]" if self.status else ""
+        return f"<StepDelta 0x{self.pc*2:03x}: {self.instruction}{suffix}{status}>"
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+import io
+import sys
+import json
+import hashlib
+import itertools
+import multiprocessing
+from contextlib import redirect_stdout
+from typing import Iterable, Iterator, TextIO
+
+from TUCA51_emulator import TUCAEmulator, Program, MemoryImage, MEMORY_SIZE
+from columnar import ColumnarResults, STATUSES, NOT_CHECKED, PASSED, FAILED
+
+# Jobs handed to the worker pool at a time, per worker. Keeps memory bounded
+# no matter how long the input stream is.
+WINDOW_PER_WORKER = 64
+
+class BatchRunner:
+    """Run a stream of JSON job lines, reusing parsed programs across jobs.
+
+    Each job is a JSON object with:
+      id            Optional job identifier (defaults to the line number)
+      program       Path to an assembly program, or
+      source        Inline program text
+      memory        Path to a memory file, or
+      memory_text   Inline memory file text, or
+      memory_values Values for consecutive addresses from 0x00 (ints or "0x.." strings)
+      expected      Optional {"memory": {"0x02": "0x08"}}, as in config.json
+      max_steps     Optional instruction limit
+      memory_size   Optional data memory size in bytes (256 by default)
+
+    Each result is a JSON object with the job id, the emulator status,
+    the instruction count, the final memory and, if expected values were
+    given, "passed" and the list of mismatches.
+    """
+    def __init__(self, cache, include_memory=True):
+        self.cache = cache
+        self.include_memory = include_memory
+
+    def program(self, job):
+        if "source" in job:
+            key = hashlib.sha1(job["source"].encode()).hexdigest()
+            return self.cache.value(("source", key), lambda: Program.from_lines(job["source"].splitlines()))
+        return self.cache.program(job["program"])
+
+    def memory(self, job):
+        if "memory_values" in job:
+            values = [int(v, 16) if isinstance(v, str) else v for v in job["memory_values"]]
+            return MemoryImage([(idx, f"0x{v:02x}", v, None) for idx, v in enumerate(values)])
+        if "memory_text" in job:
+            return MemoryImage.from_lines(job["memory_text"].splitlines())
+        if "memory" in job:
+            return self.cache.memory(job["memory"])
+        return None
+
+    def execute(self, job: dict):
+        """Run one job's emulator, returns it and its final state (None on errors)"""
+        emulator = TUCAEmulator(verbose=False, minimal=True,
+                                memory_size=job.get("memory_size", MEMORY_SIZE))
+        final_state = emulator.run_program(
+            program_file=self.program(job),
+            memory_file=self.memory(job),
+            max_steps=job.get("max_steps")
+        )
+        return emulator, final_state
+
+    @staticmethod
+    def mismatches(job: dict, final_state) -> list:
+        """(address, expected, actual) of the job's expected values that differ"""
+        mismatches = []
+        for addr_str, value_str in job.get("expected", {}).get("memory", {}).items():
+            addr = int(addr_str.replace('0x', ''), 16)
+            expected = int(value_str.replace('0x', ''), 16)
+            actual = final_state.memory.get(addr, 0)
+            if actual != expected:
+                mismatches.append((addr, expected, actual))
+        return mismatches
+
+    def run_job(self, job: dict) -> dict:
+        """Run one job, never raises"""
+        result = {"id": job.get("id")}
+        log = io.StringIO()
+        try:
+            with redirect_stdout(log):
+                _, final_state = self.execute(job)
+            if final_state is None:
+                result["status"] = "error"
+            else:
+                result["status"] = final_state.status
+                result["instruction_count"] = final_state.instruction_count
+                if self.include_memory:
+                    result["memory"] = {
+                        f"0x{addr:02x}": f"0x{value:02x}"
+                        for addr, value in sorted(final_state.memory.items())
+                    }
+                if "expected" in job:
+                    mismatches = [
+                        {"address": f"0x{addr:02x}", "expected": f"0x{expected:02x}", "actual": f"0x{actual:02x}"}
+                        for addr, expected, actual in self.mismatches(job, final_state)
+                    ]
+                    result["passed"] = not mismatches and final_state.status != "error"
+                    result["mismatches"] = mismatches
+        except Exception as e:
+            result["status"] = "error"
+            print(f"Error running job: {e}", file=log)
+        if log.getvalue():
+            result["log"] = log.getvalue()
+        return result
+
+    def run_into(self, results, index: int, job: dict) -> tuple:
+        """Run one job and store its final state in row index of a
+        ColumnarResults, returns (ok, log text); never raises"""
+        log = io.StringIO()
+        try:
+            with redirect_stdout(log):
+                emulator, final_state = self.execute(job)
+            if final_state is None:
+                results.store_error(index)
+                return False, log.getvalue()
+            passed = NOT_CHECKED
+            if "expected" in job:
+                ok = not self.mismatches(job, final_state) and final_state.status != "error"
+                passed = PASSED if ok else FAILED
+            results.store(index, emulator, passed)
+            return final_state.status != "error" and passed != FAILED, log.getvalue()
+        except Exception as e:
+            results.store_error(index)
+            return False, log.getvalue() + f"Error running job: {e}\n"
+
+    def run_line(self, numbered_line) -> tuple:
+        """Run one (line number, JSON text) job, returns (ok, JSON result line)"""
+        line_num, line = numbered_line
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("job must be a JSON object")
+        except ValueError as e:
+            return False, json.dumps({"id": line_num, "status": "error", "log": f"Invalid job: {e}"})
+        job.setdefault("id", line_num)
+        result = self.run_job(job)
+        ok = result["status"] != "error" and result.get("passed") is not False
+        return ok, json.dumps(result)
+
+# Per-process runner used by the worker pool
+_worker_runner = None
+
+def _init_worker(max_entries, include_memory):
+    global _worker_runner
+    from run import FileCache
+    _worker_runner = BatchRunner(FileCache(max_entries=max_entries), include_memory)
+
+def _run_line_in_worker(numbered_line):
+    return _worker_runner.run_line(numbered_line)
+
+# Results filled in place by columnar workers: inherited when they are
+# forked, attached by name otherwise
+_worker_results = None
+
+def _init_columnar_worker(max_entries, name, count, width):
+    global _worker_runner, _worker_results
+    from run import FileCache
+    _worker_runner = BatchRunner(FileCache(max_entries=max_entries))
+    if name is not None:
+        _worker_results = ColumnarResults.attach(name, count, width)
+
+def _run_into_in_worker(numbered_job):
+    index, job = numbered_job
+    ok, log = _worker_runner.run_into(_worker_results, index, job)
+    return index, ok, log
+
+def run_columnar(jobs_list: list, cache, jobs: int = 1, width: int = MEMORY_SIZE) -> tuple:
+    """
+    Run a list of job dicts into one ColumnarResults, row i for job i.
+    Args:
+        jobs_list: Job dicts, as in BatchRunner
+        cache: FileCache used for programs and memory files
+        jobs: Number of worker processes, which write their rows straight
+              into a shared memory block and only send back (row, ok, log)
+        width: Bytes of data memory kept per job
+    Returns:
+        tuple: (ColumnarResults, {row: log text} for jobs that printed anything)
+    The caller closes the results when done with them.
+    """
+    global _worker_results
+    ids = [job.get("id", index + 1) for index, job in enumerate(jobs_list)]
+    logs = {}
+    if jobs <= 1:
+        results = ColumnarResults(len(jobs_list), width, ids=ids)
+        runner = BatchRunner(cache)
+        for index, job in enumerate(jobs_list):
+            ok, log = runner.run_into(results, index, job)
+            if log:
+                logs[index] = log
+        return results, logs
+
+    results = ColumnarResults.shared(len(jobs_list), width, ids=ids)
+    if "fork" in multiprocessing.get_all_start_methods():
+        _worker_results = results
+        pool = multiprocessing.get_context("fork").Pool(
+            jobs, initializer=_init_columnar_worker, initargs=(cache.max_entries, None, 0, 0))
+    else:
+        pool = multiprocessing.Pool(jobs, initializer=_init_columnar_worker,
+                                    initargs=(cache.max_entries, results.shm.name, len(jobs_list), width))
+    try:
+        with pool:
+            chunksize = max(1, len(jobs_list) // (jobs * WINDOW_PER_WORKER))
+            for index, ok, log in pool.imap_unordered(_run_into_in_worker, enumerate(jobs_list), chunksize):
+                if log:
+                    logs[index] = log
+    except BaseException:
+        results.close()
+        raise
+    finally:
+        _worker_results = None
+    return results, logs
+
+def columnar_main(source: str, output: str, cache, jobs: int, width: int) -> int:
+    """Run a whole job file into a columnar results file"""
+    jobs_list = []
+    with (sys.stdin if source == "-" else open(source)) as f:
+        for line_num, line in numbered_jobs(f):
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("job must be a JSON object")
+            except ValueError as e:
+                print(f"Invalid job on line {line_num}: {e}", file=sys.stderr)
+                return 1
+            job.setdefault("id", line_num)
+            jobs_list.append(job)
+    results, logs = run_columnar(jobs_list, cache, jobs, width)
+    with results:
+        results.save(output)
+        failed = sum(1 for code in results.passed if code == FAILED)
+        errors = sum(1 for code in results.statuses if STATUSES[code] == "error")
+    for index, log in sorted(logs.items()):
+        print(f"Job {jobs_list[index]['id']}: {log.rstrip()}", file=sys.stderr)
+    print(f"{len(jobs_list)} jobs, {failed} failed, {errors} errors, results written to {output}",
+          file=sys.stderr)
+    return 1 if failed or errors else 0
+
+def numbered_jobs(lines: Iterable[str]) -> Iterator:
+    """(line number, text) for every non-blank line"""
+    return ((num, line) for num, line in enumerate(lines, 1) if line.strip())
+
+def run_batch(lines: Iterable[str], out: TextIO, cache, jobs: int = 1,
+              include_memory: bool = True) -> int:
+    """
+    Stream results for a stream of job lines.
+    Args:
+        lines: Job lines (a file, stdin or any iterable of strings)
+        out: Where to write one JSON result per line
+        cache: FileCache used for programs and memory files
+        jobs: Number of worker processes (results are written as jobs finish)
+        include_memory: Include the final memory in every result
+    Returns:
+        int: Exit code, 1 if any job failed or errored
+    """
+    failed = False
+    pending = numbered_jobs(lines)
+
+    def emit(ok, result_line):
+        nonlocal failed
+        failed = failed or not ok
+        out.write(result_line + "\n")
+        out.flush()
+
+    if jobs <= 1:
+        runner = BatchRunner(cache, include_memory)
+        for numbered_line in pending:
+            emit(*runner.run_line(numbered_line))
+    else:
+        with multiprocessing.Pool(jobs, initializer=_init_worker,
+                                  initargs=(cache.max_entries, include_memory)) as pool:
+            while True:
+                window = list(itertools.islice(pending, jobs * WINDOW_PER_WORKER))
+                if not window:
+                    break
+                for ok, result_line in pool.imap_unordered(_run_line_in_worker, window):
+                    emit(ok, result_line)
+
+    return 1 if failed else 0
+
+def main(argv, cache) -> int:
+    """Entry point for run.py --batch [jobs.jsonl|-] [--jobs N] [--no-memory]
+    [--columnar FILE [--width N]]"""
+    from run import int_option
+    source = "-"
+    args = [a for a in argv if a != "--batch"]
+    try:
+        jobs = int_option(args, "--jobs", 1, minimum=1)
+        width = int_option(args, "--width", MEMORY_SIZE, minimum=1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py --batch [jobs.jsonl|-] [--jobs N] [--no-memory] [--columnar FILE [--width N]]")
+        return 1
+    for flag in ("--jobs", "--width"):
+        if flag in args:
+            idx = args.index(flag)
+            del args[idx:idx + 2]
+    columnar = None
+    if "--columnar" in args:
+        idx = args.index("--columnar")
+        if idx + 1 >= len(args):
+            print("Error: --columnar needs a file name")
+            return 1
+        columnar = args[idx + 1]
+        del args[idx:idx + 2]
+    include_memory = "--no-memory" not in args
+    args = [a for a in args if a != "--no-memory"]
+    if args:
+        source = args[0]
+
+    if columnar is not None:
+        return columnar_main(source, columnar, cache, jobs, width)
+
+    if source == "-":
+        return run_batch(sys.stdin, sys.stdout, cache, jobs, include_memory)
+    with open(source) as f:
+        return run_batch(f, sys.stdout, cache, jobs, include_memory)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+import json
+import random
+from array import array
+from pathlib import Path
+
+from TUCA51_emulator import TUCAEmulator, Observer
+
+REPLACEMENT = ("lru", "fifo", "random")
+WRITE_POLICIES = ("write-back", "write-through")
+MEMORY_CYCLES = 20       # Cycles of a memory access below the last cache level
+INSTRUCTION_SPACE = 1 << 24  # Added to instruction addresses, which are not data addresses
+
+# Used when config.json has no "cache" section: small enough for 256 bytes
+# of data memory and short programs to show misses
+DEFAULT_CONFIG = {
+    "l1i": {"size": 32, "associativity": 2, "line_size": 4},
+    "l1d": {"size": 32, "associativity": 2, "line_size": 4},
+    "memory_cycles": MEMORY_CYCLES,
+}
+
+def _power_of_two(value: int) -> bool:
+    return value > 0 and value & (value - 1) == 0
+
+class Cache:
+    """One set-associative cache level.
+
+    Tags, dirty bits and use stamps are flat arrays indexed by
+    set * associativity + way, with -1 marking an invalid line, so an
+    access is a shift, a mask and a search of one set. A miss (and a
+    write-through write) goes to next_level, or to memory at memory_cycles.
+    access() returns the cycles the access took; cycles beyond hit_cycles
+    are counted as stall_cycles.
+    """
+    def __init__(self, name: str, size: int, associativity: int = 1, line_size: int = 4,
+                 replacement: str = "lru", write_policy: str = "write-back", write_allocate=None,
+                 hit_cycles: int = 1, next_level=None, memory_cycles: int = MEMORY_CYCLES, seed: int = 0):
+        if not (_power_of_two(size) and _power_of_two(associativity) and _power_of_two(line_size)):
+            raise ValueError(f"{name}: size, associativity and line size must be powers of two")
+        if associativity * line_size > size:
+            raise ValueError(f"{name}: {associativity} ways of {line_size}-byte lines do not fit in {size} bytes")
+        if replacement not in REPLACEMENT:
+            raise ValueError(f"{name}: replacement must be one of {', '.join(REPLACEMENT)}")
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f"{name}: write policy must be one of {', '.join(WRITE_POLICIES)}")
+        self.name = name
+        self.size = size
+        self.ways = associativity
+        self.line_size = line_size
+        self.replacement = replacement
+        self.lru = replacement == "lru"
+        self.write_policy = write_policy
+        self.write_back = write_policy == "write-back"
+        # Write-back caches allocate on a write miss, write-through ones do not, unless told otherwise
+        self.write_allocate = self.write_back if write_allocate is None else write_allocate
+        self.hit_cycles = hit_cycles
+        self.next_level = next_level
+        self.memory_cycles = memory_cycles
+        self.sets = size // (associativity * line_size)
+        self.offset_bits = line_size.bit_length() - 1
+        self.set_bits = self.sets.bit_length() - 1
+        self.set_mask = self.sets - 1
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        """Invalidate every line and clear the counters"""
+        lines = self.sets * self.ways
+        self.tags = array('q', [-1]) * lines
+        self.dirty = bytearray(lines)
+        self.stamps = array('Q', bytes(8 * lines))  # Last use (lru) or fill (fifo)
+        self.clock = 0
+        self.reads = self.writes = 0
+        self.read_misses = self.write_misses = 0
+        self.writebacks = 0
+        self.stall_cycles = 0
+
+    def below(self, address: int, write: bool) -> int:
+        if self.next_level is not None:
+            return self.next_level.access(address, write)
+        return self.memory_cycles
+
+    def access(self, address: int, write: bool = False) -> int:
+        """Read or write the byte at address, returns the cycles it took"""
+        line = address >> self.offset_bits
+        first = (line & self.set_mask) * self.ways
+        self.clock += 1
+        try:
+            way = self.tags.index(line >> self.set_bits, first, first + self.ways)
+        except ValueError:
+            return self.miss(address, write, line, first)
+        if self.lru:
+            self.stamps[way] = self.clock
+        if not write:
+            self.reads += 1
+            return self.hit_cycles
+        self.writes += 1
+        if self.write_back:
+            self.dirty[way] = 1
+            return self.hit_cycles
+        stall = self.below(address, True)
+        self.stall_cycles += stall
+        return self.hit_cycles + stall
+
+    def miss(self, address: int, write: bool, line: int, first: int) -> int:
+        tags = self.tags
+        if write:
+            self.writes += 1
+            self.write_misses += 1
+            if not self.write_allocate:
+                stall = self.below(address, True)
+                self.stall_cycles += stall
+                return self.hit_cycles + stall
+        else:
+            self.reads += 1
+            self.read_misses += 1
+        way = self.victim(first)
+        stall = 0
+        if self.dirty[way]:
+            self.writebacks += 1
+            victim = ((tags[way] << self.set_bits) | (line & self.set_mask)) << self.offset_bits
+            stall += self.below(victim, True)
+        stall += self.below(address, False)  # Line fill
+        tags[way] = line >> self.set_bits
+        self.stamps[way] = self.clock
+        self.dirty[way] = write and self.write_back
+        if write and not self.write_back:
+            stall += self.below(address, True)
+        self.stall_cycles += stall
+        return self.hit_cycles + stall
+
+    def victim(self, first: int) -> int:
+        """Way to fill in the set starting at first: an invalid one, else by the replacement policy"""
+        end = first + self.ways
+        tags = self.tags[first:end]
+        if -1 in tags:
+            return first + tags.index(-1)
+        if self.replacement == "random":
+            return first + self.rng.randrange(self.ways)
+        stamps = self.stamps[first:end]
+        return first + stamps.index(min(stamps))
+
+    @property
+    def accesses(self) -> int:
+        return self.reads + self.writes
+
+    @property
+    def misses(self) -> int:
+        return self.read_misses + self.write_misses
+
+    def hit_rate(self) -> float:
+        return 1 - self.misses / self.accesses if self.accesses else 0.0
+
+    def describe(self) -> str:
+        return (f"{self.size} B, {self.ways}-way, {self.line_size} B lines, {self.replacement}, "
+                f"{self.write_policy}")
+
+    def summary(self) -> str:
+        writes = f", {self.writes} writes, {self.writebacks} writebacks" if self.writes else ""
+        return (f"{self.name:<4} {self.accesses:>8} accesses, {100 * self.hit_rate():5.1f}% hits, "
+                f"{self.misses} misses ({self.read_misses} read, {self.write_misses} write){writes}")
+
+    def add_counters(self, other: "Cache"):
+        """Add the counters of another cache, e.g. one per test, to these"""
+        self.reads += other.reads
+        self.writes += other.writes
+        self.read_misses += other.read_misses
+        self.write_misses += other.write_misses
+        self.writebacks += other.writebacks
+        self.stall_cycles += other.stall_cycles
+
+def create_cache(name: str, spec: dict, next_level=None, memory_cycles: int = MEMORY_CYCLES) -> Cache:
+    """Cache from a config.json entry such as {"size": 64, "associativity": 2,
+    "line_size": 4, "replacement": "lru", "write_policy": "write-back",
+    "write_allocate": true, "hit_cycles": 1}"""
+    return Cache(name, int(str(spec["size"]), 0), int(spec.get("associativity", 1)),
+                 int(spec.get("line_size", 4)), spec.get("replacement", "lru"),
+                 spec.get("write_policy", "write-back"), spec.get("write_allocate"),
+                 int(spec.get("hit_cycles", 1)), next_level, memory_cycles, int(spec.get("seed", 0)))
+
+class CacheHierarchy(Observer):
+    """Instruction and data caches fed by the emulator's fetches and
+    ld/ldr/st/str, attached with TUCAEmulator.add_observer.
+
+    Fetches go to l1i at the byte address of the instruction (two bytes
+    per slot) and data accesses to l1d; an optional l2 is shared by both,
+    with instruction addresses kept apart by INSTRUCTION_SPACE since
+    instruction and data memory are separate. The model only counts: it
+    never changes what the program reads. Accesses to memory-mapped
+    devices bypass the caches.
+    """
+    def __init__(self, l1i: Cache, l1d: Cache, l2: Cache = None):
+        self.l1i = l1i
+        self.l1d = l1d
+        self.l2 = l2
+
+    @classmethod
+    def from_config(cls, config: dict = None):
+        """Hierarchy from a config.json "cache" section with "l1i", "l1d" and
+        optional "l2" entries (see create_cache) and "memory_cycles" """
+        config = config or DEFAULT_CONFIG
+        memory_cycles = int(config.get("memory_cycles", MEMORY_CYCLES))
+        l2 = create_cache("L2", config["l2"], None, memory_cycles) if config.get("l2") else None
+        return cls(create_cache("L1I", config.get("l1i", DEFAULT_CONFIG["l1i"]), l2, memory_cycles),
+                   create_cache("L1D", config.get("l1d", DEFAULT_CONFIG["l1d"]), l2, memory_cycles),
+                   l2)
+
+    def caches(self) -> list:
+        return [self.l1i, self.l1d] + ([self.l2] if self.l2 else [])
+
+    def reset(self):
+        for cache in self.caches():
+            cache.reset()
+
+    def on_fetch(self, emu, pc):
+        self.l1i.access(pc << 1 | INSTRUCTION_SPACE)
+
+    def on_memory_read(self, emu, address, value):
+        if not (emu.devices and emu.device_at(address)):
+            self.l1d.access(address)
+
+    def on_memory_write(self, emu, address, value):
+        if not (emu.devices and emu.device_at(address)):
+            self.l1d.access(address, True)
+
+    @property
+    def stall_cycles(self) -> int:
+        """Cycles lost to the L1 misses (and write-through writes), including the levels below"""
+        return self.l1i.stall_cycles + self.l1d.stall_cycles
+
+    def report(self, instruction_count: int) -> list:
+        lines = [cache.summary() for cache in self.caches()]
+        per_instruction = self.stall_cycles / instruction_count if instruction_count else 0.0
+        lines.append(f"Stall cycles: {self.stall_cycles} ({per_instruction:.2f} per instruction)")
+        return lines
+
+def run_with_caches(program_file: Path, test_case: dict, config: dict, cache_config: dict = None, cache=None):
+    """Run one test case with a fresh hierarchy attached, returns
+    (final state, hierarchy, passed)"""
+    from run import memory_options
+    hierarchy = CacheHierarchy.from_config(cache_config)
+    emulator = TUCAEmulator(verbose=False, minimal=True, **memory_options(program_file, config))
+    emulator.add_observer(hierarchy)
+    memory_file = program_file.parent / test_case['memory']
+    final_state = emulator.run_program(cache.program(program_file) if cache else program_file,
+                                       cache.memory(memory_file) if cache else memory_file)
+    passed = final_state is not None and all(
+        final_state.memory.get(int(addr, 16), 0) == int(value, 16)
+        for addr, value in test_case['expected']['memory'].items())
+    return final_state, hierarchy, passed
+
+def main(program_file: Path, config: dict, argv: list, cache) -> int:
+    """Entry point for run.py <program.txt> --cache [--cache-config FILE]:
+    every test case with the cache hierarchy of config.json's "cache"
+    section, of FILE (a JSON file holding such a section) or DEFAULT_CONFIG"""
+    cache_config = config.get("cache")
+    try:
+        if '--cache-config' in argv:
+            with open(argv[argv.index('--cache-config') + 1]) as f:
+                cache_config = json.load(f)
+        totals = CacheHierarchy.from_config(cache_config)
+    except (OSError, IndexError, KeyError, ValueError) as e:
+        print(f"Error: invalid cache configuration: {e}")
+        return 1
+    print(f"Cache model: {program_file}")
+    for level in totals.caches():
+        print(f"  {level.name:<4} {level.describe()}, {level.hit_cycles} cycle hits")
+    print(f"  Memory {totals.l1d.memory_cycles} cycles")
+    print("----------------")
+
+    all_passed = True
+    instructions = 0
+    for test_case in config.get('test_cases', []):
+        final_state, result, passed = run_with_caches(program_file, test_case, config, cache_config, cache)
+        all_passed &= passed
+        count = final_state.instruction_count if final_state else 0
+        instructions += count
+        mark = "✅" if passed else "❌"
+        print(f"{mark} {test_case['name']}: {count} instructions, "
+              f"L1I {100 * result.l1i.hit_rate():.1f}% hits, L1D {100 * result.l1d.hit_rate():.1f}% hits, "
+              f"{result.stall_cycles} stall cycles")
+        for total, level in zip(totals.caches(), result.caches()):
+            total.add_counters(level)
+    print("----------------")
+    print("\n".join(totals.report(instructions)))
+    return 0 if all_passed else 1
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import socket
+import getpass
+import tempfile
+
+# Default socket of the emulator server, override with the TUCA_SOCKET variable
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"tuca-emu-{getpass.getuser()}.sock")
+
+def request(payload: dict, socket_path: str = None) -> dict:
+    """Send one request to the emulator server and return its response"""
+    socket_path = socket_path or os.environ.get("TUCA_SOCKET", DEFAULT_SOCKET)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(payload) + "\n").encode())
+        with sock.makefile('r', encoding='utf-8') as f:
+            return json.loads(f.readline())
+
+def main():
+    """Thin client for server.py, takes the same arguments as run.py"""
+    args = sys.argv[1:]
+    try:
+        response = request({"cmd": "run", "args": args, "cwd": os.getcwd()})
+    except (OSError, AttributeError, ValueError):
+        # No server available (or no Unix sockets): run in this process instead
+        from run import run
+        sys.exit(run(args))
+
+    sys.stdout.write(response.get("output", ""))
+    if "error" in response:
+        print(f"Error: {response['error']}")
+    sys.exit(response.get("exit_code", 1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+
+import json
+import mmap
+import struct
+import operator
+from pathlib import Path
+from multiprocessing import shared_memory
+
+from TUCA51_emulator import EmulatorState, PagedMemory, PAGE_BITS, MEMORY_SIZE
+
+# NumPy is optional: it makes queries and comparisons vectorized, and
+# arrays() gives NumPy views of the columns
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"TUCR"
+VERSION = 1
+REGISTERS = 16
+# magic, version, count, memory width, ids offset, ids length
+HEADER = struct.Struct("<4sIQIQQ")
+HEADER_SIZE = 64
+
+# Status column codes; 0 is a row that was never filled, or whose status is
+# unknown (memory dumps)
+STATUSES = ("", "halted", "completed", "error", "limit", "break", "watch")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+# Passed column: the job had no expected values, passed or failed
+NOT_CHECKED, PASSED, FAILED = 0, 1, 2
+
+# Comparison operators of where()
+OPERATORS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt,
+             "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# Fields compared by compare()
+FIELDS = ("registers", "memory", "instruction_count", "status")
+
+def layout(count: int, width: int) -> dict:
+    """Byte offset of every column; counts come first to stay 8-byte aligned"""
+    offsets = {"instruction_count": HEADER_SIZE}
+    offsets["registers"] = offsets["instruction_count"] + 8 * count
+    offsets["memory"] = offsets["registers"] + REGISTERS * count
+    offsets["status"] = offsets["memory"] + width * count
+    offsets["passed"] = offsets["status"] + count
+    offsets["end"] = offsets["passed"] + count
+    return offsets
+
+def memory_bytes(mem, width: int) -> bytes:
+    """The first width bytes of an emulator memory, zero padded"""
+    if isinstance(mem, PagedMemory):
+        pages = range((min(width, len(mem)) + (1 << PAGE_BITS) - 1) >> PAGE_BITS)
+        data = b"".join(bytes(mem.page(index)) for index in pages)
+    else:
+        data = bytes(mem[:width])
+    data = data[:min(width, len(mem))]
+    return data + bytes(width - len(data))
+
+class ColumnarResults:
+    """Final registers, memory, instruction counts and statuses of many runs
+    in one flat buffer, one column per field and one row per job.
+
+    The buffer may be a bytearray, the buf of a multiprocessing
+    SharedMemory (so worker processes can fill rows in place) or a
+    read-only mmap of a saved file. Row accessors return memoryview slices
+    of the buffer, so reading results copies nothing. Memory rows hold the
+    first `width` bytes of each run's data memory; integers are stored in
+    native byte order. Job ids are kept in the `ids` list and written after
+    the columns by save().
+    """
+    def __init__(self, count: int, width: int = MEMORY_SIZE, buffer=None, ids=None):
+        self.count = count
+        self.width = width
+        self.offsets = layout(count, width)
+        self.buffer = buffer if buffer is not None else bytearray(self.offsets["end"])
+        self.view = memoryview(self.buffer)
+        self.ids = ids if ids is not None else list(range(count))
+        self.shm = None
+        self.mapped = None
+        self.counts = self.view[self.offsets["instruction_count"]:self.offsets["registers"]].cast("Q")
+        self.statuses = self.view[self.offsets["status"]:self.offsets["passed"]]
+        self.passed = self.view[self.offsets["passed"]:self.offsets["end"]]
+
+    @classmethod
+    def shared(cls, count: int, width: int = MEMORY_SIZE, ids=None):
+        """Results in a new SharedMemory block; close() releases it"""
+        shm = shared_memory.SharedMemory(create=True, size=max(1, layout(count, width)["end"]))
+        results = cls(count, width, shm.buf, ids)
+        results.shm = shm
+        return results
+
+    @classmethod
+    def attach(cls, name: str, count: int, width: int = MEMORY_SIZE):
+        """Results in an existing SharedMemory block, as seen from another process"""
+        # Worker processes share the creator's resource tracker, so the block
+        # stays registered once and is only unlinked by the creator
+        shm = shared_memory.SharedMemory(name=name)
+        results = cls(count, width, shm.buf)
+        results.shm = shm
+        return results
+
+    def close(self, unlink: bool = True):
+        """Release the buffer; a SharedMemory block is also unlinked unless
+        unlink is False (processes that only attached to it)"""
+        for name in ("counts", "statuses", "passed", "view"):
+            getattr(self, name).release()
+        self.buffer = None
+        if self.shm is not None:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+            self.shm = None
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def row(self, column: str, index: int, size: int) -> memoryview:
+        start = self.offsets[column] + index * size
+        return self.view[start:start + size]
+
+    def registers(self, index: int) -> memoryview:
+        return self.row("registers", index, REGISTERS)
+
+    def memory(self, index: int) -> memoryview:
+        return self.row("memory", index, self.width)
+
+    def instruction_count(self, index: int) -> int:
+        return self.counts[index]
+
+    def status(self, index: int) -> str:
+        return STATUSES[self.statuses[index]]
+
+    def store(self, index: int, emulator, passed: int = NOT_CHECKED):
+        """Write the state of a TUCAEmulator after its run into row index"""
+        self.store_state(index, emulator.reg, emulator.mem, emulator.instruction_count,
+                         emulator.status or "error", passed)
+
+    def store_state(self, index: int, registers, mem, instruction_count: int, status: str,
+                    passed: int = NOT_CHECKED):
+        """Write registers, a memory (list, PagedMemory or bytes) and counters into row index"""
+        self.registers(index)[:] = bytes(registers[:REGISTERS]).ljust(REGISTERS, b"\0")
+        self.memory(index)[:] = memory_bytes(mem, self.width)
+        self.counts[index] = instruction_count
+        self.statuses[index] = STATUS_CODES.get(status, 0)
+        self.passed[index] = passed
+
+    def store_error(self, index: int):
+        self.statuses[index] = STATUS_CODES["error"]
+        self.passed[index] = FAILED
+
+    def state(self, index: int) -> EmulatorState:
+        """Row index as an EmulatorState (this one copies)"""
+        memory = {addr: value for addr, value in enumerate(self.memory(index)) if value}
+        return EmulatorState(list(self.registers(index)), memory, self.instruction_count(index),
+                             self.status(index))
+
+    def arrays(self) -> dict:
+        """NumPy views of the columns, without copying: registers (N, 16),
+        memory (N, width), instruction_count, status and passed (N,)"""
+        if numpy is None:
+            raise ImportError("arrays() needs NumPy")
+        n, o = self.count, self.offsets
+
+        def column(name, dtype, shape):
+            return numpy.frombuffer(self.buffer, dtype=dtype, count=int(numpy.prod(shape)),
+                                    offset=o[name]).reshape(shape)
+
+        return {
+            "registers": column("registers", numpy.uint8, (n, REGISTERS)),
+            "memory": column("memory", numpy.uint8, (n, self.width)),
+            "instruction_count": column("instruction_count", numpy.uint64, (n,)),
+            "status": column("status", numpy.uint8, (n,)),
+            "passed": column("passed", numpy.uint8, (n,)),
+        }
+
+    def column(self, address: int):
+        """Byte at a memory address in every row: a NumPy view, or bytes"""
+        if not 0 <= address < self.width:
+            raise IndexError(f"address 0x{address:02x} is outside the {self.width} stored bytes")
+        if numpy is not None:
+            return self.arrays()["memory"][:, address]
+        start = self.offsets["memory"] + address
+        return bytes(self.view[start:self.offsets["status"]:self.width])
+
+    def where(self, address: int, op: str, value) -> list:
+        """Rows where mem[address] op value, value being an int or one value
+        per row, e.g. where(0x02, "!=", 0x08)"""
+        compare = OPERATORS[op]
+        values = self.column(address)
+        if numpy is not None:
+            return numpy.flatnonzero(compare(values, numpy.asarray(value))).tolist()
+        if isinstance(value, int):
+            return [row for row, actual in enumerate(values) if compare(actual, value)]
+        return [row for row, (actual, v) in enumerate(zip(values, value)) if compare(actual, v)]
+
+    def mismatches(self, expected: dict) -> list:
+        """Rows where any address of expected ({address: value}) holds another value"""
+        rows = set()
+        for address, value in expected.items():
+            rows.update(self.where(address, "!=", value))
+        return sorted(rows)
+
+    def rows_with_status(self, status: str) -> list:
+        code = STATUS_CODES[status]
+        if numpy is not None:
+            return numpy.flatnonzero(self.arrays()["status"] == code).tolist()
+        return [row for row, value in enumerate(self.statuses) if value == code]
+
+    def failed(self) -> list:
+        """Rows whose expected values did not match"""
+        if numpy is not None:
+            return numpy.flatnonzero(self.arrays()["passed"] == FAILED).tolist()
+        return [row for row, value in enumerate(self.passed) if value == FAILED]
+
+    def compare(self, other: "ColumnarResults", fields=FIELDS) -> dict:
+        """Differences between two result sets, such as two engines or the
+        emulator and Verilog memory dumps. Rows are matched by id; returns
+        {field: ids that differ} for each field, plus "missing" (ids only
+        in self) and "extra" (ids only in other). Memory is compared over
+        the bytes both sets store."""
+        positions = {job_id: row for row, job_id in enumerate(other.ids)}
+        mine = [row for row, job_id in enumerate(self.ids) if job_id in positions]
+        theirs = [positions[self.ids[row]] for row in mine]
+        ours = set(self.ids)
+        differences = {
+            "missing": [job_id for job_id in self.ids if job_id not in positions],
+            "extra": [job_id for job_id in other.ids if job_id not in ours],
+        }
+        width = min(self.width, other.width)
+        if numpy is not None:
+            a, b = self.arrays(), other.arrays()
+            for field in fields:
+                left, right = a[field][mine], b[field][theirs]
+                if field == "memory":
+                    left, right = left[:, :width], right[:, :width]
+                differ = left != right
+                if differ.ndim > 1:
+                    differ = differ.any(axis=1)
+                differences[field] = [self.ids[mine[i]] for i in numpy.flatnonzero(differ)]
+            return differences
+        getters = {
+            "registers": lambda results, row: results.registers(row),
+            "memory": lambda results, row: results.memory(row)[:width],
+            "instruction_count": lambda results, row: results.counts[row],
+            "status": lambda results, row: results.statuses[row],
+        }
+        for field in fields:
+            get = getters[field]
+            differences[field] = [self.ids[row] for row, other_row in zip(mine, theirs)
+                                  if get(self, row) != get(other, other_row)]
+        return differences
+
+    @classmethod
+    def from_states(cls, states, ids=None, width: int = MEMORY_SIZE):
+        """Results from EmulatorState objects, or from plain {address: value}
+        memory dicts (whose registers, counts and statuses are unknown)"""
+        states = list(states)
+        results = cls(len(states), width, ids=list(ids) if ids is not None else None)
+        for row, state in enumerate(states):
+            memory = bytearray(width)
+            for address, value in (state.memory if isinstance(state, EmulatorState) else state).items():
+                if address < width:
+                    memory[address] = value
+            if isinstance(state, EmulatorState):
+                results.store_state(row, state.registers, memory, state.instruction_count, state.status)
+            else:
+                results.store_state(row, (), memory, 0, "")
+        return results
+
+    @classmethod
+    def from_memory_dumps(cls, files, ids=None, width: int = MEMORY_SIZE):
+        """Results from memory dumps with one "addr=value" line (hex) per
+        address, the format of results/emulator and results/verilog files"""
+        memories = []
+        for file in files:
+            memory = {}
+            with open(file) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("//") or "=" not in line:
+                        continue
+                    address, value = line.split("=", 1)
+                    memory[int(address, 16)] = int(value, 16)
+            memories.append(memory)
+        return cls.from_states(memories, ids if ids is not None else [str(f) for f in files], width)
+
+    def save(self, path):
+        """Write the header, the columns and the job ids to a file"""
+        ids = json.dumps(self.ids).encode()
+        end = self.offsets["end"]
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.count, self.width, end, len(ids)).ljust(HEADER_SIZE, b"\0"))
+            f.write(self.view[HEADER_SIZE:end])
+            f.write(ids)
+
+    @classmethod
+    def load(cls, path):
+        """Results saved by save(), memory-mapped read-only"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, width, ids_offset, ids_length = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            raise ValueError(f"{path} is not a TUCA results file")
+        ids = json.loads(mapped[ids_offset:ids_offset + ids_length])
+        results = cls(count, width, mapped, ids)
+        results.mapped = mapped
+        return results
+
+def open_results(path, width: int = MEMORY_SIZE) -> ColumnarResults:
+    """A saved results file, or a directory of memory dumps (such as a
+    program's results/ directory) with the file names as ids"""
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(path.glob("*.txt"))
+        return ColumnarResults.from_memory_dumps(files, [f.name for f in files], width)
+    return ColumnarResults.load(path)
+
+def compare_main(argv: list) -> int:
+    """Entry point for run.py --compare A B [--fields memory,...] [--width N]:
+    A and B are results files or directories of memory dumps"""
+    fields = FIELDS
+    width = MEMORY_SIZE
+    paths = []
+    index = 0
+    while index < len(argv):
+        if argv[index] == "--fields" and index + 1 < len(argv):
+            fields = tuple(argv[index + 1].split(","))
+            index += 1
+        elif argv[index] == "--width" and index + 1 < len(argv):
+            try:
+                width = int(argv[index + 1], 0)
+            except ValueError:
+                width = 0
+            index += 1
+        elif not argv[index].startswith("--"):
+            paths.append(argv[index])
+        index += 1
+    if len(paths) != 2 or width < 1 or any(field not in FIELDS for field in fields):
+        print(f"Usage: python3 run.py --compare A B [--fields {','.join(FIELDS)}] [--width N]")
+        return 1
+    if any(Path(path).is_dir() for path in paths):
+        fields = tuple(field for field in fields if field == "memory")  # Dumps only hold memory
+    try:
+        with open_results(paths[0], width) as left, open_results(paths[1], width) as right:
+            differences = left.compare(right, fields)
+            matched = len(left) - len(differences["missing"])
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Comparing {paths[0]} with {paths[1]}: {matched} rows in both")
+    print("----------------")
+    for key, label in (("missing", f"only in {paths[0]}"), ("extra", f"only in {paths[1]}")):
+        if differences[key]:
+            print(f"❌ {len(differences[key])} rows {label}: {', '.join(map(str, differences[key][:10]))}")
+    for field in fields:
+        ids = differences[field]
+        mark = "❌" if ids else "✅"
+        shown = f": {', '.join(map(str, ids[:10]))}{' ...' if len(ids) > 10 else ''}" if ids else ""
+        print(f"{mark} {field}: {len(ids)} rows differ{shown}")
+    return 1 if any(differences.values()) else 0
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+from pathlib import Path
+
+from TUCA51_emulator import COV_EXEC, COV_NO_SKIP, COV_SKIP, COV_SKIPPED
+
+BRANCH_OPS = ("if", "skipif")
+
+def merge_coverage(maps) -> bytearray:
+    """Or together coverage bitmaps (e.g. one per test or per worker)"""
+    merged = bytearray(max((len(m) for m in maps), default=0))
+    for coverage in maps:
+        for slot, flags in enumerate(coverage):
+            merged[slot] |= flags
+    return merged
+
+def redundant_tests(names: list, maps: list) -> list:
+    """Names of tests that can be dropped together without losing any coverage.
+    Tests are considered in order, so the later of two equivalent tests is kept."""
+    bits = [int.from_bytes(coverage, 'little') for coverage in maps]
+    kept = list(range(len(bits)))
+    redundant = []
+    for i in range(len(bits)):
+        others = 0
+        for j in kept:
+            if j != i:
+                others |= bits[j]
+        if bits[i] & ~others == 0:
+            kept.remove(i)
+            redundant.append(names[i])
+    return redundant
+
+def source_slots(lines) -> list:
+    """(slot or None, line) for every program line, numbering slots like Program.from_lines"""
+    listing = []
+    slot = 0
+    for line in lines:
+        line = line.rstrip('\n')
+        inst_str = line.strip()
+        if not inst_str or inst_str.startswith('#') or inst_str.split()[0] == "def" or inst_str.endswith(':'):
+            listing.append((None, line))
+        else:
+            listing.append((slot, line))
+            slot += 1
+    return listing
+
+def format_listing(lines, coverage: bytearray) -> tuple:
+    """Annotated source listing, returns (listing lines, summary lines).
+
+    Executed instructions are marked '+', instructions that were only ever
+    skipped 's' and instructions that never ran '#'. if/skipif lines show
+    which of their two outcomes were seen.
+    """
+    output = []
+    executed = total = outcomes = branch_outcomes = 0
+    for slot, line in source_slots(lines):
+        if slot is None:
+            output.append(f"         | {line}")
+            continue
+        flags = coverage[slot] if slot < len(coverage) else 0
+        ran = flags & (COV_EXEC | COV_NO_SKIP | COV_SKIP)
+        marker = "+" if ran else ("s" if flags & COV_SKIPPED else "#")
+        total += 1
+        executed += bool(ran)
+        note = ""
+        if line.split()[0] in BRANCH_OPS:
+            skip_seen, no_skip_seen = bool(flags & COV_SKIP), bool(flags & COV_NO_SKIP)
+            branch_outcomes += 2
+            outcomes += skip_seen + no_skip_seen
+            note = f"    [skip {'✓' if skip_seen else '✗'}  no skip {'✓' if no_skip_seen else '✗'}]"
+        output.append(f"  0x{slot*2:03x} {marker}| {line}{note}")
+
+    def percent(part, whole):
+        return f"{part}/{whole} ({100 * part / whole:.1f}%)" if whole else "0/0"
+    summary = [
+        f"Instructions executed: {percent(executed, total)}",
+        f"Branch outcomes seen:  {percent(outcomes, branch_outcomes)}",
+    ]
+    return output, summary
+
+# Per-process cache used by the worker pool
+_worker_cache = None
+
+def _init_worker(max_entries):
+    global _worker_cache
+    from run import FileCache
+    _worker_cache = FileCache(max_entries=max_entries)
+
+def _run_test_in_worker(job):
+    from run import evaluate_test
+    program_file, test_case, config = job
+    coverage = bytearray()
+    result = evaluate_test(program_file, test_case, _worker_cache, coverage, config)
+    return result, bytes(coverage)
+
+def collect_coverage(program_file: Path, config: dict, cache, jobs: int = 1) -> tuple:
+    """
+    Run every test case in config with coverage enabled.
+    Args:
+        program_file: Path to the program
+        config: Parsed config.json
+        cache: FileCache used for the program and memory files
+        jobs: Number of worker processes
+    Returns:
+        tuple: (list of result dicts, list of per-test coverage bitmaps)
+    """
+    from run import evaluate_test
+    tests = config['test_cases']
+    if jobs <= 1:
+        outputs = []
+        for test_case in tests:
+            coverage = bytearray()
+            outputs.append((evaluate_test(program_file, test_case, cache, coverage, config), coverage))
+    else:
+        with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(cache.max_entries,)) as pool:
+            outputs = pool.map(_run_test_in_worker, [(program_file, test_case, config) for test_case in tests])
+    return [result for result, _ in outputs], [coverage for _, coverage in outputs]
+
+def main(program_file: Path, config: dict, argv: list, cache) -> int:
+    """Entry point for run.py <program.txt> --coverage [--jobs N]"""
+    from run import int_option
+    try:
+        jobs = int_option(argv, '--jobs', 1, minimum=1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py <program.txt> --coverage [--jobs N]")
+        return 1
+    results, maps = collect_coverage(program_file, config, cache, jobs)
+
+    for result in results:
+        status = "✅" if result["passed"] else "❌"
+        print(f"{status} {result['name']}: {result['instruction_count']} instructions")
+
+    try:
+        with open(program_file) as f:
+            lines = f.readlines()
+    except OSError as e:
+        print(f"Error reading program: {e}")
+        return 1
+
+    listing, summary = format_listing(lines, merge_coverage(maps))
+    print(f"\nCoverage: {program_file}")
+    print("----------------")
+    print("\n".join(listing))
+    print("----------------")
+    print("\n".join(summary))
+    redundant = redundant_tests([result["name"] for result in results], maps)
+    if redundant:
+        print(f"Tests adding no coverage: {', '.join(redundant)}")
+
+    return 0 if all(result["passed"] for result in results) else 1
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import cmd
+import sys
+from pathlib import Path
+
+from TUCA51_emulator import TUCAEmulator
+
+class Debugger(cmd.Cmd):
+    """Interactive TUCA debugger with breakpoints and watchpoints"""
+    intro = "TUCA debugger. Type 'help' for a list of commands."
+    prompt = "(tuca) "
+
+    def __init__(self, program_file, memory_file=None, emulator=None):
+        super().__init__()
+        self.program_file = program_file
+        self.memory_file = memory_file
+        self.emulator = emulator or TUCAEmulator(verbose=False, minimal=True)
+        self.emulator.enable_recording()
+        self.started = False
+
+    # Helpers
+
+    def ensure_started(self):
+        if not self.started:
+            self.started = self.emulator.start(self.program_file, self.memory_file)
+        return self.started
+
+    def numbers(self, arg, command, most=1):
+        """Non-negative integer arguments of a command (at most `most`), or
+        None after printing the command's usage line"""
+        try:
+            values = [int(part, 0) for part in arg.split()]
+        except ValueError:
+            values = None
+        if values is None or len(values) > most or any(value < 0 for value in values):
+            print("Usage: " + getattr(self, "do_" + command).__doc__.split(":")[0])
+            return None
+        return values
+
+    def slot_or_label(self, arg, command):
+        """A program slot (int) or a label (str), or None after printing the usage line"""
+        if not arg[:1].isdigit():
+            return arg
+        values = self.numbers(arg, command)
+        return values[0] if values else None
+
+    def location(self):
+        emu = self.emulator
+        if emu.prog_idx >= len(emu.instructions):
+            return f"0x{emu.prog_idx*2:03x}: <end of program>"
+        labels = [label for label, addr in emu.labels.items() if addr == emu.prog_idx]
+        prefix = f"{labels[0]}: " if labels else ""
+        skipped = "  (skipped)" if emu.skip_next else ""
+        return f"{prefix}0x{emu.prog_idx*2:03x}: {emu.instructions[emu.prog_idx]}{skipped}"
+
+    def report(self, reverse=False):
+        emu = self.emulator
+        if emu.stop_reason and emu.stop_reason[0] == "break":
+            print(f"Breakpoint at slot {emu.stop_reason[1]}")
+        elif emu.stop_reason and emu.stop_reason[0] == "watch":
+            kind, index = emu.stop_reason[1:]
+            value = emu.reg[index] if kind == "reg" else emu.mem[index]
+            name = f"r{index}" if kind == "reg" else f"mem[0x{index:02x}]"
+            written = ", written by the next instruction" if reverse else ""
+            print(f"Watchpoint: {name} = 0x{value:02x}{written}")
+        elif emu.status in ("halted", "completed", "error"):
+            print(f"Program {emu.status} after {emu.instruction_count} instructions")
+        print(self.location())
+
+    # Commands
+
+    def do_break(self, arg):
+        """break <label|slot>: stop before executing a label or program slot"""
+        if not arg:
+            print("Breakpoints:", ", ".join(str(b) for b in sorted(self.emulator.breakpoints, key=str)) or "none")
+            return
+        location = self.slot_or_label(arg, "break")
+        if location is None or not self.ensure_started():
+            return
+        try:
+            self.emulator.add_breakpoint(location)
+        except ValueError as e:
+            print(e)
+
+    def do_delete(self, arg):
+        """delete <label|slot|watch expression>: remove a breakpoint or watchpoint"""
+        try:
+            self.emulator.remove_watchpoint(arg)
+        except ValueError:
+            location = self.slot_or_label(arg, "delete")
+            if location is not None:
+                self.emulator.remove_breakpoint(location)
+
+    def do_watch(self, arg):
+        """watch <r3|mem[0x02]> [<op> <value>]: stop after a write, optionally once a condition holds"""
+        try:
+            self.emulator.add_watchpoint(arg)
+        except ValueError as e:
+            print(e)
+
+    def do_run(self, arg):
+        """run: restart the program from the beginning and continue"""
+        self.started = False
+        if self.ensure_started():
+            self.do_continue(arg)
+
+    def do_continue(self, arg):
+        """continue [max_steps]: run until a breakpoint, watchpoint or the end of the program"""
+        steps = self.numbers(arg, "continue")
+        if steps is not None and self.ensure_started():
+            self.emulator.resume(steps[0] if steps else None)
+            self.report()
+
+    def do_step(self, arg):
+        """step [n]: execute n instructions (default 1)"""
+        steps = self.numbers(arg, "step")
+        if steps is None or not self.ensure_started():
+            return
+        for _ in range(steps[0] if steps else 1):
+            if not self.emulator.step() or self.emulator.stop_reason:
+                break
+        self.report()
+
+    def do_reverse_step(self, arg):
+        """reverse_step [n]: undo the last n instructions (default 1)"""
+        steps = self.numbers(arg, "reverse_step")
+        if steps is not None and self.ensure_started():
+            if not self.emulator.reverse_step(steps[0] if steps else 1):
+                print("At the start of the recording")
+            self.report()
+
+    def do_reverse_continue(self, arg):
+        """reverse_continue: run backwards to a breakpoint, the last write to a watched location or the start"""
+        if self.ensure_started():
+            self.emulator.reverse_continue()
+            if self.emulator.stop_reason is None:
+                print("At the start of the recording")
+            self.report(reverse=True)
+
+    def do_regs(self, arg):
+        """regs: show the register file"""
+        if self.ensure_started():
+            for idx, val in enumerate(self.emulator.reg):
+                print(f"r{idx:<2}: 0x{val:02x}", end="\n" if idx % 4 == 3 else "  ")
+
+    def do_mem(self, arg):
+        """mem [addr] [count]: show memory (non-zero locations by default)"""
+        parts = self.numbers(arg, "mem", most=2)
+        if parts is None or not self.ensure_started():
+            return
+        emu = self.emulator
+        if parts:
+            start = parts[0]
+            count = parts[1] if len(parts) > 1 else 1
+            addrs = range(start, min(start + count, len(emu.mem)))
+        else:
+            addrs = [i for i, v in enumerate(emu.mem) if v != 0 or i in emu.initialized_mem]
+        for addr in addrs:
+            print(f"0x{addr:02x}: 0x{emu.mem[addr]:02x}")
+
+    def do_where(self, arg):
+        """where: show the next instruction"""
+        if self.ensure_started():
+            print(self.location())
+
+    def do_quit(self, arg):
+        """quit: leave the debugger"""
+        return True
+
+    do_b = do_break
+    do_c = do_continue
+    do_s = do_step
+    do_rs = do_reverse_step
+    do_rc = do_reverse_continue
+    do_q = do_quit
+    do_EOF = do_quit
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 debugger.py <program.txt> [memory.txt]")
+        sys.exit(1)
+    memory_file = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+    Debugger(Path(sys.argv[1]), memory_file).cmdloop()
+
+if __name__ == "__main__":
+    main()
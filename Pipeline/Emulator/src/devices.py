@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import sys
+
+class Device:
+    """A memory-mapped device, attached with TUCAEmulator.attach(device, address).
+
+    The device answers ld/st (and ldr/str) to `size` addresses starting at
+    the one it is attached at; offset is relative to that address and cycle
+    is the number of instructions retired before the access. The RAM under
+    a device is never read or written.
+    """
+    size = 1
+
+    def read(self, offset, cycle):
+        return 0
+
+    def write(self, offset, value, cycle):
+        pass
+
+    def reset(self):
+        """Called when the emulator is reset for a new run"""
+
+class ConsoleOutput(Device):
+    """Writing a byte prints it as a character; reads return 0"""
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.output = bytearray()  # Everything written during the run
+
+    def write(self, offset, value, cycle):
+        self.output.append(value)
+        stream = self.stream or sys.stdout
+        stream.write(chr(value))
+        stream.flush()
+
+    def reset(self):
+        self.output = bytearray()
+
+class CycleTimer(Device):
+    """Instructions retired since the last write, as a 16-bit value.
+    Reading offset 0 returns the low byte and latches the high byte for a
+    read of offset 1; writing any value restarts the count."""
+    size = 2
+
+    def __init__(self):
+        self.start = 0
+        self.high = 0
+
+    def read(self, offset, cycle):
+        elapsed = (cycle - self.start) & 0xFFFF
+        if offset == 0:
+            self.high = elapsed >> 8
+            return elapsed & 0xFF
+        return self.high
+
+    def write(self, offset, value, cycle):
+        self.start = cycle
+
+    def reset(self):
+        self.start = 0
+        self.high = 0
+
+class InputFifo(Device):
+    """Bytes waiting to be read: offset 0 pops the next one (0 once empty),
+    offset 1 is how many are left (at most 255). Writes append to the queue."""
+    size = 2
+
+    def __init__(self, data=b""):
+        self.data = bytes(data)
+        self.reset()
+
+    def read(self, offset, cycle):
+        if offset == 1:
+            return min(len(self.queue) - self.position, 0xFF)
+        if self.position == len(self.queue):
+            return 0
+        self.position += 1
+        return self.queue[self.position - 1]
+
+    def write(self, offset, value, cycle):
+        self.queue.append(value)
+
+    def reset(self):
+        self.queue = bytearray(self.data)
+        self.position = 0
+
+DEVICE_TYPES = {
+    "console": ConsoleOutput,
+    "timer": CycleTimer,
+    "input": InputFifo,
+}
+
+def create_device(spec: dict, base_dir=None):
+    """(address, device) for a config.json device entry such as
+    {"type": "console", "address": "0xf0"} or
+    {"type": "input", "address": "0xf4", "data": "hello"} ("data" may also be
+    a list of byte values, or "file" a path relative to base_dir)"""
+    kind = spec.get("type")
+    if kind not in DEVICE_TYPES:
+        raise ValueError(f"Unknown device type: {kind}")
+    address = int(str(spec["address"]), 0)
+    if kind != "input":
+        return address, DEVICE_TYPES[kind]()
+    if "file" in spec:
+        path = spec["file"] if base_dir is None else base_dir / spec["file"]
+        with open(path, "rb") as f:
+            data = f.read()
+    elif isinstance(spec.get("data"), str):
+        data = spec["data"].encode()
+    else:
+        data = bytes(int(str(v), 0) for v in spec.get("data", []))
+    return address, InputFifo(data)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+from pathlib import Path
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+def percentile(values: list, q: float) -> float:
+    """q-th percentile of values, interpolating between the nearest ranks"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def write_atomic(path: Path, text: str):
+    """Write through a temporary file, so readers such as the Prometheus
+    textfile collector never see a partial file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")  # One per writer
+    with open(temporary, "w") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+class MetricsRecorder:
+    """Per-test performance metrics of a run.py invocation.
+
+    Each test records its status, instruction count, the time spent
+    parsing the program and loading the memory image (near zero when
+    cached), the execution wall time and the engine that ran it. Programs
+    get aggregate counts and percentiles of wall time and throughput.
+    """
+    def __init__(self):
+        self.tests = []
+        self.started = time.time()
+
+    def add(self, program, test, status, passed, instruction_count,
+            parse_seconds, memory_seconds, run_seconds, engine):
+        rate = instruction_count / run_seconds if run_seconds > 0 and instruction_count else 0.0
+        self.tests.append({
+            "program": str(program),
+            "test": test,
+            "status": status,
+            "passed": passed,
+            "instruction_count": instruction_count or 0,
+            "parse_seconds": parse_seconds,
+            "memory_load_seconds": memory_seconds,
+            "wall_seconds": run_seconds,
+            "instructions_per_second": rate,
+            "engine": engine,
+        })
+
+    def programs(self) -> dict:
+        """Aggregates per program"""
+        grouped = {}
+        for test in self.tests:
+            grouped.setdefault(test["program"], []).append(test)
+        summary = {}
+        for program, tests in grouped.items():
+            walls = [t["wall_seconds"] for t in tests]
+            rates = [t["instructions_per_second"] for t in tests]
+            summary[program] = {
+                "tests": len(tests),
+                "passed": sum(1 for t in tests if t["passed"]),
+                "instruction_count": sum(t["instruction_count"] for t in tests),
+                "wall_seconds": sum(walls),
+                "wall_seconds_percentiles": {str(q): percentile(walls, q) for q in PERCENTILES},
+                "instructions_per_second_percentiles": {str(q): percentile(rates, q) for q in PERCENTILES},
+            }
+        return summary
+
+    def to_json(self) -> str:
+        return json.dumps({"timestamp": self.started, "tests": self.tests,
+                           "programs": self.programs()}, indent=2) + "\n"
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, for the node exporter's textfile collector"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                text = ",".join(f'{key}="{escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{text}}} {value}")
+
+        def per_test(key):
+            return [({"program": t["program"], "test": t["test"], "engine": t["engine"]}, t[key])
+                    for t in self.tests]
+
+        metric("tuca_test_instructions", "gauge", "Instructions executed by the test", per_test("instruction_count"))
+        metric("tuca_test_wall_seconds", "gauge", "Execution wall time", per_test("wall_seconds"))
+        metric("tuca_test_instructions_per_second", "gauge", "Execution throughput",
+               per_test("instructions_per_second"))
+        metric("tuca_test_parse_seconds", "gauge", "Program parse and decode time", per_test("parse_seconds"))
+        metric("tuca_test_memory_load_seconds", "gauge", "Memory image load time",
+               per_test("memory_load_seconds"))
+        metric("tuca_test_passed", "gauge", "1 if the test passed",
+               [(labels, int(t["passed"])) for (labels, _), t in zip(per_test("passed"), self.tests)])
+        programs = self.programs()
+        for key, name, help_text in (
+                ("wall_seconds_percentiles", "tuca_program_wall_seconds", "Test wall time percentiles"),
+                ("instructions_per_second_percentiles", "tuca_program_instructions_per_second",
+                 "Test throughput percentiles")):
+            metric(name, "summary", help_text,
+                   [({"program": program, "quantile": q}, value)
+                    for program, summary in programs.items() for q, value in summary[key].items()])
+        metric("tuca_program_tests", "gauge", "Tests run",
+               [({"program": program}, summary["tests"]) for program, summary in programs.items()])
+        metric("tuca_program_tests_passed", "gauge", "Tests passed",
+               [({"program": program}, summary["passed"]) for program, summary in programs.items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_file=None, prometheus_file=None):
+        if json_file:
+            write_atomic(json_file, self.to_json())
+        if prometheus_file:
+            write_atomic(prometheus_file, self.to_prometheus())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import time
+import random
+from pathlib import Path
+
+from TUCA51_emulator import TUCAEmulator, Observer
+
+QUANTUM = 1000       # Instructions a core runs per turn
+ID_REGISTER = 15     # Register holding each core's index at start
+MAX_STEPS = 1000000  # Instructions, over all cores, before giving up
+
+class WriteTracker(Observer):
+    """Reports every st/str of one core to MultiCore.record_write"""
+    def __init__(self, system, index: int):
+        self.system = system
+        self.index = index
+
+    def on_memory_write(self, emu, address, value):
+        self.system.record_write(self.index, address)
+
+class MultiCore:
+    """Several emulator cores running over one shared data memory.
+
+    Each core is a TUCAEmulator with its own registers and PC; all of them
+    use the same memory object, and core i starts with i in register
+    ID_REGISTER. Cores take turns running `quantum` instructions on the
+    decoded run loop. Without a seed the turns are strict round-robin;
+    with a seed every round visits the running cores in a random order
+    with a random quantum between 1 and `quantum`, which is reproducible
+    from the seed. A core leaves the rotation when it halts, runs past
+    the end of its program or fails.
+    """
+    def __init__(self, programs, cores: int, quantum: int = QUANTUM, seed=None,
+                 id_register: int = ID_REGISTER, track_writes: bool = False, options=None):
+        self.programs = programs if isinstance(programs, list) else [programs] * cores
+        if len(self.programs) != cores:
+            raise ValueError(f"{len(self.programs)} programs for {cores} cores")
+        self.quantum = quantum
+        self.seed = seed
+        self.id_register = id_register
+        self.track_writes = track_writes
+        self.cores = [TUCAEmulator(verbose=False, minimal=True, **(options or {})) for _ in range(cores)]
+        if track_writes:
+            for index, core in enumerate(self.cores):
+                core.add_observer(WriteTracker(self, index))
+        self.memory = None
+        self.turns = 0
+        self.status = None  # halted (every core stopped), error, limit, break or watch
+        self.writers = {}   # address -> cores that wrote it, with track_writes
+        self.handoffs = {}  # address -> times it was written after another core wrote it
+        self.last_writer = {}
+
+    def start(self, memory_file=None) -> bool:
+        """Reset every core, load the programs and the shared memory"""
+        first = self.cores[0]
+        if not first.start(self.programs[0], memory_file):
+            return False
+        self.memory = first.mem
+        for index, core in enumerate(self.cores):
+            if index and not core.start(self.programs[index]):
+                return False
+            core.mem = self.memory
+            core.reg[self.id_register] = index
+        self.turns = 0
+        self.status = None
+        self.writers = {}
+        self.handoffs = {}
+        self.last_writer = {}
+        return True
+
+    def running(self) -> list:
+        return [i for i, core in enumerate(self.cores) if core.status is None]
+
+    def rounds(self):
+        """(core, quantum) turns in scheduling order, until no core is running"""
+        rng = random.Random(self.seed) if self.seed is not None else None
+        while True:
+            order = self.running()
+            if not order:
+                return
+            if rng is not None:
+                rng.shuffle(order)
+            for index in order:
+                if self.cores[index].status is None:
+                    yield index, rng.randint(1, self.quantum) if rng is not None else self.quantum
+
+    def run(self, max_steps: int = MAX_STEPS) -> str:
+        """Run until every core stopped, a core failed or hit a breakpoint or
+        watchpoint, or max_steps instructions ran in total. Returns the status."""
+        total = sum(core.instruction_count for core in self.cores)
+        for index, quantum in self.rounds():
+            core = self.cores[index]
+            steps = min(quantum, max_steps - total)
+            if steps <= 0:
+                self.status = "limit"
+                break
+            count = core.run_decoded(steps)
+            core.instruction_count += count
+            total += count
+            self.turns += 1
+            if core.status is None and core.prog_idx >= len(core.instructions):
+                core.status = "completed"
+            if core.status in ("error", "break", "watch"):
+                self.status = core.status
+                break
+        if self.status is None:
+            self.status = "halted"
+        return self.status
+
+    def record_write(self, index: int, address: int):
+        """Note a write by a core, and whether another core wrote the address last"""
+        self.writers.setdefault(address, set()).add(index)
+        if self.last_writer.get(address, index) != index:
+            self.handoffs[address] = self.handoffs.get(address, 0) + 1
+        self.last_writer[address] = index
+
+    def memory_map(self) -> dict:
+        """Final memory as in EmulatorState.memory"""
+        return dict(self.cores[0].memory_items())
+
+def main(program_file: Path, config: dict, argv: list, cache) -> int:
+    """Entry point for run.py <program.txt> --multicore [--cores N] [--quantum Q]
+    [--seed S] [--max-steps N] [--contention]: every test case on N cores"""
+    from run import memory_options, int_option
+    try:
+        cores = int_option(argv, '--cores', 2, minimum=1)
+        quantum = int_option(argv, '--quantum', QUANTUM, minimum=1)
+        seed = int_option(argv, '--seed', None)
+        max_steps = int_option(argv, '--max-steps', MAX_STEPS, minimum=1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py <program.txt> --multicore [--cores N] [--quantum Q] [--seed S] "
+              "[--max-steps N] [--contention]")
+        return 1
+    contention = '--contention' in argv
+
+    schedule = f"random order and quantum 1..{quantum}, seed {seed}" if seed is not None \
+        else f"round-robin, quantum {quantum}"
+    print(f"Multi-core run: {program_file}")
+    print(f"{cores} cores, {schedule}, core index in r{ID_REGISTER}")
+    print("----------------")
+    all_passed = True
+    start = time.perf_counter()
+    for test_case in config['test_cases']:
+        system = MultiCore(cache.program(program_file), cores, quantum, seed,
+                           track_writes=contention, options=memory_options(program_file, config))
+        if not system.start(cache.memory(program_file.parent / test_case['memory'])):
+            print(f"❌ {test_case['name']}: could not load the program or memory")
+            all_passed = False
+            continue
+        status = system.run(max_steps)
+        memory = system.memory_map()
+        mismatches = []
+        for addr_str, value_str in test_case['expected']['memory'].items():
+            addr = int(addr_str.replace('0x', ''), 16)
+            expected = int(value_str.replace('0x', ''), 16)
+            actual = memory.get(addr, 0)
+            if actual != expected:
+                mismatches.append(f"0x{addr:02x}: expected 0x{expected:02x}, got 0x{actual:02x}")
+        passed = status == "halted" and not mismatches
+        all_passed &= passed
+        counts = ", ".join(f"{core.instruction_count}" for core in system.cores)
+        mark = "✅" if passed else "❌"
+        print(f"{mark} {test_case['name']}: {status}, {system.turns} turns, instructions per core: {counts}")
+        for mismatch in mismatches:
+            print(f"    {mismatch}")
+        if contention:
+            shared = sorted(addr for addr, writers in system.writers.items() if len(writers) > 1)
+            for addr in shared:
+                writers = ", ".join(str(i) for i in sorted(system.writers[addr]))
+                print(f"    0x{addr:02x} written by cores {writers}, "
+                      f"{system.handoffs.get(addr, 0)} handoffs")
+            if not shared:
+                print("    No address written by more than one core")
+    print("----------------")
+    print(f"Finished in {time.perf_counter() - start:.2f}s")
+    if all_passed:
+        print("✅ All tests passed")
+    else:
+        print("❌ Some tests failed")
+    return 0 if all_passed else 1
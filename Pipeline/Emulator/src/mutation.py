@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import re
+import time
+import multiprocessing
+from collections import namedtuple
+from pathlib import Path
+
+from TUCA51_emulator import TUCAEmulator
+
+REGISTER = re.compile(r"^r(\d+)$")
+
+# Instruction limit of a mutant on a test: mutants may loop forever
+LIMIT_FACTOR = 10
+LIMIT_SLACK = 1000
+
+# slot: instruction changed, text: replacement (None deletes it), kind: mutation operator
+Mutant = namedtuple("Mutant", ["slot", "kind", "text"])
+
+def hex_byte(value: int) -> str:
+    return f"0x{value & 0xFF:02x}"
+
+def generate_mutants(program) -> list:
+    """Mutants that each differ from the program at one instruction:
+    register operands replaced (or swapped for gt), if/skipif flipped,
+    immediates, addresses and shift amounts changed, and instructions deleted."""
+    used = sorted({int(m.group(1)) for inst in program.expanded
+                   for m in map(REGISTER.match, inst.split()[1:]) if m})
+    mutants = []
+    for slot, inst in enumerate(program.expanded):
+        tokens = inst.split()
+        op, operands = tokens[0], tokens[1:]
+        seen = {inst}
+
+        def add(kind, new_operands, new_op=op):
+            text = " ".join([new_op] + new_operands)
+            if text not in seen:
+                seen.add(text)
+                mutants.append(Mutant(slot, kind, text))
+
+        if op in ("if", "skipif"):
+            add("flip branch", operands, "skipif" if op == "if" else "if")
+        if op == "gt" and len(operands) == 3:
+            add("swap operands", [operands[1], operands[0], operands[2]])
+        for i, operand in enumerate(operands):
+            if REGISTER.match(operand):
+                for reg in used:
+                    add("register", operands[:i] + [f"r{reg}"] + operands[i + 1:])
+            elif op in ("ldi", "ld", "st") and re.match(r"^(0x)?[0-9a-fA-F]+$", operand):
+                value = int(operand, 16)
+                changes = (value + 1, value - 1, 0, 0xFF) if op == "ldi" else (value + 1, value - 1)
+                kind = "immediate" if op == "ldi" else "address"
+                for new in changes:
+                    add(kind, operands[:i] + [hex_byte(new)] + operands[i + 1:])
+            elif op in ("shl", "shr") and operand.isdigit():
+                for new in (int(operand) - 1, int(operand) + 1):
+                    if 1 <= new <= 7:
+                        add("shift amount", operands[:i] + [str(new)] + operands[i + 1:])
+        mutants.append(Mutant(slot, "delete", None))
+    return mutants
+
+class TestSuite:
+    """A program's test cases, loaded once and run against mutants.
+
+    Each test is (name, memory image, expected values, instruction limit);
+    the limit is a multiple of what the original program needs.
+    """
+    def __init__(self, program, tests, options=None):
+        self.program = program
+        self.tests = tests
+        self.options = options or {}  # TUCAEmulator memory arguments
+
+    @classmethod
+    def load(cls, program_file: Path, config: dict, cache):
+        from run import memory_options
+        program = cache.program(program_file)
+        options = memory_options(program_file, config)
+        emulator = TUCAEmulator(verbose=False, minimal=True, **options)
+        tests = []
+        for test_case in config['test_cases']:
+            image = cache.memory(program_file.parent / test_case['memory'])
+            expected = {
+                int(addr.replace('0x', ''), 16): int(value.replace('0x', ''), 16)
+                for addr, value in test_case['expected']['memory'].items()
+            }
+            final_state = emulator.run_program(program, image)
+            if final_state is None or final_state.status == "error" or any(
+                    final_state.memory.get(addr, 0) != value for addr, value in expected.items()):
+                raise ValueError(f"The original program fails {test_case['name']}")
+            limit = final_state.instruction_count * LIMIT_FACTOR + LIMIT_SLACK
+            tests.append((test_case['name'], image, expected, limit, final_state.instruction_count))
+        # Quick tests first, so most mutants are killed cheaply
+        tests.sort(key=lambda test: test[4])
+        return cls(emulator.program, [test[:4] for test in tests], options)
+
+    def mutant_program(self, mutant: Mutant):
+        if mutant.text is None:
+            return self.program.delete(mutant.slot)
+        return self.program.replace(mutant.slot, mutant.text)
+
+    def first_failure(self, mutant: Mutant):
+        """Name of the first test that kills the mutant, None if it survives"""
+        program = self.mutant_program(mutant)
+        emulator = TUCAEmulator(verbose=False, minimal=True, **self.options)
+        for name, image, expected, limit in self.tests:
+            emulator.start(program, image)
+            count = emulator.run_decoded(limit)
+            if emulator.status == "error" or (emulator.status is None and count == limit):
+                return name
+            if any(emulator.mem[addr] != value for addr, value in expected.items()):
+                return name
+        return None
+
+# Suite used by worker processes, inherited when they are forked
+_suite = None
+
+def _init_worker(suite):
+    global _suite
+    _suite = suite
+
+def _run_mutant_in_worker(mutant):
+    return _suite.first_failure(mutant)
+
+def make_pool(jobs: int, suite: TestSuite):
+    """Worker pool that shares the loaded suite: forked workers inherit it,
+    other platforms get a pickled copy"""
+    global _suite
+    _suite = suite
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(jobs)
+    return multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(suite,))
+
+def run_mutants(suite: TestSuite, mutants: list, jobs: int = 1) -> list:
+    """Killing test name (or None if it survived) for every mutant, in order"""
+    if jobs <= 1:
+        return [suite.first_failure(mutant) for mutant in mutants]
+    with make_pool(jobs, suite) as pool:
+        return pool.map(_run_mutant_in_worker, mutants, chunksize=max(1, len(mutants) // (jobs * 8)))
+
+def main(program_file: Path, config: dict, argv: list, cache) -> int:
+    """Entry point for run.py <program.txt> --mutate [--jobs N]"""
+    from run import int_option
+    try:
+        jobs = int_option(argv, '--jobs', 1, minimum=1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py <program.txt> --mutate [--jobs N]")
+        return 1
+    start = time.perf_counter()
+    try:
+        suite = TestSuite.load(program_file, config, cache)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return 1
+    mutants = generate_mutants(suite.program)
+    killers = run_mutants(suite, mutants, jobs)
+    elapsed = time.perf_counter() - start
+
+    print(f"Mutation testing: {program_file}")
+    print(f"{len(suite.tests)} tests, {len(mutants)} mutants")
+    print("----------------")
+    survivors = [mutant for mutant, killer in zip(mutants, killers) if killer is None]
+    for mutant in survivors:
+        original = suite.program.instructions[mutant.slot]
+        change = "deleted" if mutant.text is None else f"-> {mutant.text}"
+        print(f"  survived  0x{mutant.slot*2:03x} {original:<20} {change}  ({mutant.kind})")
+    if survivors:
+        print("----------------")
+    killed = len(mutants) - len(survivors)
+    score = 100 * killed / len(mutants) if mutants else 100.0
+    print(f"Killed: {killed}/{len(mutants)} ({score:.1f}%) in {elapsed:.2f}s")
+    for name, *_ in suite.tests:
+        print(f"  {name}: killed {sum(1 for killer in killers if killer == name)} first")
+    return 0
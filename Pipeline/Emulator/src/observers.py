@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+from collections import Counter
+
+from TUCA51_emulator import Observer
+
+class Tracer(Observer):
+    """Record retired instructions and what they wrote, in order: the
+    ("reg" or "mem", index, value) writes of an instruction come before its
+    ("retire", slot, skipped) event, and a halt adds ("halt", slot, None)"""
+    def __init__(self, limit=None):
+        self.limit = limit  # Keep at most this many events
+        self.events = []
+
+    def add(self, event):
+        if self.limit is None or len(self.events) < self.limit:
+            self.events.append(event)
+
+    def on_retire(self, emu, pc, skipped):
+        self.add(("retire", pc, skipped))
+
+    def on_register_write(self, emu, index, value):
+        self.add(("reg", index, value))
+
+    def on_memory_write(self, emu, address, value):
+        self.add(("mem", address, value))
+
+    def on_halt(self, emu, pc):
+        self.add(("halt", pc, None))
+
+    def lines(self, program):
+        """One line per retired instruction, with the values it wrote"""
+        writes = []
+        for kind, index, value in self.events:
+            if kind == "reg":
+                writes.append(f"r{index}=0x{value:02x}")
+            elif kind == "mem":
+                writes.append(f"mem[0x{index:02x}]=0x{value:02x}")
+            else:
+                suffix = "  (skipped)" if value else "  " + " ".join(writes) if writes else ""
+                yield f"0x{index*2:03x}: {program.expanded[index]}{suffix.rstrip()}"
+                writes = []
+
+class Profiler(Observer):
+    """Count executions per program slot and accesses per memory address"""
+    def __init__(self):
+        self.executed = Counter()
+        self.skipped = Counter()
+        self.reads = Counter()
+        self.writes = Counter()
+
+    def on_retire(self, emu, pc, skipped):
+        if skipped:
+            self.skipped[pc] += 1
+        else:
+            self.executed[pc] += 1
+
+    def on_memory_read(self, emu, address, value):
+        self.reads[address] += 1
+
+    def on_memory_write(self, emu, address, value):
+        self.writes[address] += 1
+
+    def report(self, program, top=10) -> list:
+        """The most executed slots and the most accessed addresses"""
+        total = sum(self.executed.values()) + sum(self.skipped.values())
+        lines = [f"Profile: {total} instructions"]
+        for slot, count in self.executed.most_common(top):
+            share = 100 * count / total if total else 0
+            lines.append(f"  0x{slot*2:03x}: {program.expanded[slot]:<20} {count:>8} ({share:.1f}%)")
+        for address in sorted(set(self.reads) | set(self.writes)):
+            lines.append(f"  mem[0x{address:02x}]: {self.reads[address]} reads, {self.writes[address]} writes")
+        return lines
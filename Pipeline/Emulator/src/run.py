@@ -3,8 +3,83 @@
 import sys
 import os
 import json
+import time
+from collections import OrderedDict
 from pathlib import Path
-from TUCA51_emulator import TUCAEmulator
+from TUCA51_emulator import TUCAEmulator, Program, MemoryImage
+
+class FileCache:
+    """Keep parsed configs, programs and memory images in memory.
+
+    Entries are keyed by resolved path and reloaded when the file's
+    modification time or size changes. The least recently used entries are
+    dropped once more than `max_entries` are cached.
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, loader):
+        """Return loader(path), reusing the cached value if the file is unchanged"""
+        key = (loader, str(Path(path).resolve()))
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = loader(path)
+        self._store(key, version, value)
+        return value
+
+    def value(self, key, factory):
+        """Return a cached value that does not depend on a file, creating it if needed"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = factory()
+        self._store(key, None, value)
+        return value
+
+    def _store(self, key, version, value):
+        self.entries[key] = (version, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def program(self, program_file):
+        """Parsed Program, or the path itself so the emulator reports any error"""
+        try:
+            return self.get(program_file, Program.from_file)
+        except Exception:
+            return program_file
+
+    def memory(self, memory_file):
+        """Parsed MemoryImage, or the path itself so the emulator reports any error"""
+        try:
+            return self.get(memory_file, MemoryImage.from_file)
+        except Exception:
+            return memory_file
+
+    def config(self, config_file):
+        """Parsed config.json, falling back to load_config to report errors"""
+        try:
+            return self.get(config_file, _read_json)
+        except Exception:
+            return load_config(config_file)
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
 
 def load_config(config_file: Path) -> dict:
     """Load test configuration from JSON file"""
@@ -15,6 +90,22 @@ def load_config(config_file: Path) -> dict:
         print(f"Error loading config file: {e}")
         return None
 
+def memory_options(program_file: Path, config: dict) -> dict:
+    """TUCAEmulator memory arguments from the optional config.json keys
+    memory_size (bytes, 256 by default), memory_image (a raw binary file,
+    relative to the program, mapped as the initial memory contents) and
+    devices (memory-mapped devices, see devices.create_device). Devices are
+    created anew on every call."""
+    options = {}
+    if config and 'memory_size' in config:
+        options['memory_size'] = int(str(config['memory_size']), 0)
+    if config and 'memory_image' in config:
+        options['memory_image'] = program_file.parent / config['memory_image']
+    if config and 'devices' in config:
+        from devices import create_device
+        options['devices'] = [create_device(spec, program_file.parent) for spec in config['devices']]
+    return options
+
 def read_memory_file(memory_file: Path) -> dict:
     """Read memory values from a file. Supports two formats:
     1. addr=value format: '0x00=0x99'
@@ -118,145 +209,349 @@ def print_memory_map(memory: dict, expected_memory: dict = None, instruction_cou
             print(f"0x{addr:02x}: 0x{value:02x}")
     print("----------------")
 
-def main():
-    if len(sys.argv) < 2:
+def evaluate_test(program_file: Path, test_case: dict, cache: FileCache = None,
+                  coverage: bytearray = None, config: dict = None) -> dict:
+    """Run one test case without printing, returns its result dict.
+    If coverage is given, the test's coverage flags are or-ed into it."""
+    memory_file = program_file.parent / test_case['memory']
+    emulator = TUCAEmulator(verbose=False, minimal=True, **memory_options(program_file, config))
+    if coverage is not None:
+        emulator.enable_coverage(coverage)
+    final_state = emulator.run_program(
+        program_file=cache.program(program_file) if cache else program_file,
+        memory_file=cache.memory(memory_file) if cache else memory_file
+    )
+    result = {"name": test_case['name'], "passed": False, "instruction_count": None, "mismatches": []}
+    if final_state is not None:
+        result["instruction_count"] = final_state.instruction_count
+        for addr_str, value_str in test_case['expected']['memory'].items():
+            addr = int(addr_str.replace('0x', ''), 16)
+            expected = int(value_str.replace('0x', ''), 16)
+            actual = final_state.memory.get(addr, 0)
+            if actual != expected:
+                result["mismatches"].append({"address": addr, "expected": expected, "actual": actual})
+        result["passed"] = not result["mismatches"]
+    return result
+
+def evaluate_tests(program_file: Path, config: dict, cache: FileCache = None) -> list:
+    """Run every test case in config without printing, returns one result dict per test"""
+    return [evaluate_test(program_file, test_case, cache, config=config) for test_case in config['test_cases']]
+
+def run_measured(emulator: TUCAEmulator, program_file: Path, memory_file: Path, cache: FileCache = None):
+    """emulator.run_program with timings: returns the final state and the
+    seconds spent parsing the program, loading the memory image and running"""
+    start = time.perf_counter()
+    program = cache.program(program_file) if cache else program_file
+    parsed = time.perf_counter()
+    memory = cache.memory(memory_file) if cache else memory_file
+    loaded = time.perf_counter()
+    final_state = emulator.run_program(program_file=program, memory_file=memory)
+    return final_state, (parsed - start, loaded - parsed, time.perf_counter() - loaded)
+
+def run_test(job: tuple, cache: FileCache = None) -> tuple:
+    """Run (program_file, memory_file, options) quietly, returns the final
+    state, the run_measured timings, the status and the engine"""
+    program_file, memory_file, options = job
+    emulator = TUCAEmulator(verbose=False, minimal=True, **options)
+    final_state, timings = run_measured(emulator, program_file, memory_file, cache)
+    return final_state, timings, emulator.status, emulator.engine
+
+def record_metrics(metrics, program_file: Path, test_name: str, status, engine,
+                   final_state, passed: bool, timings: tuple, history=None):
+    """Add a finished test to metrics (a MetricsRecorder) and history (a History)"""
+    count = final_state.instruction_count if final_state else 0
+    if metrics is not None:
+        metrics.add(program_file, test_name, status or "error", passed, count, *timings, engine)
+    if history is not None and final_state is not None:
+        history.record(program_file, test_name, count, timings[2])
+
+def run_all_tests(program_file: Path, config: dict, verbose: bool = False, cache: FileCache = None,
+                  metrics=None, jobs: int = 1, history=None) -> bool:
+    """Run every test case in config, returns True if all of them passed.
+    Each test is added to metrics (a MetricsRecorder) and history (a
+    History) if given. With jobs > 1 the tests run in worker processes,
+    longest expected first, and are reported in config order."""
+    all_passed = True
+    outcomes = None
+    if jobs > 1 and not verbose:
+        from schedule import run_longest_first, estimate
+        cache = cache or FileCache()
+        options = memory_options(program_file, config)
+        tests = config['test_cases']
+        outcomes = run_longest_first(
+            run_test,
+            [(program_file, program_file.parent / test_case['memory'], options) for test_case in tests],
+            [estimate(history, program_file, test_case, cache) for test_case in tests],
+            cache, jobs)
+    for index, test_case in enumerate(config['test_cases']):
+        memory_file = program_file.parent / test_case['memory']
+        output_file = program_file.parent / 'results' / 'emulator' / Path(test_case['memory']).name
+        
+        if verbose:
+            print(f"\nRunning test: {test_case['name']}")
+            print(f"Memory file: {memory_file}")
+            print(f"Output file: {output_file}")
+            print("----------------------------------------")
+        else:
+            print(f"\nTest: {test_case['name']}")
+        
+        try:
+            if outcomes is not None:
+                final_state, timings, status, engine = outcomes[index]
+            else:
+                # Run emulator for this test
+                emulator = TUCAEmulator(verbose=verbose, minimal=not verbose, **memory_options(program_file, config))
+                final_state, timings = run_measured(emulator, program_file, memory_file, cache)
+                status, engine = emulator.status, emulator.engine
+            
+            if final_state is None:
+                record_metrics(metrics, program_file, test_case['name'], status, engine, None, False, timings)
+                all_passed = False
+                continue
+            
+            # Convert expected memory to integers
+            expected_memory = {
+                int(addr.replace('0x', ''), 16): int(value.replace('0x', ''), 16)
+                for addr, value in test_case['expected']['memory'].items()
+            }
+            
+            # Show memory map and save results
+            print_memory_map(final_state.memory, expected_memory, final_state.instruction_count)
+            write_results(final_state.memory, output_file)
+            
+            passed = verify_results(output_file, test_case['expected'])
+            record_metrics(metrics, program_file, test_case['name'], status, engine,
+                           final_state, passed, timings, history)
+            if not passed:
+                all_passed = False
+                
+        except Exception as e:
+            print(f"Error running test {test_case['name']}: {e}")
+            all_passed = False
+            
+    # Final summary
+    if all_passed:
+        print("\n✅ All tests passed")
+    else:
+        print("\n❌ Some tests failed")
+    return all_passed
+
+def run_single_test(program_file: Path, memory_file: Path, output_file: Path, config: dict,
+                    verbose: bool = False, cache: FileCache = None, metrics=None, history=None) -> bool:
+    """Run one memory file, verifying it if it belongs to a test case in config"""
+    # Find matching test case
+    test_case = next(
+        (test for test in config['test_cases'] 
+         if test['memory'].endswith(memory_file.name)),
+        None
+    )
+    
+    if test_case:
+        expected_memory = {
+            int(addr.replace('0x', ''), 16): int(value.replace('0x', ''), 16)
+            for addr, value in test_case['expected']['memory'].items()
+        }
+    else:
+        expected_memory = None
+    
+    # Run emulator
+    emulator = TUCAEmulator(verbose=verbose, minimal=not verbose, **memory_options(program_file, config))
+    try:
+        if verbose:
+            print(f"\nRunning emulator with memory file: {memory_file}")
+            if output_file:
+                print(f"Results will be saved to: {output_file}")
+            print("----------------------------------------")
+            
+        final_state, timings = run_measured(emulator, program_file, memory_file, cache)
+        test_name = test_case['name'] if test_case else memory_file.name
+        
+        if final_state is None:
+            record_metrics(metrics, program_file, test_name, emulator.status, emulator.engine, None, False, timings)
+            return False
+        
+        # Always show the final memory map with expected values if available
+        print_memory_map(final_state.memory, expected_memory, final_state.instruction_count)
+        
+        # Save results if output file specified
+        if output_file:
+            write_results(final_state.memory, output_file)
+            if verbose:
+                print(f"\nResults written to: {output_file}")
+            
+            # If this is a test case, verify against expected output
+            if expected_memory:
+                if verify_results(output_file, test_case['expected']):
+                    print("✅ All results match expected values")
+                else:
+                    print("❌ Some results do not match expected values")
+                    record_metrics(metrics, program_file, test_name, emulator.status, emulator.engine,
+                                   final_state, False, timings, history)
+                    return False
+        record_metrics(metrics, program_file, test_name, emulator.status, emulator.engine,
+                       final_state, True, timings, history)
+        return True
+            
+    except Exception as e:
+        print(f"Error running program: {e}")
+        return False
+
+def pop_option(argv: list, flag: str) -> tuple:
+    """(argv without flag and its value, the value or None)"""
+    if flag not in argv:
+        return argv, None
+    index = argv.index(flag)
+    value = argv[index + 1] if index + 1 < len(argv) else None
+    return argv[:index] + argv[index + 2:], value
+
+def int_option(argv: list, flag: str, default=None, minimum=None):
+    """Integer value (decimal, or 0x hex) following flag in argv, default if
+    flag is absent. Raises ValueError naming the flag if the value is
+    missing, not a number or below minimum."""
+    if flag not in argv:
+        return default
+    index = argv.index(flag)
+    text = argv[index + 1] if index + 1 < len(argv) else ""
+    try:
+        value = int(text, 16) if text.lower().startswith("0x") else int(text)
+    except ValueError:
+        raise ValueError(f"{flag} needs an integer value{f', got {text!r}' if text else ''}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{flag} must be at least {minimum}, got {value}")
+    return value
+
+def run(argv: list, cache: FileCache = None) -> int:
+    """Run the emulator command line (argv without the script name), returns the exit code"""
+    if '--batch' in argv:
+        from batch import main as batch_main
+        return batch_main(argv, cache or FileCache())
+
+    if '--shard' in argv:
+        from shard import main as shard_main
+        return shard_main(argv, cache or FileCache())
+
+    if '--merge' in argv:
+        from shard import merge_main
+        return merge_main(argv)
+
+    if '--compare' in argv:
+        from columnar import compare_main
+        return compare_main(argv)
+
+    if len(argv) < 1:
         print("Usage: python3 run.py <program.txt> [memory.txt] [output_file] [--verbose]")
         print("Examples:")
         print("  python3 run.py Programs/example1/prog.txt                                # Run all tests")
         print("  python3 run.py Programs/example1/prog.txt test_mems/mem1.txt            # Run specific test")
         print("  python3 run.py Programs/example1/prog.txt test_mems/mem1.txt results/emulator/mem1.txt")
         print("  python3 run.py Programs/example1/prog.txt test_mems/mem1.txt results/emulator/mem1.txt --verbose")
-        sys.exit(1)
+        print("  python3 run.py Programs/example1/prog.txt --coverage [--jobs N]         # Test coverage listing")
+        print("  python3 run.py Programs/example1/prog.txt --sweep [--jobs N] [--samples N] [--seed S]  # Input sweep")
+        print("  python3 run.py Programs/example1/prog.txt --mutate [--jobs N]           # Mutation testing")
+        print("  python3 run.py Programs/example1/prog.txt --multicore [--cores N] [--quantum Q] [--seed S] [--contention]")
+        print("  python3 run.py Programs/example1/prog.txt --cache                       # Cache hit rates and stalls")
+        print("  python3 run.py Programs/example1/prog.txt --metrics m.json [--metrics-prom m.prom]  # Performance metrics")
+        print("  python3 run.py Programs/example1/prog.txt --jobs 4 [--history FILE | --no-history]  # Longest tests first")
+        print("  python3 run.py --batch jobs.jsonl [--jobs N] [--no-memory]             # Stream JSON jobs ('-' for stdin)")
+        print("  python3 run.py --shard 1/4 [--costs metrics.json] [--output part1.json]  # One CI node's share of Programs/")
+        print("  python3 run.py --merge part1.json part2.json ... [--output report.json]     # Combine shard results")
+        print("  python3 run.py --compare a.tcr b.tcr [--fields memory]                    # Compare result sets or dump dirs")
+        return 1
     
     # Get root directory (where the Programs directory is)
     root_dir = Path(__file__).parent.parent.parent.parent
     
     # Convert program path to be relative to root directory
-    program_file = Path(sys.argv[1])
+    program_file = Path(argv[0])
     
     # Check for verbose flag
-    verbose = '--verbose' in sys.argv
+    verbose = '--verbose' in argv
+
+    # Metrics files, removed from argv so they do not count as positional arguments
+    metrics_files = {}
+    for flag in ('--metrics', '--metrics-prom'):
+        if flag in argv:
+            argv, metrics_files[flag] = pop_option(argv, flag)
+            if metrics_files[flag] is None:
+                print(f"Error: {flag} needs a file name")
+                return 1
     
     # Load test configuration
     config_file = root_dir / program_file.parent / 'config.json'
     if not config_file.exists():
         print(f"Error: No config.json found in {program_file.parent}")
-        sys.exit(1)
+        return 1
         
-    config = load_config(config_file)
+    config = cache.config(config_file) if cache else load_config(config_file)
     if not config:
-        sys.exit(1)
+        return 1
+
+    if '--coverage' in argv:
+        from coverage_report import main as coverage_main
+        return coverage_main(program_file, config, argv, cache or FileCache())
+
+    if '--sweep' in argv:
+        from sweep import main as sweep_main
+        return sweep_main(program_file, config, argv, cache or FileCache())
+
+    if '--mutate' in argv:
+        from mutation import main as mutation_main
+        return mutation_main(program_file, config, argv, cache or FileCache())
+
+    if '--multicore' in argv:
+        from multicore import main as multicore_main
+        return multicore_main(program_file, config, argv, cache or FileCache())
+
+    if '--cache' in argv:
+        from caches import main as caches_main
+        return caches_main(program_file, config, argv, cache or FileCache())
     
+    # Worker processes and the history file. The history orders --jobs runs,
+    # so only they (or runs given --history FILE) use it; traced runs are
+    # dominated by terminal output and never record durations.
+    try:
+        jobs = int_option(argv, '--jobs', 1, minimum=1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py <program.txt> [--jobs N] [--history FILE | --no-history]")
+        return 1
+    argv, _ = pop_option(argv, '--jobs')
+    argv, history_file = pop_option(argv, '--history')
+    no_history = '--no-history' in argv
+    argv = [arg for arg in argv if arg != '--no-history']
+    history = None
+    if not (no_history or verbose) and (history_file or jobs > 1):
+        from schedule import History, HISTORY_FILE
+        history = History(history_file or HISTORY_FILE)
+
+    metrics = None
+    if metrics_files:
+        from metrics import MetricsRecorder
+        metrics = MetricsRecorder()
+        cache = cache or FileCache()  # Parsing then happens, and is timed, outside the run
+
     # If no specific test is provided, run all tests from config
-    if len(sys.argv) == 2 or (len(sys.argv) == 3 and sys.argv[2] == '--verbose'):
-        all_passed = True
-        for test_case in config['test_cases']:
-            memory_file = program_file.parent / test_case['memory']
-            output_file = program_file.parent / 'results' / 'emulator' / Path(test_case['memory']).name
-            
-            if verbose:
-                print(f"\nRunning test: {test_case['name']}")
-                print(f"Memory file: {memory_file}")
-                print(f"Output file: {output_file}")
-                print("----------------------------------------")
-            else:
-                print(f"\nTest: {test_case['name']}")
-            
-            # Run emulator for this test
-            emulator = TUCAEmulator(verbose=verbose, minimal=not verbose)
-            try:
-                final_state = emulator.run_program(
-                    program_file=program_file,
-                    memory_file=memory_file
-                )
-                
-                if final_state is None:
-                    all_passed = False
-                    continue
-                
-                # Convert expected memory to integers
-                expected_memory = {
-                    int(addr.replace('0x', ''), 16): int(value.replace('0x', ''), 16)
-                    for addr, value in test_case['expected']['memory'].items()
-                }
-                
-                # Show memory map and save results
-                print_memory_map(final_state.memory, expected_memory, final_state.instruction_count)
-                write_results(final_state.memory, output_file)
-                
-                if not verify_results(output_file, test_case['expected']):
-                    all_passed = False
-                    
-            except Exception as e:
-                print(f"Error running test {test_case['name']}: {e}")
-                all_passed = False
-                
-        # Final summary
-        if all_passed:
-            print("\n✅ All tests passed")
-        else:
-            print("\n❌ Some tests failed")
-            sys.exit(1)
-            
+    if len(argv) == 1 or (len(argv) == 2 and argv[1] == '--verbose'):
+        passed = run_all_tests(program_file, config, verbose, cache, metrics, jobs, history)
     else:
         # Run specific test
-        memory_file = Path(sys.argv[2])
+        memory_file = Path(argv[1])
         output_file = None
-        if len(sys.argv) > 3 and not sys.argv[3].startswith('--'):
-            output_file = Path(sys.argv[3])
-        
-        # Find matching test case
-        test_case = next(
-            (test for test in config['test_cases'] 
-             if test['memory'].endswith(memory_file.name)),
-            None
-        )
-        
-        if test_case:
-            expected_memory = {
-                int(addr.replace('0x', ''), 16): int(value.replace('0x', ''), 16)
-                for addr, value in test_case['expected']['memory'].items()
-            }
-        else:
-            expected_memory = None
-        
-        # Run emulator
-        emulator = TUCAEmulator(verbose=verbose, minimal=not verbose)
+        if len(argv) > 2 and not argv[2].startswith('--'):
+            output_file = Path(argv[2])
+        passed = run_single_test(program_file, memory_file, output_file, config, verbose, cache, metrics, history)
+
+    if metrics is not None:
+        metrics.write(metrics_files.get('--metrics'), metrics_files.get('--metrics-prom'))
+    if history is not None:
         try:
-            if verbose:
-                print(f"\nRunning emulator with memory file: {memory_file}")
-                if output_file:
-                    print(f"Results will be saved to: {output_file}")
-                print("----------------------------------------")
-                
-            final_state = emulator.run_program(
-                program_file=program_file,
-                memory_file=memory_file
-            )
-            
-            if final_state is None:
-                sys.exit(1)
-            
-            # Always show the final memory map with expected values if available
-            print_memory_map(final_state.memory, expected_memory, final_state.instruction_count)
-            
-            # Save results if output file specified
-            if output_file:
-                write_results(final_state.memory, output_file)
-                if verbose:
-                    print(f"\nResults written to: {output_file}")
-                
-                # If this is a test case, verify against expected output
-                if expected_memory:
-                    if verify_results(output_file, test_case['expected']):
-                        print("✅ All results match expected values")
-                    else:
-                        print("❌ Some results do not match expected values")
-                        sys.exit(1)
-                
-        except Exception as e:
-            print(f"Error running program: {e}")
-            sys.exit(1)
+            history.save()
+        except OSError as e:
+            print(f"Warning: could not save the test history: {e}")
+    return 0 if passed else 1
+
+def main():
+    sys.exit(run(sys.argv[1:]))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
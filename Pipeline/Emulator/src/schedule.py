@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import multiprocessing
+from pathlib import Path
+
+from metrics import write_atomic
+from shard import program_key
+
+# Root of the repository
+ROOT_DIR = Path(__file__).parent.parent.parent.parent
+
+# Per-test history, kept by run.py --jobs N and --shard runs unless --no-history is given
+HISTORY_FILE = ROOT_DIR / ".tuca-history.json"
+SMOOTHING = 0.5               # Weight of the newest duration in the running average
+SECONDS_PER_INSTRUCTION = 1e-6  # Until the history says otherwise
+UNBOUNDED_COST = 1 << 16      # Instructions assumed for code without a static bound
+
+class History:
+    """Instruction counts and durations of earlier test runs.
+
+    Entries are keyed by program directory (relative to Programs/) and
+    test name, so a history file can be shared between checkouts. The
+    duration is a running average, the instruction count the latest one.
+    save() only writes the entries this run recorded over the file as it
+    is then, so runs sharing the file keep each other's updates.
+    """
+    def __init__(self, path=HISTORY_FILE):
+        self.path = Path(path)
+        self.tests = self.read()
+        self.recorded = set()
+
+    def read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                tests = json.load(f).get("tests", {})
+            return tests if isinstance(tests, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    @staticmethod
+    def key(program, test: str) -> str:
+        return f"{program_key(program)}:{test}"
+
+    def record(self, program, test: str, instruction_count, seconds: float):
+        entry = self.tests.get(self.key(program, test))
+        if entry is not None:
+            seconds = entry["seconds"] * (1 - SMOOTHING) + seconds * SMOOTHING
+        self.tests[self.key(program, test)] = {
+            "instructions": instruction_count or 0,
+            "seconds": seconds,
+            "runs": entry["runs"] + 1 if entry else 1,
+        }
+        self.recorded.add(self.key(program, test))
+
+    def expected(self, program, test: str):
+        """Expected seconds, or None without history"""
+        entry = self.tests.get(self.key(program, test))
+        return entry["seconds"] if entry else None
+
+    def seconds_per_instruction(self) -> float:
+        instructions = sum(e["instructions"] for e in self.tests.values())
+        seconds = sum(e["seconds"] for e in self.tests.values())
+        return seconds / instructions if instructions and seconds else SECONDS_PER_INSTRUCTION
+
+    def costs(self) -> dict:
+        """(program key, test name) -> seconds, as shard.load_costs returns"""
+        costs = {}
+        for key, entry in self.tests.items():
+            program, _, test = key.rpartition(":")
+            costs[(program, test)] = entry["seconds"]
+        return costs
+
+    def save(self):
+        """Write the entries recorded since loading, merged into the current file"""
+        if not self.recorded:
+            return
+        tests = self.read()
+        tests.update({key: self.tests[key] for key in self.recorded})
+        write_atomic(self.path, json.dumps({"tests": tests}, indent=2, sort_keys=True) + "\n")
+
+def _bound_analysis(program_file):
+    """Static worst-case bound analysis of a program, None if unavailable"""
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.append(str(ROOT_DIR))
+    try:
+        from Pipeline.Assembler.src.analysis import BoundAnalysis
+        from Pipeline.Assembler.src.parser import Parser
+        with open(program_file) as f:
+            return BoundAnalysis(Parser().parse_program(f.read()))
+    except Exception:
+        return None
+
+def static_instructions(program_file: Path, memory_file: Path, cache=None) -> float:
+    """Instructions a test is expected to run, without running it: the
+    worst-case bound for its inputs, or the program length when the
+    program cannot be analyzed"""
+    try:
+        analysis = cache.get(program_file, _bound_analysis) if cache else _bound_analysis(program_file)
+    except OSError:
+        analysis = None
+    if analysis is None:
+        program = cache.program(program_file) if cache else None
+        return len(getattr(program, "expanded", ())) or 1
+    inputs = {}
+    memory = cache.memory(memory_file) if cache else None
+    for index, _, value, error in getattr(memory, "entries", ()):
+        if error is None:
+            inputs[index] = value
+    bound = analysis.bound(inputs)
+    return UNBOUNDED_COST if bound == float("inf") else bound
+
+def estimate(history: History, program_file: Path, test_case: dict, cache=None) -> float:
+    """Expected seconds of a test: its history, or its static estimate at
+    the speed seen so far"""
+    seconds = history.expected(program_file, test_case['name']) if history else None
+    if seconds is not None:
+        return seconds
+    rate = history.seconds_per_instruction() if history else SECONDS_PER_INSTRUCTION
+    return static_instructions(program_file, program_file.parent / test_case['memory'], cache) * rate
+
+def longest_first(estimates: list) -> list:
+    """Indices by decreasing estimate, ties in their original order"""
+    return sorted(range(len(estimates)), key=lambda i: (-estimates[i], i))
+
+# Per-process cache used by the worker pool
+_worker_cache = None
+
+def _init_worker(max_entries):
+    global _worker_cache
+    from run import FileCache
+    _worker_cache = FileCache(max_entries=max_entries)
+
+def _call_in_worker(job):
+    index, function, item = job
+    return index, function(item, _worker_cache)
+
+def run_longest_first(function, items: list, estimates: list, cache, jobs: int = 1) -> list:
+    """function(item, cache) for every item, results in item order.
+
+    With jobs > 1 the items go to a pool of worker processes one at a time,
+    longest expected first, so a long test cannot start last and hold up
+    the suite while the other workers sit idle. function must be defined
+    at module level so the workers can find it.
+    """
+    if jobs <= 1:
+        return [function(item, cache) for item in items]
+    results = [None] * len(items)
+    order = longest_first(estimates)
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(cache.max_entries,)) as pool:
+        for index, result in pool.imap_unordered(
+                _call_in_worker, [(i, function, items[i]) for i in order], chunksize=1):
+            results[index] = result
+    return results
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import json
+import argparse
+import socketserver
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from client import DEFAULT_SOCKET
+from run import FileCache, run, evaluate_tests
+
+class EmulatorServer:
+    """Long-lived emulator that answers run/verify requests from a warm cache.
+
+    Requests and responses are JSON objects, one per line:
+      {"cmd": "run", "args": [...run.py arguments...], "cwd": "..."}
+          -> {"exit_code": 0, "output": "...same text run.py prints..."}
+      {"cmd": "verify", "program": "Programs/x/prog.txt", "cwd": "..."}
+          -> {"passed": true, "tests": [{"name", "passed", "instruction_count", "mismatches"}]}
+      {"cmd": "stats"} -> request and cache counters
+      {"cmd": "shutdown"} -> stops the server
+    """
+    def __init__(self, max_entries=1024):
+        self.cache = FileCache(max_entries=max_entries)
+        self.requests = 0
+        self.running = True
+
+    def handle(self, request: dict) -> dict:
+        """Handle one request, never raises"""
+        self.requests += 1
+        cmd = request.get("cmd", "run")
+        cwd = os.getcwd()
+        try:
+            if request.get("cwd"):
+                os.chdir(request["cwd"])
+
+            if cmd == "run":
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    exit_code = run(list(request.get("args", [])), self.cache)
+                return {"exit_code": exit_code, "output": output.getvalue()}
+
+            elif cmd == "verify":
+                program_file = Path(request["program"])
+                config = self.cache.config(program_file.parent / 'config.json')
+                if not config:
+                    return {"error": f"No usable config.json in {program_file.parent}"}
+                with redirect_stdout(io.StringIO()):
+                    tests = evaluate_tests(program_file, config, self.cache)
+                return {"passed": all(t["passed"] for t in tests), "tests": tests}
+
+            elif cmd == "stats":
+                return {
+                    "requests": self.requests,
+                    "cache_entries": len(self.cache.entries),
+                    "cache_hits": self.cache.hits,
+                    "cache_misses": self.cache.misses,
+                }
+
+            elif cmd == "shutdown":
+                self.running = False
+                return {"ok": True}
+
+            return {"error": f"Unknown command: {cmd}"}
+
+        except Exception as e:
+            return {"error": str(e), "exit_code": 1}
+        finally:
+            os.chdir(cwd)
+
+    def serve_stdio(self, stdin=sys.stdin, stdout=sys.stdout):
+        """Answer requests read from stdin until EOF or shutdown"""
+        for line in stdin:
+            if not line.strip():
+                continue
+            try:
+                response = self.handle(json.loads(line))
+            except ValueError as e:
+                response = {"error": f"Invalid request: {e}"}
+            stdout.write(json.dumps(response) + "\n")
+            stdout.flush()
+            if not self.running:
+                break
+
+    def serve_socket(self, socket_path):
+        """Answer requests on a Unix socket until shutdown"""
+        emulator_server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        response = emulator_server.handle(json.loads(line))
+                    except ValueError as e:
+                        response = {"error": f"Invalid request: {e}"}
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+                    self.wfile.flush()
+                    if not emulator_server.running:
+                        break
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        with socketserver.UnixStreamServer(socket_path, Handler) as server:
+            print(f"TUCA emulator server listening on {socket_path}")
+            sys.stdout.flush()
+            try:
+                while self.running:
+                    server.handle_request()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.unlink(socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent TUCA emulator server')
+    parser.add_argument('--socket', type=str, default=os.environ.get("TUCA_SOCKET", DEFAULT_SOCKET),
+                        help='Unix socket path to listen on')
+    parser.add_argument('--stdio', action='store_true',
+                        help='Read requests from stdin and write responses to stdout instead')
+    parser.add_argument('--max-entries', type=int, default=1024,
+                        help='Maximum number of cached configs, programs and memory images')
+
+    args = parser.parse_args()
+
+    server = EmulatorServer(max_entries=args.max_entries)
+    if args.stdio:
+        server.serve_stdio()
+    else:
+        server.serve_socket(args.socket)
+
+if __name__ == "__main__":
+    main()
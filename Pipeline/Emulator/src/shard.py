@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+import json
+import time
+from pathlib import Path, PurePath
+
+# Programs directory of the repository
+PROGRAMS_DIR = Path(__file__).parent.parent.parent.parent / "Programs"
+
+def parse_shard(text: str) -> tuple:
+    """(index, count) from "i/N", with 1 <= i <= N"""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {text!r}, expected i/N such as 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {text!r}, i must be between 1 and N")
+    return index, count
+
+def program_key(path) -> str:
+    """Program directory relative to Programs/ (such as examples/addTwoNums),
+    from a program directory or prog.txt path, so keys match across checkouts"""
+    parts = PurePath(path).parts
+    if "Programs" in parts:
+        parts = parts[len(parts) - parts[::-1].index("Programs"):]
+    if parts and parts[-1].endswith(".txt"):
+        parts = parts[:-1]
+    return PurePath(*parts).as_posix() if parts else ""
+
+def discover(programs_dir: Path = PROGRAMS_DIR) -> list:
+    """Every (program key, program file, test case) under programs_dir, sorted"""
+    items = []
+    for config_file in sorted(Path(programs_dir).rglob("config.json")):
+        try:
+            with open(config_file) as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            continue
+        program_file = config_file.parent / config.get("program", "prog.txt")
+        key = program_key(config_file.parent.relative_to(programs_dir))
+        for test_case in config.get("test_cases", []):
+            items.append((key, program_file, test_case))
+    return items
+
+def load_costs(files) -> dict:
+    """(program key, test name) -> seconds, from metrics files written by
+    run.py --metrics and from shard result files; later files win"""
+    costs = {}
+    for file in files:
+        with open(file) as f:
+            data = json.load(f)
+        for entry in data.get("tests", []) + data.get("results", []):
+            seconds = entry.get("wall_seconds", entry.get("seconds"))
+            if seconds is not None:
+                costs[(program_key(entry["program"]), entry.get("test", entry.get("name")))] = seconds
+    return costs
+
+def assign(items: list, count: int, costs: dict = None) -> list:
+    """Split items into count shards of similar total cost.
+
+    Items are taken most expensive first (ties by program and test name)
+    and each goes to the currently cheapest shard, lowest index first.
+    Items without a known cost weigh the mean known cost, or 1 when nothing
+    is known. The split depends only on the items and costs, so every node
+    given the same cost files computes the same one.
+    """
+    costs = costs or {}
+    known = [costs[key] for key in ((k, t["name"]) for k, _, t in items) if key in costs]
+    default = sum(known) / len(known) if known else 1.0
+
+    def cost(item):
+        return costs.get((item[0], item[2]["name"]), default)
+
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for item in sorted(items, key=lambda item: (-cost(item), item[0], item[2]["name"])):
+        target = min(range(count), key=lambda i: (loads[i], i))
+        shards[target].append(item)
+        loads[target] += cost(item)
+    # Keep the discovery order inside a shard
+    order = {(key, test["name"]): i for i, (key, _, test) in enumerate(items)}
+    return [sorted(shard, key=lambda item: order[(item[0], item[2]["name"])]) for shard in shards]
+
+def shard_items(shard: str, programs_dir: Path = PROGRAMS_DIR, cost_files=()) -> tuple:
+    """(items of shard "i/N", number of items over all shards)"""
+    index, count = parse_shard(shard)
+    items = discover(programs_dir)
+    return assign(items, count, load_costs(cost_files))[index - 1], len(items)
+
+def write_partial(output_file: Path, kind: str, shard: str, total: int, results: list):
+    """Write a shard result file for merge()"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump({"kind": kind, "shard": shard, "total": total, "results": results}, f, indent=2)
+        f.write("\n")
+
+def default_output(kind: str, shard: str) -> Path:
+    index, count = parse_shard(shard)
+    return Path(f"{kind}-shard-{index}-of-{count}.json")
+
+def merge(files) -> dict:
+    """Combine shard result files into one report. Lists shards that are
+    missing or given twice and tests that ran in more than one shard."""
+    partials = []
+    for file in files:
+        with open(file) as f:
+            partials.append(json.load(f))
+    if not partials:
+        raise ValueError("No shard result files")
+    kinds = {p.get("kind") for p in partials}
+    counts = {parse_shard(p["shard"])[1] for p in partials}
+    if len(kinds) > 1 or len(counts) > 1:
+        raise ValueError("Shard result files come from different runs")
+    count = counts.pop()
+    seen = [parse_shard(p["shard"])[0] for p in partials]
+    results, keys, duplicates = [], set(), []
+    for partial in sorted(partials, key=lambda p: parse_shard(p["shard"])[0]):
+        for result in partial["results"]:
+            key = (result["program"], result["name"])
+            if key in keys:
+                duplicates.append(f"{key[0]}:{key[1]}")
+                continue
+            keys.add(key)
+            results.append(result)
+    results.sort(key=lambda r: (r["program"], r["name"]))
+    return {
+        "kind": kinds.pop(),
+        "shards": count,
+        "missing_shards": [i for i in range(1, count + 1) if i not in seen],
+        "repeated_shards": sorted({i for i in seen if seen.count(i) > 1}),
+        "duplicate_tests": duplicates,
+        "total": max(p.get("total", 0) for p in partials),
+        "passed": sum(1 for r in results if r["passed"]),
+        "failed": [f"{r['program']}:{r['name']}" for r in results if not r["passed"]],
+        "results": results,
+    }
+
+def print_merged(report: dict) -> bool:
+    """Print a merged report, returns True if it is complete and everything passed"""
+    print(f"Merged {report['kind']} results: {report['shards']} shards, "
+          f"{len(report['results'])}/{report['total']} tests")
+    complete = not report["missing_shards"] and len(report["results"]) == report["total"]
+    if report["missing_shards"]:
+        print(f"❌ Missing shards: {', '.join(str(i) for i in report['missing_shards'])}")
+    if report["repeated_shards"]:
+        print(f"Shards given more than once: {', '.join(str(i) for i in report['repeated_shards'])}")
+    for name in report["failed"]:
+        print(f"❌ {name}")
+    print("----------------")
+    if complete and not report["failed"]:
+        print(f"✅ All {report['passed']} tests passed")
+        return True
+    print(f"❌ {report['passed']} passed, {len(report['failed'])} failed")
+    return False
+
+def option(argv: list, flag: str, default=None):
+    return argv[argv.index(flag) + 1] if flag in argv and argv.index(flag) + 1 < len(argv) else default
+
+def cost_files(argv: list) -> list:
+    """Every file given with --costs"""
+    return [argv[i + 1] for i, arg in enumerate(argv[:-1]) if arg == "--costs"]
+
+def evaluate_item(item: tuple, cache) -> dict:
+    """Result dict of one (program key, program file, test case), with its duration"""
+    from run import evaluate_test
+    key, program_file, test_case = item
+    config = cache.config(program_file.parent / "config.json") if cache else None
+    start = time.perf_counter()
+    result = evaluate_test(program_file, test_case, cache, config=config)
+    result["seconds"] = time.perf_counter() - start
+    result["program"] = key
+    return result
+
+def main(argv: list, cache) -> int:
+    """Entry point for run.py --shard i/N [--costs FILE]... [--output FILE]
+    [--programs DIR] [--jobs N] [--history FILE | --no-history]: run this
+    node's share of every test under Programs/"""
+    from run import int_option
+    from schedule import History, HISTORY_FILE, run_longest_first, estimate
+    try:
+        jobs = int_option(argv, "--jobs", 1, minimum=1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py --shard i/N [--costs FILE]... [--output FILE] [--programs DIR] [--jobs N]")
+        return 1
+    shard = option(argv, "--shard")
+    programs_dir = Path(option(argv, "--programs", PROGRAMS_DIR))
+    try:
+        items, total = shard_items(shard or "", programs_dir, cost_files(argv))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    output_file = Path(option(argv, "--output", default_output("run", shard)))
+    history = None if "--no-history" in argv else History(option(argv, "--history", HISTORY_FILE))
+
+    print(f"Shard {shard}: {len(items)} of {total} tests")
+    print("----------------")
+    estimates = [estimate(history, program_file, test_case, cache) for _, program_file, test_case in items] \
+        if jobs > 1 else []
+    results = run_longest_first(evaluate_item, items, estimates, cache, jobs)
+    for (_, program_file, _), result in zip(items, results):
+        mark = "✅" if result["passed"] else "❌"
+        print(f"{mark} {result['program']}:{result['name']} ({result['instruction_count']} instructions)")
+        if history is not None and result["instruction_count"] is not None:
+            history.record(program_file, result["name"], result["instruction_count"], result["seconds"])
+    write_partial(output_file, "run", shard, total, results)
+    if history is not None:
+        try:
+            history.save()
+        except OSError as e:
+            print(f"Warning: could not save the test history: {e}")
+    print("----------------")
+    print(f"Results written to {output_file}")
+    return 0 if all(r["passed"] for r in results) else 1
+
+def merge_main(argv: list) -> int:
+    """Entry point for run.py --merge FILE... [--output FILE]"""
+    output = option(argv, "--output")
+    files = [arg for i, arg in enumerate(argv)
+             if not arg.startswith("--") and (i == 0 or argv[i - 1] != "--output")]
+    try:
+        report = merge(files)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    return 0 if print_merged(report) else 1
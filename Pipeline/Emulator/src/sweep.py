@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import importlib.util
+import multiprocessing
+from pathlib import Path
+
+from TUCA51_emulator import TUCAEmulator, PagedMemory
+from columnar import ColumnarResults, PASSED, FAILED
+
+EXHAUSTIVE_LIMIT = 1 << 16  # Largest input space swept exhaustively by default
+SAMPLES = 10000             # Random cases when the space is larger
+MAX_STEPS = 100000          # Instructions before a case counts as not halting
+MAX_FAILURES = 10           # Failing cases printed
+CHUNK = 1024                # Cases handed to a worker at a time
+
+def parse_address(value) -> int:
+    return int(value, 16) if isinstance(value, str) else value
+
+class Sweep:
+    """Run a program over many input memories, checking one output byte.
+
+    Configured by the "sweep" section of config.json:
+      inputs           Input addresses, e.g. ["0x00", "0x01"]
+      ranges           Optional inclusive [low, high] values of some inputs,
+                       e.g. {"0x01": ["0x01", "0xfe"]}; others take all 256
+      output           Address of the result, e.g. "0x02"
+      expected         Python expression for the result, with the initial
+                       memory as `mem`, e.g. "(mem[0x00] * mem[0x01]) % 256", or
+      oracle           "file.py:function", called with the initial memory
+      memory           Optional memory file for the other addresses
+      exhaustive_limit Sweep every combination up to this many (default 65536)
+      samples, seed    Seeded random sample size for larger spaces
+      max_steps        Instruction limit per case
+      description      Optional note printed with the results
+
+    Expected values are compared modulo 256. The emulator gets the memory
+    size, image and devices of the rest of config.json.
+    """
+    def __init__(self, program_file: Path, spec: dict, cache, config: dict = None):
+        from run import memory_options
+        self.inputs = [parse_address(a) for a in spec['inputs']]
+        self.output = parse_address(spec['output'])
+        self.max_steps = spec.get('max_steps', MAX_STEPS)
+        ranges = {parse_address(addr): bounds for addr, bounds in spec.get('ranges', {}).items()}
+        self.ranges = []  # (lowest value, number of values) of every input
+        for addr in self.inputs:
+            low, high = (parse_address(bound) for bound in ranges.pop(addr, (0, 255)))
+            if not 0 <= low <= high <= 255:
+                raise ValueError(f"invalid range for input 0x{addr:02x}")
+            self.ranges.append((low, high - low + 1))
+        if ranges:
+            raise ValueError(f"range given for an address that is not an input: 0x{min(ranges):02x}")
+        self.space = 1
+        for low, size in self.ranges:
+            self.space *= size
+        self.exhaustive = self.space <= spec.get('exhaustive_limit', EXHAUSTIVE_LIMIT)
+        self.samples = min(spec.get('samples', SAMPLES), self.space)
+        self.seed = spec.get('seed', 0)
+        self.oracle = self.load_oracle(program_file.parent, spec)
+
+        self.description = spec.get('description')
+
+        self.emulator = TUCAEmulator(verbose=False, minimal=True, **memory_options(program_file, config))
+        memory_file = program_file.parent / spec['memory'] if 'memory' in spec else None
+        if not self.emulator.start(cache.program(program_file),
+                                   cache.memory(memory_file) if memory_file else None):
+            raise ValueError(f"Could not load {program_file}")
+        self.base = self.emulator.mem.copy()
+        self.run_loop, self.ops, self.checks = self.emulator.decoded_loop()
+
+    @staticmethod
+    def load_oracle(directory: Path, spec: dict):
+        if 'oracle' in spec:
+            path, _, name = spec['oracle'].partition(':')
+            module_spec = importlib.util.spec_from_file_location("sweep_oracle", directory / path)
+            module = importlib.util.module_from_spec(module_spec)
+            module_spec.loader.exec_module(module)
+            return getattr(module, name or 'expected')
+        code = compile(spec['expected'], "<sweep expected>", "eval")
+        return lambda mem: eval(code, {}, {'mem': mem})
+
+    def cases(self) -> list:
+        """Case numbers to run, every one or a seeded sample, in increasing order"""
+        if self.exhaustive:
+            return range(self.space)
+        return sorted(random.Random(self.seed).sample(range(self.space), self.samples))
+
+    def values(self, case: int) -> tuple:
+        """Input bytes of a case, the first input varying slowest"""
+        values = []
+        for low, size in reversed(self.ranges):
+            case, value = divmod(case, size)
+            values.append(low + value)
+        return tuple(reversed(values))
+
+    def run(self, cases, results=None, first: int = 0) -> tuple:
+        """Run cases, returns (failures, instruction count).
+        Each failure is (inputs, expected, actual or None, status).
+        With results (a ColumnarResults), the final state of the i-th case
+        is stored in row first + i."""
+        emu = self.emulator
+        ops, reg, mem = self.ops, emu.reg, emu.mem
+        paged = isinstance(mem, PagedMemory)
+        zeros = [0] * len(reg)
+        failures = []
+        total = 0
+        for row, case in enumerate(cases, first):
+            values = self.values(case)
+            reg[:] = zeros
+            if paged:
+                mem.restore(self.base)
+            else:
+                mem[:] = self.base
+            for start, end, device in emu.devices:
+                device.reset()
+            for addr, value in zip(self.inputs, values):
+                mem[addr] = value
+            expected = self.oracle(mem) % 256
+            emu.status = None
+            pc, _, count = self.run_loop(emu, ops, reg, mem, 0, False, self.max_steps, *self.checks)
+            total += count
+            status = emu.status or ("completed" if pc >= len(ops) else "limit")
+            failed = True
+            if status in ("error", "limit"):
+                failures.append((values, expected, None, status))
+            elif mem[self.output] != expected:
+                failures.append((values, expected, mem[self.output], status))
+            else:
+                failed = False
+            if results is not None:
+                results.store_state(row, reg, mem, count, status, FAILED if failed else PASSED)
+        return failures, total
+
+# Per-process sweep used by the worker pool, and the shared results it fills
+_worker_sweep = None
+_worker_results = None
+
+def _init_worker(program_file, spec, config, max_entries, results_name=None, count=0, width=0):
+    global _worker_sweep, _worker_results
+    from run import FileCache
+    _worker_sweep = Sweep(program_file, spec, FileCache(max_entries=max_entries), config)
+    if results_name is not None:
+        _worker_results = ColumnarResults.attach(results_name, count, width)
+
+def _run_chunk_in_worker(chunk):
+    first, cases = chunk
+    return _worker_sweep.run(cases, _worker_results, first)
+
+def run_sweep(program_file: Path, spec: dict, cache, jobs: int = 1, results_file=None,
+              config: dict = None) -> tuple:
+    """
+    Sweep a program's input space.
+    Args:
+        program_file: Path to the program
+        spec: The config's "sweep" section
+        cache: FileCache used for the program and memory files
+        jobs: Number of worker processes
+        results_file: Save every case's final state there as ColumnarResults,
+                      with the case numbers as ids
+        config: The whole config.json, for its memory size, image and devices
+    Returns:
+        tuple: (Sweep, number of cases, failures in input order, instruction count)
+    """
+    sweep = Sweep(program_file, spec, cache, config)
+    cases = sweep.cases()
+    results = None
+    if results_file is not None:
+        width = len(sweep.base)
+        results = ColumnarResults.shared(len(cases), width, ids=list(cases)) if jobs > 1 \
+            else ColumnarResults(len(cases), width, ids=list(cases))
+    try:
+        if jobs <= 1:
+            failures, total = sweep.run(cases, results)
+        else:
+            chunks = [(i, cases[i:i + CHUNK]) for i in range(0, len(cases), CHUNK)]
+            failures, total = [], 0
+            initargs = (program_file, spec, config, cache.max_entries)
+            if results is not None:
+                initargs += (results.shm.name, results.count, results.width)
+            with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=initargs) as pool:
+                for chunk_failures, count in pool.imap(_run_chunk_in_worker, chunks):
+                    failures += chunk_failures
+                    total += count
+        if results is not None:
+            results.save(results_file)
+    finally:
+        if results is not None:
+            results.close()
+    return sweep, len(cases), failures, total
+
+def main(program_file: Path, config: dict, argv: list, cache) -> int:
+    """Entry point for run.py <program.txt> --sweep [--jobs N] [--samples N] [--seed S]
+    [--results FILE]"""
+    if 'sweep' not in config:
+        print(f"Error: No \"sweep\" section in the config.json of {program_file.parent}")
+        return 1
+    from run import int_option
+    spec = dict(config['sweep'])
+    try:
+        for flag, key, minimum in (('--samples', 'samples', 1), ('--seed', 'seed', None),
+                                   ('--max-steps', 'max_steps', 1)):
+            if flag in argv:
+                spec[key] = int_option(argv, flag, minimum=minimum)
+        jobs = int_option(argv, '--jobs', 1, minimum=1)
+        if '--results' in argv and argv.index('--results') + 1 >= len(argv):
+            raise ValueError("--results needs a file name")
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python3 run.py <program.txt> --sweep [--jobs N] [--samples N] [--seed S] "
+              "[--max-steps N] [--results FILE]")
+        return 1
+    if '--samples' in argv:
+        spec['exhaustive_limit'] = 0
+    results_file = argv[argv.index('--results') + 1] if '--results' in argv else None
+
+    start = time.perf_counter()
+    try:
+        sweep, count, failures, total = run_sweep(program_file, spec, cache, jobs, results_file, config)
+    except Exception as e:
+        print(f"Error running sweep: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    inputs = ", ".join(f"0x{addr:02x}" + (f" (0x{low:02x}-0x{low + size - 1:02x})" if size < 256 else "")
+                       for addr, (low, size) in zip(sweep.inputs, sweep.ranges))
+    mode = "exhaustive" if sweep.exhaustive else f"random sample, seed {sweep.seed}"
+    print(f"Sweep: {program_file}")
+    print(f"Inputs {inputs} -> output 0x{sweep.output:02x}, {count} cases ({mode})")
+    if sweep.description:
+        print(sweep.description)
+    print("----------------")
+    for values, expected, actual, status in failures[:MAX_FAILURES]:
+        case = " ".join(f"mem[0x{addr:02x}]=0x{value:02x}" for addr, value in zip(sweep.inputs, values))
+        if actual is None:
+            outcome = "did not halt" if status == "limit" else "error"
+            if status == "limit":
+                outcome += f" within {sweep.max_steps} instructions"
+            print(f"❌ {case}: {outcome}, expected 0x{expected:02x}")
+        else:
+            print(f"❌ {case}: expected 0x{expected:02x}, got 0x{actual:02x}")
+    if len(failures) > MAX_FAILURES:
+        print(f"... and {len(failures) - MAX_FAILURES} more")
+    print("----------------")
+    print(f"{count - len(failures)}/{count} cases passed, "
+          f"{total} instructions in {elapsed:.2f}s")
+    if results_file is not None:
+        print(f"Final states written to {results_file}")
+    if not failures:
+        print("✅ All cases passed")
+    else:
+        print("❌ Some cases failed")
+    return 0 if not failures else 1
@@ -45,12 +45,15 @@ def clean(target: Union[str, Path, List[str]] = None) -> bool:
     
     return success
 
-def compile_program(prog_path: Path, output_dir: Path) -> bool:
+def compile_program(prog_path: Path, output_dir: Path, optimize: bool = False,
+                    schedule: bool = False) -> bool:
     """
     Compile a TUCA assembly program to a .mem file.
     Args:
         prog_path: Path to the assembly program
         output_dir: Output directory for the .mem file
+        optimize: Run the optimizer passes (-O) before encoding
+        schedule: Reorder instructions to reduce pipeline stalls (--schedule)
     Returns:
         bool: True if compilation succeeded
     """
@@ -70,8 +73,12 @@ def compile_program(prog_path: Path, output_dir: Path) -> bool:
     
     # Compile the program
     try:
-        assembler = Assembler()
+        assembler = Assembler(optimize=optimize, schedule=schedule)
         instructions = assembler.assemble_program(program)
+        if optimize:
+            print(assembler.optimizer.report())
+        if schedule:
+            print(assembler.scheduler.report())
         
         # Write the memory file
         with open(out_file, 'w') as f:
@@ -83,11 +90,13 @@ def compile_program(prog_path: Path, output_dir: Path) -> bool:
         print(f"Error compiling {prog_path}: {e}")
         return False
 
-def build_program(program_dir: str) -> bool:
+def build_program(program_dir: str, optimize: bool = False, schedule: bool = False) -> bool:
     """
     Build a TUCA program.
     Args:
         program_dir: Name of the program directory
+        optimize: Run the optimizer passes (-O) before encoding
+        schedule: Reorder instructions to reduce pipeline stalls (--schedule)
     Returns:
         bool: True if compilation succeeded
     """
@@ -108,13 +117,13 @@ def build_program(program_dir: str) -> bool:
     prog_path = prog_dir / config["program"]
     output_dir = prog_dir / "build"  # Build directory inside program directory
     
-    return compile_program(prog_path, output_dir)
+    return compile_program(prog_path, output_dir, optimize, schedule)
 
 def main():
     if len(sys.argv) < 2:
         print("Usage: python3 build.py <command> [target]")
         print("Commands:")
-        print("  build <program>    Build a TUCA program")
+        print("  build <program> [-O] [--schedule]  Build a TUCA program (-O: optimize)")
         print("    Example: python3 build.py build example1")
         print("  clean [target]     Clean build artifacts")
         print("    Example: python3 build.py clean         # Clean all")
@@ -122,6 +131,9 @@ def main():
         print("            python3 build.py clean p1 p2    # Clean multiple programs")
         sys.exit(1)
     
+    optimize = '-O' in sys.argv
+    schedule = '--schedule' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg not in ('-O', '--schedule')]
     command = sys.argv[1]
     
     if command == "clean":
@@ -137,7 +149,7 @@ def main():
             print("Error: build command requires a program name")
             sys.exit(1)
         program_dir = sys.argv[2]
-        success = build_program(program_dir)
+        success = build_program(program_dir, optimize, schedule)
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
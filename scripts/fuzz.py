@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+import io
+import sys
+import time
+import random
+import argparse
+import multiprocessing
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add the root directory to Python path so we can import the emulator and assembler
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from Pipeline.Emulator.src.TUCA51_emulator import TUCAEmulator, Program
+from Pipeline.Assembler.src.parser import Parser
+from Pipeline.Assembler.src.instruction import Instruction
+from Pipeline.Assembler.src.simulator import simulate
+
+# Ways every case is run:
+#   text       TUCAEmulator, one text instruction at a time
+#   decoded    TUCAEmulator fast path on decoded instructions
+#   assembled  assembler parser, run on the reference ISA model, which shares
+#              no code with the emulator
+#   binary     assembled, encoded to 16-bit words and decoded back, same model
+ENGINES = ("text", "decoded", "assembled", "binary")
+
+MAX_STEPS = 64       # Instructions per case; programs may loop
+DATA_SIZE = 0x20     # Addresses that get random initial values and memory traffic
+REGISTERS = 8        # Registers used by generated programs
+CASES_PER_TASK = 200
+
+ALU3 = ["add", "and", "or", "eq", "gt"]
+ALU2 = ["not", "neg"]
+SHIFTS = ["shl", "shr"]
+
+# Outcome of one engine: (status, instruction count, registers, memory), or ("error", message)
+Outcome = Tuple
+
+
+class ProgramFuzzer:
+    """Random straight-line and branching programs with random memory.
+
+    With the portable syntax, programs only use forms the emulator and
+    assembler are both meant to accept: 0x-prefixed immediates and
+    addresses, jmp to labels and the opcodes both implement. The full
+    syntax adds decimal operands, numeric jmp targets, out-of-range values
+    and the emulator-only ldr/str/loadpc/jmpr.
+    """
+
+    def __init__(self, seed: int, size: int = 12, syntax: str = "portable"):
+        self.rng = random.Random(seed)
+        self.size = size
+        self.full = syntax == "full"
+
+    def reg(self) -> str:
+        return f"r{self.rng.randrange(REGISTERS)}"
+
+    def byte(self, limit: int = 256) -> str:
+        value = self.rng.randrange(limit)
+        if self.full and self.rng.random() < 0.2:
+            return str(value) if self.rng.random() < 0.7 else f"0x{value + 0x100:x}"
+        return f"0x{value:02x}"
+
+    def instruction(self, count: int) -> str:
+        rng = self.rng
+        choice = rng.random()
+        if choice < 0.15:
+            return f"ldi {self.byte()} {self.reg()}"
+        if choice < 0.25:
+            return f"ld {self.byte(DATA_SIZE)} {self.reg()}"
+        if choice < 0.35:
+            return f"st {self.reg()} {self.byte(DATA_SIZE)}"
+        if choice < 0.55:
+            return f"{rng.choice(ALU3)} {self.reg()} {self.reg()} {self.reg()}"
+        if choice < 0.62:
+            return f"{rng.choice(ALU2)} {self.reg()} {self.reg()}"
+        if choice < 0.70:
+            return f"{rng.choice(SHIFTS)} {self.reg()} {rng.randint(1, 7)} {self.reg()}"
+        if choice < 0.82:
+            return f"{rng.choice(['if', 'skipif'])} {self.reg()}"
+        if choice < 0.92:
+            target = rng.randrange(count)
+            return f"jmp {target}" if self.full and rng.random() < 0.3 else f"jmp L{target}"
+        if self.full and choice < 0.97:
+            return rng.choice([f"ldr {self.reg()} {self.reg()}", f"str {self.reg()} {self.reg()}",
+                               f"loadpc {self.reg()} {self.reg()}", f"jmpr {self.reg()} {self.reg()}"])
+        return "halt"
+
+    def program(self) -> List[str]:
+        """Program lines, with a label line before every jmp target"""
+        count = self.rng.randint(1, self.size)
+        body = [self.instruction(count) for _ in range(count)]
+        targets = {int(line.split()[1][1:]) for line in body if line.startswith("jmp L")}
+        lines = []
+        for i, line in enumerate(body):
+            if i in targets:
+                lines.append(f"L{i}:")
+            lines.append(line)
+        return lines
+
+    def memory(self) -> List[int]:
+        return list(self.rng.randbytes(DATA_SIZE))
+
+
+# One emulator and parser per worker process, reset for every case
+EMULATOR = TUCAEmulator(verbose=False, minimal=True)
+PARSER = Parser()
+
+
+def run_emulator(program: Program, memory: List[int], decoded: bool) -> Outcome:
+    emulator = EMULATOR
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            if not emulator.start(program):
+                return ("error", log.getvalue().strip())
+            emulator.mem[:len(memory)] = memory
+            count = emulator.run_decoded(MAX_STEPS) if decoded else emulator.run_traced(MAX_STEPS)
+    except Exception as e:
+        return ("error", f"{type(e).__name__}: {e}")
+    if emulator.status == "error":
+        return ("error", log.getvalue().strip())
+    status = emulator.status or ("completed" if emulator.prog_idx >= len(emulator.instructions) else "limit")
+    return (status, count, tuple(emulator.reg), tuple(emulator.mem))
+
+
+def run_model(instructions: List[Instruction], memory: List[int]) -> Outcome:
+    try:
+        result = simulate(instructions, memory, MAX_STEPS)
+    except Exception as e:
+        return ("error", f"{type(e).__name__}: {e}")
+    return (result.status, result.instruction_count, tuple(result.registers), tuple(result.memory))
+
+
+def run_case(lines: List[str], memory: List[int]) -> Dict[str, Outcome]:
+    """Outcome of every engine for one program and memory image"""
+    outcomes = {}
+    try:
+        program = Program.from_lines(lines)
+        outcomes["text"] = run_emulator(program, memory, decoded=False)
+        outcomes["decoded"] = run_emulator(program, memory, decoded=True)
+    except Exception as e:
+        outcomes["text"] = outcomes["decoded"] = ("error", f"{type(e).__name__}: {e}")
+    try:
+        instructions = PARSER.parse_program("\n".join(lines))
+        outcomes["assembled"] = run_model(instructions, memory)
+        outcomes["binary"] = run_model([Instruction.decode(instr.encode()) for instr in instructions], memory)
+    except Exception as e:
+        outcomes["assembled"] = outcomes["binary"] = ("error", f"{type(e).__name__}: {e}")
+    return outcomes
+
+
+def differing_fields(a: Outcome, b: Outcome) -> List[str]:
+    if a[0] == "error" or b[0] == "error":
+        return ["error"]
+    names = ("status", "instruction count", "registers", "memory")
+    return [name for name, x, y in zip(names, a, b) if x != y]
+
+
+def signature(outcomes: Dict[str, Outcome]) -> Optional[str]:
+    """Which engines agree with each other and what differs, None if all agree.
+    Errors compare equal to each other regardless of the message."""
+    def key(outcome):
+        return ("error",) if outcome[0] == "error" else outcome
+    groups: Dict[Tuple, List[str]] = {}
+    for engine in ENGINES:
+        groups.setdefault(key(outcomes[engine]), []).append(engine)
+    if len(groups) == 1:
+        return None
+    parts = list(groups.values())
+    fields = differing_fields(outcomes[parts[0][0]], outcomes[parts[1][0]])
+    return " vs ".join("+".join(group) for group in parts) + f" ({', '.join(fields)})"
+
+
+def minimize(lines: List[str], memory: List[int], target: str) -> Tuple[List[str], List[int]]:
+    """Shrink a diverging case while it keeps diverging the same way.
+    Removes chunks of lines (halving the chunk size), then clears memory bytes."""
+    def diverges(candidate_lines, candidate_memory):
+        return signature(run_case(candidate_lines, candidate_memory)) == target
+
+    changed = True
+    while changed:
+        changed = False
+        chunk = max(1, len(lines) // 2)
+        while chunk >= 1:
+            i = 0
+            while i < len(lines):
+                candidate = lines[:i] + lines[i + chunk:]
+                if candidate and diverges(candidate, memory):
+                    lines = candidate
+                    changed = True
+                else:
+                    i += chunk
+            chunk //= 2
+        used = {line.split()[1] for line in lines if line.startswith("jmp ")}
+        lines = [line for line in lines if not line.endswith(":") or line[:-1] in used]
+        while memory and memory[-1] == 0:
+            memory = memory[:-1]
+        for addr in range(len(memory)):
+            if memory[addr] != 0:
+                candidate = memory[:addr] + [0] + memory[addr + 1:]
+                if diverges(lines, candidate):
+                    memory = candidate
+                    changed = True
+    while memory and memory[-1] == 0:
+        memory = memory[:-1]
+    return lines, memory
+
+
+def fuzz_task(task: Tuple[int, int, int, str]) -> Tuple[int, List[Tuple]]:
+    """Run `count` cases from seed `start`, returns (cases run, divergences).
+    Each divergence is minimized and reported once per signature."""
+    start, count, size, syntax = task
+    found = {}
+    for seed in range(start, start + count):
+        fuzzer = ProgramFuzzer(seed, size, syntax)
+        lines, memory = fuzzer.program(), fuzzer.memory()
+        sig = signature(run_case(lines, memory))
+        if sig is None or sig in found:
+            continue
+        small_lines, small_memory = minimize(lines, memory, sig)
+        found[sig] = (sig, seed, small_lines, small_memory, run_case(small_lines, small_memory))
+    return count, list(found.values())
+
+
+def describe(outcome: Outcome) -> List[str]:
+    if outcome[0] == "error":
+        return [f"  error: {outcome[1]}"]
+    status, count, registers, memory = outcome
+    used = [f"0x{addr:02x}=0x{value:02x}" for addr, value in enumerate(memory) if value]
+    return [
+        f"  status: {status}, {count} instructions",
+        f"  registers: {' '.join(f'{value:02x}' for value in registers)}",
+        f"  memory: {' '.join(used) or '(all zero)'}",
+    ]
+
+
+def save_reproducer(out_dir: Path, number: int, divergence: Tuple) -> Path:
+    """Write prog.txt, mem.txt and divergence.txt for one minimized divergence"""
+    sig, seed, lines, memory, outcomes = divergence
+    case_dir = out_dir / f"divergence{number:03d}"
+    case_dir.mkdir(parents=True, exist_ok=True)
+    with open(case_dir / "prog.txt", "w") as f:
+        f.write(f"# Fuzzer divergence: {sig}\n# Seed: {seed}\n")
+        f.write("\n".join(lines) + "\n")
+    with open(case_dir / "mem.txt", "w") as f:
+        f.write("".join(f"0x{value:02x}\n" for value in memory))
+    with open(case_dir / "divergence.txt", "w") as f:
+        f.write(f"{sig}\nseed {seed}, max {MAX_STEPS} instructions\n")
+        for engine in ENGINES:
+            f.write(f"{engine}:\n" + "\n".join(describe(outcomes[engine])) + "\n")
+    return case_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Differential fuzzing of the emulator against the assembler and its binary encoding"
+    )
+    parser.add_argument("--cases", type=int, default=10000, help="Number of random cases (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="First random seed (default: 0)")
+    parser.add_argument("--size", type=int, default=12, help="Maximum program length (default: 12)")
+    parser.add_argument("--syntax", choices=["portable", "full"], default="portable",
+                        help="portable: forms both tools should accept; full: also decimal operands, "
+                             "numeric jmp targets and emulator-only opcodes")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count(),
+                        help="Worker processes (default: one per core)")
+    parser.add_argument("--out", type=str, default="fuzz_failures",
+                        help="Directory for minimized reproducers (default: fuzz_failures)")
+    args = parser.parse_args()
+
+    tasks = [(start, min(CASES_PER_TASK, args.seed + args.cases - start), args.size, args.syntax)
+             for start in range(args.seed, args.seed + args.cases, CASES_PER_TASK)]
+    print(f"Fuzzing {args.cases} cases ({args.syntax} syntax, {args.jobs} workers, "
+          f"engines: {', '.join(ENGINES)})")
+
+    start = time.perf_counter()
+    seen = set()
+    done = 0
+    if args.jobs <= 1:
+        results = map(fuzz_task, tasks)
+    else:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap_unordered(fuzz_task, tasks)
+    try:
+        for count, divergences in results:
+            done += count
+            for divergence in divergences:
+                if divergence[0] in seen:
+                    continue
+                seen.add(divergence[0])
+                case_dir = save_reproducer(Path(args.out), len(seen), divergence)
+                print(f"❌ {divergence[0]}: {len(divergence[2])} lines, saved to {case_dir}")
+    finally:
+        if args.jobs > 1:
+            pool.terminate()
+    elapsed = time.perf_counter() - start
+
+    print(f"{done} cases in {elapsed:.1f}s ({done / elapsed:.0f} cases/s)")
+    if seen:
+        print(f"❌ {len(seen)} distinct divergences")
+        sys.exit(1)
+    print("✅ No divergences")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+import json
+import sys
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add the root directory to Python path so we can import the emulator module
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from Pipeline.Emulator.src.TUCA51_emulator import TUCAEmulator
+
+PROGRAMS_DIR = Path("Programs")
+
+# The PC is a 12-bit byte address and every instruction takes 2 bytes
+MAX_INSTRUCTIONS = 0x1000 // 2
+
+# Register allocation used by generated programs
+DATA_REGS = list(range(10))  # r0-r9: random data
+CNT = 10                     # loop counter
+LIMIT = 11                   # loop bound
+FLAG = 12                    # branch condition / call offset
+RET_HI = 13                  # return address (upper 4 bits)
+RET_LO = 14                  # return address (lower 8 bits)
+ONE = 15                     # constant 1
+
+# Data memory layout used by generated programs
+OUTPUT_BASE = 0x10           # st targets, checked by the test cases
+OUTPUT_SIZE = 0x10
+SCRATCH_BASE = 0x20          # ldr/str traffic
+SCRATCH_MASK = 0x1f
+
+ALU_OPS = ["add", "and", "or", "eq", "gt", "not", "neg", "shl", "shr"]
+
+
+class WorkloadGenerator:
+    """Emit random but valid, terminating TUCA assembly programs.
+
+    Programs are built from structured blocks (straight-line ALU code,
+    memory traffic, if/skipif branches, counted loops and loadpc/jmpr
+    subroutine calls), so every generated program halts and its dynamic
+    length stays within a small multiple of its static size.
+    """
+
+    def __init__(self, seed: int = 0, size: int = 64, inputs: int = 2):
+        if not (16 <= size <= MAX_INSTRUCTIONS):
+            raise ValueError(f"Program size must be between 16 and {MAX_INSTRUCTIONS} instructions")
+        if not (1 <= inputs <= OUTPUT_BASE):
+            raise ValueError(f"Number of inputs must be between 1 and {OUTPUT_BASE}")
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.size = size
+        self.inputs = inputs
+        self.label_count = 0
+        self.outputs = set()
+
+    def new_label(self, prefix: str) -> str:
+        self.label_count += 1
+        return f"{prefix}_{self.label_count}"
+
+    def reg(self) -> str:
+        return f"r{self.rng.choice(DATA_REGS)}"
+
+    def alu(self) -> str:
+        """A single random ALU instruction over the data registers"""
+        op = self.rng.choice(ALU_OPS)
+        if op in ("not", "neg"):
+            return f"{op} {self.reg()} {self.reg()}"
+        if op in ("shl", "shr"):
+            return f"{op} {self.reg()} {self.rng.randint(1, 7)} {self.reg()}"
+        return f"{op} {self.reg()} {self.reg()} {self.reg()}"
+
+    def alu_block(self, budget: int) -> List[str]:
+        return [self.alu() for _ in range(self.rng.randint(1, max(1, min(budget, 6))))]
+
+    def memory_block(self) -> List[str]:
+        """Loads from the inputs, a store to the outputs and scratch ldr/str traffic"""
+        addr = self.rng.randrange(OUTPUT_BASE + OUTPUT_SIZE)
+        out = OUTPUT_BASE + self.rng.randrange(OUTPUT_SIZE)
+        self.outputs.add(out)
+        value, index, tmp = self.reg(), self.reg(), self.reg()
+        lines = [
+            f"ld 0x{addr:02x} {value}",
+            f"ldi 0x{self.rng.randrange(256):02x} {tmp}",
+            f"add {value} {tmp} {value}",
+            f"st {value} 0x{out:02x}",
+        ]
+        if self.rng.random() < 0.5:
+            # Form a scratch address from a data register and use it indirectly
+            lines += [
+                f"ldi 0x{SCRATCH_MASK:02x} {tmp}",
+                f"and {index} {tmp} {tmp}",
+                f"ldi 0x{SCRATCH_BASE:02x} {index}",
+                f"or {tmp} {index} {index}",
+                f"str {value} {index}" if self.rng.random() < 0.5 else f"ldr {index} {value}",
+            ]
+        return lines
+
+    def branch_block(self, budget: int) -> List[str]:
+        """Either a single predicated instruction or an if/else built with jmp"""
+        cond = self.rng.choice(["eq", "gt"])
+        lines = [f"{cond} {self.reg()} {self.reg()} r{FLAG}"]
+        if budget < 12 or self.rng.random() < 0.5:
+            lines += [f"{self.rng.choice(['if', 'skipif'])} r{FLAG}", self.alu()]
+            return lines
+        taken = self.new_label("then")
+        end = self.new_label("endif")
+        lines += [f"if r{FLAG}", f"jmp {taken}"]
+        lines += self.alu_block(3)
+        lines += [f"jmp {end}", f"{taken}:"]
+        lines += self.alu_block(3)
+        lines += [f"{end}:"]
+        return lines
+
+    def call_block(self, target: str) -> List[str]:
+        """Save a return address with loadpc and jump to a subroutine"""
+        # loadpc, ldi, add, gt, if, add and jmp: the call returns 7 slots later
+        return [
+            f"loadpc r{RET_HI} r{RET_LO}",
+            f"ldi 0x{7 * 2:02x} r{FLAG}",
+            f"add r{RET_LO} r{FLAG} r{RET_LO}",
+            f"gt r{FLAG} r{RET_LO} r{FLAG}",
+            f"if r{FLAG}",
+            f"add r{RET_HI} r{ONE} r{RET_HI}",
+            f"jmp {target}",
+        ]
+
+    def loop_block(self, budget: int, subroutines: List[str]) -> List[str]:
+        """A counted loop running 1-16 times, bounded by an input byte"""
+        label = self.new_label("loop")
+        lines = [
+            f"ldi 0x00 r{CNT}",
+            f"ld 0x{self.rng.randrange(self.inputs):02x} r{LIMIT}",
+            f"ldi 0x0f r{FLAG}",
+            f"and r{LIMIT} r{FLAG} r{LIMIT}",
+            f"{label}:",
+        ]
+        lines += self.body(budget - 8, subroutines, allow_loops=False)
+        lines += [
+            f"add r{CNT} r{ONE} r{CNT}",
+            f"gt r{CNT} r{LIMIT} r{FLAG}",
+            f"skipif r{FLAG}",
+            f"jmp {label}",
+        ]
+        return lines
+
+    def body(self, budget: int, subroutines: List[str], allow_loops: bool = True) -> List[str]:
+        """Emit blocks until roughly `budget` instructions have been produced"""
+        lines = []
+        count = 0
+        while count < budget:
+            remaining = budget - count
+            kind = self.rng.choices(
+                ["alu", "memory", "branch", "loop", "call"],
+                weights=[4, 3, 3, 2 if allow_loops else 0, 1 if subroutines else 0],
+            )[0]
+            if kind == "loop" and remaining >= 16:
+                block = self.loop_block(min(remaining, 32), subroutines)
+            elif kind == "call" and remaining >= 7:
+                block = self.call_block(self.rng.choice(subroutines))
+            elif kind == "memory" and remaining >= 9:
+                block = self.memory_block()
+            elif kind == "branch" and remaining >= 4:
+                block = self.branch_block(remaining)
+            else:
+                block = self.alu_block(remaining)
+            size = count_instructions(block)
+            if count + size > budget:
+                break
+            lines += block
+            count += size
+        return lines
+
+    def generate(self) -> str:
+        """Generate a complete program of exactly `size` instructions"""
+        n_subs = min(8, self.size // 64)
+        sub_size = 8
+        subroutines = [f"sub_{i}" for i in range(n_subs)]
+
+        header = [
+            "# Synthetic TUCA workload",
+            f"# Generated by scripts/generate.py (seed {self.seed}, size {self.size})",
+            "#",
+            f"# Inputs are read from 0x00-0x{self.inputs - 1:02x}, results are stored",
+            f"# in 0x{OUTPUT_BASE:02x}-0x{OUTPUT_BASE + OUTPUT_SIZE - 1:02x}",
+            "",
+            f"ldi 0x01 r{ONE}",
+        ]
+        for i in range(self.inputs):
+            header.append(f"ld 0x{i:02x} r{DATA_REGS[i % len(DATA_REGS)]}")
+
+        subs = []
+        for name in subroutines:
+            out = OUTPUT_BASE + self.rng.randrange(OUTPUT_SIZE)
+            self.outputs.add(out)
+            subs += ["", f"{name}:"]
+            subs += [self.alu() for _ in range(sub_size - 2)]
+            subs += [f"st {self.reg()} 0x{out:02x}", f"jmpr r{RET_HI} r{RET_LO}"]
+
+        # Always finish with a store so every program has an observable result
+        self.outputs.add(OUTPUT_BASE)
+        footer = [f"st r0 0x{OUTPUT_BASE:02x}", "halt"]
+
+        fixed = count_instructions(header + footer + subs)
+        if fixed > self.size:
+            raise ValueError(f"Program size {self.size} is too small for {self.inputs} inputs")
+        main = self.body(self.size - fixed, subroutines)
+        # Pad with straight-line code to hit the requested size exactly
+        main += [self.alu() for _ in range(self.size - fixed - count_instructions(main))]
+
+        return "\n".join(header + main + footer + subs) + "\n"
+
+    def memory_image(self, rng: random.Random) -> List[int]:
+        return [rng.randrange(256) for _ in range(self.inputs)]
+
+
+def count_instructions(lines: List[str]) -> int:
+    """Count instruction lines, ignoring labels, comments and blank lines"""
+    return sum(1 for line in lines
+               if line and not line.startswith('#') and not line.endswith(':'))
+
+
+def write_memory_file(values: List[int], memory_file: Path, comment: Optional[str] = None):
+    """Write a test memory file in the sequential format read by the emulator"""
+    memory_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(memory_file, 'w') as f:
+        for value in values:
+            f.write(f"0x{value:02x}\n")
+        if comment:
+            f.write(f"# {comment}\n")
+
+
+def generate_program(
+    prog_dir: Path,
+    seed: int = 0,
+    size: int = 64,
+    tests: int = 4,
+    inputs: int = 2
+) -> Dict:
+    """
+    Generate a program directory with prog.txt, test_mems/ and config.json.
+    Expected values are computed by running the reference emulator.
+    Args:
+        prog_dir: Output program directory
+        seed: Seed for the program and its test memories
+        size: Number of instructions in the program
+        tests: Number of test cases
+        inputs: Number of input bytes read by the program
+    Returns:
+        dict: The generated test configuration
+    """
+    generator = WorkloadGenerator(seed=seed, size=size, inputs=inputs)
+    prog_dir.mkdir(parents=True, exist_ok=True)
+    prog_path = prog_dir / "prog.txt"
+    with open(prog_path, 'w') as f:
+        f.write(generator.generate())
+
+    mem_rng = random.Random(f"{seed}:memory")
+    test_cases = []
+    for i in range(1, tests + 1):
+        name = f"test{i}"
+        values = generator.memory_image(mem_rng)
+        memory_file = prog_dir / "test_mems" / f"{name}.txt"
+        write_memory_file(values, memory_file, f"Generated test memory (seed {seed})")
+
+        emulator = TUCAEmulator(verbose=False, minimal=True)
+        final_state = emulator.run_program(program_file=prog_path, memory_file=memory_file)
+        if final_state is None:
+            raise RuntimeError(f"Reference emulator failed on generated test {name}")
+
+        test_cases.append({
+            "name": name,
+            "description": "Inputs: " + " ".join(f"0x{v:02x}" for v in values),
+            "memory": f"test_mems/{name}.txt",
+            "expected": {
+                "memory": {
+                    f"0x{addr:02X}": f"0x{final_state.memory.get(addr, 0):02X}"
+                    for addr in sorted(generator.outputs)
+                }
+            }
+        })
+
+    config = {
+        "program": "prog.txt",
+        "generator": {"seed": seed, "size": size, "inputs": inputs},
+        "test_cases": test_cases
+    }
+    with open(prog_dir / "config.json", 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TUCA synthetic workload generator')
+    parser.add_argument('program', type=str, help='Program directory to create (relative to Programs/)')
+    parser.add_argument('--size', type=int, default=64,
+                        help=f'Number of instructions (16-{MAX_INSTRUCTIONS})')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--tests', type=int, default=4, help='Number of test cases')
+    parser.add_argument('--inputs', type=int, default=2, help='Number of input bytes')
+
+    args = parser.parse_args()
+
+    prog_dir = PROGRAMS_DIR / args.program
+    try:
+        config = generate_program(prog_dir, seed=args.seed, size=args.size,
+                                  tests=args.tests, inputs=args.inputs)
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Generated {prog_dir}: {args.size} instructions, "
+          f"{len(config['test_cases'])} tests (seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -86,7 +86,99 @@ if "%1"=="build" (
 if "%1"=="verify" (
     if "%2"=="" goto :usage
     if "%3"=="" goto :usage
-    python "%SCRIPT_DIR%\verify.py" "%2" "%3"
+    python "%SCRIPT_DIR%\verify.py" "%2" "%3" %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="debug" (
+    if "%2"=="" goto :usage
+    if "%3"=="" (
+        python "%ROOT_DIR%\Pipeline\Emulator\src\debugger.py" "%ROOT_DIR%\Programs\%2\prog.txt"
+    ) else (
+        python "%ROOT_DIR%\Pipeline\Emulator\src\debugger.py" "%ROOT_DIR%\Programs\%2\prog.txt" "%ROOT_DIR%\Programs\%2\test_mems\%3.txt"
+    )
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="cover" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" "Programs\%2\prog.txt" --coverage %3 %4
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="sweep" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" "Programs\%2\prog.txt" --sweep %3 %4 %5 %6 %7 %8
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="cache" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" "Programs\%2\prog.txt" --cache %3 %4
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="mutate" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" "Programs\%2\prog.txt" --mutate %3 %4
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="multicore" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" "Programs\%2\prog.txt" --multicore %3 %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="analyze" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python -m Pipeline.Assembler.src.analysis "Programs\%2\prog.txt" %3 %4 %5 %6
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="superopt" (
+    if "%2"=="" goto :usage
+    cd /d "%ROOT_DIR%"
+    python -m Pipeline.Assembler.src.superopt "Programs\%2\prog.txt" %3 %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="serve" (
+    python "%ROOT_DIR%\Pipeline\Emulator\src\server.py" %2 %3 %4 %5
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="fuzz" (
+    python "%SCRIPT_DIR%\fuzz.py" %2 %3 %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="shard" (
+    if "%2"=="" goto :usage
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" --shard %2 %3 %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="merge" (
+    if "%2"=="" goto :usage
+    python "%ROOT_DIR%\Pipeline\Emulator\src\run.py" --merge %2 %3 %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="watch" (
+    python "%SCRIPT_DIR%\watch.py" %2 %3 %4 %5 %6 %7 %8 %9
+    exit /b %ERRORLEVEL%
+)
+
+if "%1"=="gen" (
+    if "%2"=="" goto :usage
+    python "%SCRIPT_DIR%\generate.py" %2 %3 %4 %5 %6 %7 %8 %9
     exit /b %ERRORLEVEL%
 )
 
@@ -128,4 +220,47 @@ echo   clean [program...]    Clean build artifacts
 echo     Example: tuca clean              # Clean all
 echo             tuca clean example1      # Clean specific program
 echo             tuca clean p1 p2         # Clean multiple programs
+echo.
+echo   debug ^<program^> [test]  Debug with breakpoints and watchpoints
+echo     Example: tuca debug example1 mem1
+echo.
+echo   cover ^<program^> [--jobs N]  Annotated test coverage listing
+echo     Example: tuca cover example1 --jobs 4
+echo.
+echo   sweep ^<program^> [--jobs N]  Check every input combination (config.json "sweep")
+echo     Example: tuca sweep example1 --samples 5000 --seed 1
+echo.
+echo   cache ^<program^> [--cache-config FILE]  Cache hit rates and stall cycles
+echo     Example: tuca cache example1 --cache-config l2.json
+echo.
+echo   mutate ^<program^> [--jobs N]  Mutation testing of the test cases
+echo     Example: tuca mutate example1 --jobs 4
+echo.
+echo   multicore ^<program^> [--cores N]  Run the test cases on several cores sharing memory
+echo     Example: tuca multicore example1 --cores 4 --quantum 10 --seed 1 --contention
+echo.
+echo   analyze ^<program^> [--budget N]  Static worst-case instruction and cycle bounds
+echo     Example: tuca analyze example1 --budget 1000
+echo.
+echo   superopt ^<program^> [--scan]  Search for shorter equivalents of straight-line code
+echo     Example: tuca superopt example1 --block 4 8 --live r3
+echo.
+echo   serve [--stdio]       Start a persistent emulator server
+echo.
+echo   gen ^<program^> [options]  Generate a synthetic workload
+echo     Options: --size N --seed S --tests K --inputs I
+echo     Example: tuca gen stress --size 2048 --seed 7
+echo.
+echo   fuzz [options]        Differential fuzzing of the emulator vs the assembler
+echo     Options: --cases N --seed S --size N --syntax portable^|full --jobs N --out DIR
+echo     Example: tuca fuzz --cases 100000 --syntax full
+echo.
+echo   shard ^<i/N^> [--costs FILE]  Run one CI node's share of every test under Programs/
+echo     Example: tuca shard 2/4 --costs metrics.json --output part2.json
+echo.
+echo   merge ^<files...^>     Combine shard result files into one report
+echo     Example: tuca merge part1.json part2.json part3.json part4.json
+echo.
+echo   watch [program...]    Rebuild and re-run affected tests whenever files change
+echo     Example: tuca watch example1 --interval 0.1
 exit /b 1 
\ No newline at end of file
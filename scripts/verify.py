@@ -10,6 +10,9 @@
 sys.path.insert(0, str(root_dir))
 
 from Pipeline.Emulator.src.TUCA51_emulator import TUCAEmulator
+from Pipeline.Emulator.src.shard import (
+    PROGRAMS_DIR, shard_items, cost_files, option, default_output, write_partial, merge_main
+)
 
 def run_emulator(program: Path, memory: Path) -> Dict[int, int]:
     """Run program through emulator and return final memory state"""
@@ -55,6 +58,8 @@ def verify_results(
     if "memory" in expected:
         for addr_str, expected_val in expected["memory"].items():
             addr = int(addr_str.replace("0x", ""), 16)
+            if isinstance(expected_val, str):  # config.json values are hex strings
+                expected_val = int(expected_val.replace("0x", ""), 16)
             emu_val = emulator_mem.get(addr, 0)
             ver_val = verilog_mem.get(addr, 0)
             
@@ -98,9 +103,58 @@ def verify_results(
     print(f"\nVerification report written to: {report_file}")
     return success
 
+def verify_shard(argv: list) -> int:
+    """Verify this node's share of every test under Programs/ that has
+    emulator and Verilog results, writing a shard result file"""
+    shard = option(argv, "--shard")
+    try:
+        items, total = shard_items(shard or "", Path(option(argv, "--programs", PROGRAMS_DIR)),
+                                   cost_files(argv))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    output_file = Path(option(argv, "--output", default_output("verify", shard)))
+
+    results = []
+    for key, program_file, test_case in items:
+        prog_dir = program_file.parent
+        test_name = test_case["name"]
+        result = {"program": key, "name": test_name, "passed": False, "status": "missing"}
+        emulator_results = prog_dir / "results" / "emulator" / f"{test_name}.txt"
+        verilog_results = prog_dir / "results" / "verilog" / f"{test_name}.txt"
+        if emulator_results.exists() and verilog_results.exists():
+            print(f"\nVerifying {key} {test_name}...")
+            try:
+                result["passed"] = verify_results(
+                    prog_dir=prog_dir,
+                    test_name=test_name,
+                    emulator_mem=read_verilog_results(emulator_results),
+                    verilog_mem=read_verilog_results(verilog_results),
+                    expected=test_case["expected"]
+                )
+                result["status"] = "verified"
+            except Exception as e:
+                print(f"Error during verification: {e}")
+                result["status"] = "error"
+        else:
+            print(f"\n❌ {key} {test_name}: emulator or Verilog results not found")
+        results.append(result)
+
+    write_partial(output_file, "verify", shard, total, results)
+    print(f"\nShard {shard}: {sum(r['passed'] for r in results)}/{len(results)} verified, "
+          f"results written to {output_file}")
+    return 0 if all(r["passed"] for r in results) else 1
+
 def main():
+    if "--shard" in sys.argv:
+        sys.exit(verify_shard(sys.argv[1:]))
+    if "--merge" in sys.argv:
+        sys.exit(merge_main(sys.argv[1:]))
+
     if len(sys.argv) != 3:
         print("Usage: python3 verify.py <program> <test_name>")
+        print("       python3 verify.py --shard i/N [--costs FILE]... [--output FILE] [--programs DIR]")
+        print("       python3 verify.py --merge FILE... [--output FILE]")
         print("Example: python3 verify.py example1 mem1")
         sys.exit(1)
     
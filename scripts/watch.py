@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add the root directory and the emulator to Python path so we can reuse build.py and run.py
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "Pipeline" / "Emulator" / "src"))
+
+from build import compile_program
+from run import FileCache, memory_options, run_test, write_results
+
+PROGRAMS_DIR = root_dir / "Programs"
+INTERVAL = 0.05     # Seconds between checks for changed files
+RESCAN_EVERY = 20   # Checks between looking for new programs
+ALL = None          # Dependency of every test of a program
+
+def version(path: Path):
+    """(mtime, size) of a file, None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+class Watcher:
+    """Re-run the tests affected by each file change, in one warm process.
+
+    Every program directory maps the files its results depend on to the
+    tests that read them: the program, config.json, the memory image and
+    device input files to every test (and the program to a rebuild), a
+    test_mems file to the tests that load it. Files are checked by
+    modification time and size; parsed programs and memory files stay in
+    a FileCache, so a change costs one parse and the affected runs.
+    """
+    def __init__(self, program_dirs=None, cache=None, build=True):
+        self.selected = [Path(d) for d in program_dirs] if program_dirs else None
+        self.cache = cache or FileCache()
+        self.build = build
+        self.programs = {}  # program dir -> (config, program file, {path: test names or ALL})
+        self.versions = {}  # path -> version when last seen
+        self.checks = 0
+
+    def program_dirs(self) -> list:
+        if self.selected is not None:
+            return self.selected
+        return sorted(config.parent for config in PROGRAMS_DIR.rglob("config.json"))
+
+    def dependencies(self, program_dir: Path):
+        """(config, program file, {path: test names or ALL}); config is None
+        if config.json is missing or unusable"""
+        config_file = program_dir / "config.json"
+        deps = {config_file: ALL}
+        config = self.cache.config(config_file) if config_file.exists() else None
+        if not config:
+            return None, None, deps
+        program_file = program_dir / config.get("program", "prog.txt")
+        deps[program_file] = ALL
+        if config.get("memory_image"):
+            deps[program_dir / config["memory_image"]] = ALL
+        for device in config.get("devices", []):
+            if "file" in device:
+                deps[program_dir / device["file"]] = ALL
+        for test_case in config.get("test_cases", []):
+            path = program_dir / test_case["memory"]
+            if deps.get(path, set()) is not ALL:
+                deps.setdefault(path, set()).add(test_case["name"])
+        return config, program_file, deps
+
+    def scan(self):
+        """Start tracking new programs, forgetting removed ones"""
+        dirs = self.program_dirs()
+        for program_dir in list(self.programs):
+            if program_dir not in dirs:
+                del self.programs[program_dir]
+        for program_dir in dirs:
+            if program_dir not in self.programs:
+                self.track(program_dir)
+                self.run(program_dir, ALL, rebuild=True)
+
+    def track(self, program_dir: Path):
+        self.programs[program_dir] = self.dependencies(program_dir)
+        for path in self.programs[program_dir][2]:
+            self.versions[path] = version(path)
+
+    def changes(self) -> dict:
+        """{program dir: (test names or ALL, rebuild)} for files changed since the last check"""
+        affected = {}
+        for program_dir, (_, program_file, deps) in self.programs.items():
+            names, rebuild = set(), False
+            for path, readers in deps.items():
+                current = version(path)
+                if current == self.versions.get(path):
+                    continue
+                self.versions[path] = current
+                rebuild |= path == program_file or path.name == "config.json"
+                names = ALL if readers is ALL or names is ALL else names | readers
+            if names is ALL or names:
+                affected[program_dir] = (names, rebuild)
+        return affected
+
+    def check(self) -> bool:
+        """Re-run whatever changed, returns True if anything ran"""
+        self.checks += 1
+        if self.checks % RESCAN_EVERY == 0:
+            self.scan()
+        affected = self.changes()
+        for program_dir, (names, rebuild) in affected.items():
+            if rebuild:
+                self.track(program_dir)  # config.json or the program changed
+            self.run(program_dir, names, rebuild)
+        return bool(affected)
+
+    def run(self, program_dir: Path, names, rebuild: bool = False):
+        """Rebuild a program if needed and run its tests (names, or ALL)"""
+        start = time.perf_counter()
+        config, program_file, _ = self.programs[program_dir]
+        try:
+            label = program_dir.relative_to(PROGRAMS_DIR)
+        except ValueError:
+            label = program_dir
+        if config is None:
+            print(f"❌ {label}: no usable config.json")
+            return
+        if rebuild and self.build:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                built = compile_program(program_file, program_dir / "build")
+            if not built:
+                print(f"❌ {label}: build failed")
+                print(output.getvalue().rstrip())
+                return
+        try:
+            options = memory_options(program_file, config)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ {label}: {e}")
+            return
+        failures = []
+        count = 0
+        for test_case in config.get("test_cases", []):
+            if names is not ALL and test_case["name"] not in names:
+                continue
+            count += 1
+            output = io.StringIO()
+            with redirect_stdout(output):
+                final_state, _, status, _ = run_test(
+                    (program_file, program_dir / test_case["memory"], options), self.cache)
+            if final_state is None:
+                failures.append((test_case["name"], [output.getvalue().strip() or status or "error"]))
+                continue
+            write_results(final_state.memory,
+                          program_dir / "results" / "emulator" / Path(test_case["memory"]).name)
+            mismatches = []
+            for addr_str, value_str in test_case["expected"]["memory"].items():
+                addr = int(addr_str.replace("0x", ""), 16)
+                expected = int(value_str.replace("0x", ""), 16)
+                actual = final_state.memory.get(addr, 0)
+                if actual != expected:
+                    mismatches.append(f"0x{addr:02x}: expected 0x{expected:02x}, got 0x{actual:02x}")
+            if mismatches:
+                failures.append((test_case["name"], mismatches))
+        elapsed = (time.perf_counter() - start) * 1000
+        mark = "❌" if failures else "✅"
+        print(f"{mark} {label}: {count - len(failures)}/{count} passed in {elapsed:.1f} ms"
+              f"{' (rebuilt)' if rebuild and self.build else ''}")
+        for name, lines in failures:
+            print(f"    ❌ {name}")
+            for line in lines:
+                print("        " + line.replace("\n", "\n        "))
+
+    def watch(self, interval: float = INTERVAL):
+        self.scan()
+        print(f"Watching {len(self.programs)} programs, Ctrl+C to stop")
+        try:
+            while True:
+                if not self.check():
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            print()
+
+def main():
+    args = sys.argv[1:]
+    interval = INTERVAL
+    if "--interval" in args:
+        idx = args.index("--interval")
+        interval = float(args[idx + 1])
+        del args[idx:idx + 2]
+    build = "--no-build" not in args
+    programs = [PROGRAMS_DIR / arg for arg in args if not arg.startswith("--")]
+    for program_dir in programs:
+        if not (program_dir / "config.json").exists():
+            print(f"Error: No config.json found in {program_dir}")
+            sys.exit(1)
+    Watcher(programs or None, build=build).watch(interval)
+
+if __name__ == "__main__":
+    main()